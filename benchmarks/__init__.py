@@ -0,0 +1,64 @@
+"""
+Benchmarks of wikirace hot paths. Each benchmark is a module run with `python -m benchmarks.<name>`
+ and prints its results as JSON, so they can be compared between commits.
+Benchmarks touching the database run against a temporary test database and never touch real data.
+"""
+
+import contextlib
+import json
+import os
+import statistics
+import time
+from typing import Callable, Iterator
+
+import django
+
+
+def setup_django() -> None:
+    """
+    Initializes django with project settings
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wiki_race.settings")
+    django.setup()
+
+
+@contextlib.contextmanager
+def temporary_database() -> Iterator[None]:
+    """
+    Creates temporary test database for the duration of the benchmark
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func: Callable[[], object], repeat: int) -> dict:
+    """
+    Measures latency of function calls
+    :return: latency percentiles in milliseconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    quantiles = statistics.quantiles(timings, n=100)
+    return {
+        "p50_ms": round(quantiles[49], 4),
+        "p95_ms": round(quantiles[94], 4),
+        "p99_ms": round(quantiles[98], 4),
+    }
+
+
+def emit(results: dict) -> None:
+    """
+    Prints benchmark results as JSON
+    """
+    print(json.dumps(results, indent=2))
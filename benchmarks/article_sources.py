@@ -0,0 +1,101 @@
+"""
+Throughput of article sources: local article archive (cold and warm cluster cache) against live wiki api.
+Uses archive from --archive directory, or builds one of synthetic articles. Live api is measured only with --live N.
+Usage: python -m benchmarks.article_sources [--archive PATH] [--articles 20000] [--repeat 2000] [--live 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import emit, measure, setup_django
+from benchmarks.title_index import make_titles
+
+
+async def articles_per_second(source, titles: list, concurrency: int = 8) -> float:
+    started = time.perf_counter()
+    for i in range(0, len(titles), concurrency):
+        await asyncio.gather(*(source.load(x) for x in titles[i : i + concurrency]))
+    return round(len(titles) / (time.perf_counter() - started), 1)
+
+
+def random_titles(archive, count: int) -> list:
+    """
+    Reads titles of random archived articles
+    """
+    titles = []
+    for position in random.choices(range(len(archive)), k=count):
+        cluster, offset, length = (int(x) for x in archive.entries[position])
+        record = archive.read_cluster(cluster)[offset : offset + length]
+        titles.append(json.loads(record)["title"])
+    return titles
+
+
+def make_archive(path: str, count: int) -> None:
+    """
+    Makes archive of synthetic articles of ~30 KB of HTML with 100 links each
+    """
+    from wiki_race.wiki_api.archive import ArchiveWriter
+
+    titles = make_titles(count)
+    with ArchiveWriter(path) as writer:
+        for title in titles:
+            links = random.sample(titles, min(100, len(titles)))
+            text = "".join(
+                f'<p>{" ".join(random.choices(titles, k=20))} <a href="/wiki/{x}">{x}</a></p>'
+                for x in links
+            )
+            writer.add(title, text, links)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--archive", help="article archive directory")
+    parser.add_argument("--articles", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--live", type=int, default=0)
+    args = parser.parse_args()
+    setup_django()
+    from wiki_race.wiki_api.archive import ArticleArchive
+    from wiki_race.wiki_api.sources import ArchiveSource, WikiApiSource
+
+    with tempfile.TemporaryDirectory() as path:
+        if args.archive:
+            path = args.archive
+        else:
+            make_archive(path, args.articles)
+        archive = ArticleArchive(path)
+        results = {
+            "articles": len(archive),
+            "bytes_per_article": round(
+                os.path.getsize(os.path.join(path, "articles.bin")) / len(archive)
+            ),
+        }
+        titles = random_titles(archive, args.repeat)
+        samples = iter(titles * 2)
+        archive.read_cluster.cache_clear()
+        results["archive_cold"] = measure(
+            lambda: (archive.read_cluster.cache_clear(), archive.get(next(samples))),
+            args.repeat,
+        )
+        hot = titles[:16]
+        samples = iter(hot * args.repeat)
+        results["archive_warm"] = measure(
+            lambda: archive.get(next(samples)), args.repeat
+        )
+        results["archive_per_second"] = asyncio.run(
+            articles_per_second(ArchiveSource(archive), titles)
+        )
+        if args.live:
+            results["live_per_second"] = asyncio.run(
+                articles_per_second(WikiApiSource(), titles[: args.live])
+            )
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Load test of party broadcasts through redis channel layers: group messages per second and redis CPU time,
+ for a party with members spread over several workers. Needs a running redis server.
+Usage: REDIS_URL=redis://localhost:6379 python -m benchmarks.channel_layers [--workers 4] [--members 1000]
+"""
+
+import argparse
+import asyncio
+import importlib
+import os
+import time
+
+import aioredis
+
+from benchmarks import emit
+from wiki_race.settings import REDIS_CHANNEL_LAYER_BACKENDS
+
+GROUP_NAME = "benchmark-party"
+
+
+def make_layer(backend: str, redis_url: str):
+    """
+    Makes new channel layer instance, standing for a single worker process
+    """
+    module_name, class_name = backend.rsplit(".", 1)
+    layer_class = getattr(importlib.import_module(module_name), class_name)
+    return layer_class(hosts=[redis_url])
+
+
+async def get_redis_cpu_seconds(redis) -> float:
+    info = await redis.info("cpu")
+    return float(info["cpu"]["used_cpu_sys"]) + float(info["cpu"]["used_cpu_user"])
+
+
+async def receive_all(layer, channel: str, count: int) -> None:
+    for _ in range(count):
+        await layer.receive(channel)
+
+
+async def run_broadcasts(
+    backend: str, redis_url: str, workers: int, members: int, broadcasts: int
+) -> dict:
+    """
+    Sends group messages to party, waiting for every member to receive them
+    """
+    layers = [make_layer(backend, redis_url) for _ in range(workers)]
+    # connect members, spreading them over workers
+    channels = []
+    for i in range(members):
+        layer = layers[i % workers]
+        channel = await layer.new_channel()
+        await layer.group_add(GROUP_NAME, channel)
+        channels.append((layer, channel))
+    # let subscriptions settle
+    await asyncio.sleep(0.5)
+
+    redis = await aioredis.create_redis(redis_url)
+    cpu_before = await get_redis_cpu_seconds(redis)
+    start = time.perf_counter()
+    receivers = asyncio.gather(
+        *[receive_all(layer, channel, broadcasts) for layer, channel in channels]
+    )
+    message = {
+        "type": "receive_group_message",
+        "id": "0" * 32,
+        "message": {"type": "benchmark", "data": "x" * 200},
+    }
+    for _ in range(broadcasts):
+        await layers[0].group_send(GROUP_NAME, message)
+    await receivers
+    elapsed = time.perf_counter() - start
+    cpu_after = await get_redis_cpu_seconds(redis)
+
+    for layer, channel in channels:
+        await layer.group_discard(GROUP_NAME, channel)
+    for layer in layers:
+        await layer.flush()
+    redis.close()
+    await redis.wait_closed()
+    return {
+        "broadcasts_per_second": round(broadcasts / elapsed, 2),
+        "deliveries_per_second": round(broadcasts * members / elapsed, 2),
+        "redis_cpu_seconds": round(cpu_after - cpu_before, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--members", type=int, default=1000)
+    parser.add_argument("--broadcasts", type=int, default=50)
+    args = parser.parse_args()
+    redis_url = os.environ.get("REDIS_URL", "redis://localhost:6379")
+
+    results = {
+        "workers": args.workers,
+        "members": args.members,
+        "broadcasts": args.broadcasts,
+    }
+    for name, backend in REDIS_CHANNEL_LAYER_BACKENDS.items():
+        results[name] = asyncio.run(
+            run_broadcasts(
+                backend, redis_url, args.workers, args.members, args.broadcasts
+            )
+        )
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Format time, peak memory and output size of wiki page formatter over a versioned corpus of `action=parse` outputs
+ (stubs, typical articles and huge pages), with a differential check of link semantics.
+Corpus pages listed in `corpus/v<N>/manifest.json` are stored there as `<title>.json.gz`, fetch them with --fetch.
+Pages missing from corpus are replaced with synthetic pages of similar size, marked as such in results.
+Usage: python -m benchmarks.formatter [--corpus-version 1] [--fetch] [--repeat 5]
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import re
+import tracemalloc
+from html.parser import HTMLParser
+from typing import List, Optional, Tuple
+
+from benchmarks import emit, measure, setup_django
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+SYNTHETIC_SIZES = {"stub": 4_000, "typical": 80_000, "huge": 1_500_000}
+"""
+Approximate HTML size in bytes of synthetic pages by category
+"""
+
+
+class _LinkCollector(HTMLParser):
+    """
+    Collects href and onclick attributes of <a> elements in document order
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links: List[Tuple[Optional[str], Optional[str]]] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a":
+            attrs = dict(attrs)
+            self.links.append((attrs.get("href"), attrs.get("onclick")))
+
+
+def collect_links(html: str) -> List[Tuple[Optional[str], Optional[str]]]:
+    collector = _LinkCollector()
+    collector.feed(html)
+    return collector.links
+
+
+def expected_link(href: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Reference semantics of formatted link: internal article links lead to page and announce click,
+     fragments are kept, other links are disabled
+    :return: expected href and click destination
+    """
+    if href is None or href == "" or href.startswith("#"):
+        return href, None
+    match = re.fullmatch(r"/wiki/([^/:]*)", href)
+    if match is None:
+        return None, None
+    return match[1], match[1]
+
+
+def link_mismatches(source: str, formatted: str) -> int:
+    """
+    Compares links of formatted page with reference semantics
+    :return: amount of links formatted differently, or missing
+    """
+    before, after = collect_links(source), collect_links(formatted)
+    mismatches = abs(len(before) - len(after))
+    for (href, _), (new_href, onclick) in zip(before, after):
+        expected_href, destination = expected_link(href)
+        click = None
+        if onclick is not None:
+            click = json.loads(re.search(r"postMessage\((.*), '\*'\)", onclick)[1])
+        expected_click = (
+            None
+            if destination is None
+            else {"type": "click", "destination": destination}
+        )
+        mismatches += new_href != expected_href or click != expected_click
+    return mismatches
+
+
+def synthetic_page(title: str, size: int) -> str:
+    """
+    Makes page resembling parser output: paragraphs with article, namespaced, red, external and citation links,
+     an infobox table and navigation lists
+    """
+    rng = random.Random(title)
+    words = [
+        "".join(rng.choices("etaoinshrdlu", k=rng.randint(2, 9))) for _ in range(500)
+    ]
+
+    def link() -> str:
+        target = "_".join(rng.choices(words, k=rng.randint(1, 3))).capitalize()
+        kind = rng.random()
+        if kind < 0.7:
+            return f'<a href="/wiki/{target}" title="{target}">{target}</a>'
+        if kind < 0.8:
+            return f'<a href="/wiki/File:{target}.jpg" class="image">{target}</a>'
+        if kind < 0.85:
+            return f'<a href="/w/index.php?title={target}&amp;action=edit&amp;redlink=1" class="new">{target}</a>'
+        if kind < 0.95:
+            return f'<sup class="reference"><a href="#cite_note-{rng.randint(1, 300)}">[1]</a></sup>'
+        return (
+            f'<a class="external text" href="https://example.org/{target}">{target}</a>'
+        )
+
+    parts = [
+        '<div class="mw-parser-output"><table class="infobox"><tbody>',
+        *(f"<tr><th>{rng.choice(words)}</th><td>{link()}</td></tr>" for _ in range(10)),
+        "</tbody></table>",
+    ]
+    length = sum(len(x) for x in parts)
+    while length < size:
+        if rng.random() < 0.8:
+            text = " ".join(
+                rng.choice(words) if rng.random() < 0.9 else link() for _ in range(80)
+            )
+            part = f"<p>{text}</p>"
+        else:
+            part = "<ul>" + "".join(f"<li>{link()}</li>" for _ in range(20)) + "</ul>"
+        parts.append(part)
+        length += len(part)
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def page_path(version: int, title: str) -> str:
+    return os.path.join(CORPUS_DIR, f"v{version}", f"{title.replace(' ', '_')}.json.gz")
+
+
+def fetch(version: int, manifest: dict) -> None:
+    """
+    Stores `action=parse` outputs of manifest pages in corpus
+    """
+    import requests
+
+    from wiki_race.settings import WIKI_API
+
+    for titles in manifest["pages"].values():
+        for title in titles:
+            data = requests.get(
+                WIKI_API,
+                params={
+                    "action": "parse",
+                    "page": title,
+                    "format": "json",
+                    "redirects": "true",
+                },
+            ).json()
+            with gzip.open(page_path(version, title), "wt", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+
+
+def load_page(version: int, category: str, title: str) -> Tuple[str, bool]:
+    """
+    :return: page html, and whether it's synthetic
+    """
+    try:
+        with gzip.open(page_path(version, title), "rt", encoding="utf-8") as f:
+            return json.load(f)["parse"]["text"]["*"], False
+    except FileNotFoundError:
+        return synthetic_page(title, SYNTHETIC_SIZES[category]), True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus-version", type=int, default=1)
+    parser.add_argument(
+        "--fetch", action="store_true", help="fetch corpus pages from WIKI_API"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+    from wiki_parser.page_formatter import wiki_format_html
+
+    with open(
+        os.path.join(CORPUS_DIR, f"v{args.corpus_version}", "manifest.json")
+    ) as f:
+        manifest = json.load(f)
+    if args.fetch:
+        fetch(args.corpus_version, manifest)
+    results = {
+        "corpus_version": manifest["version"],
+        "wiki": manifest["wiki"],
+        "pages": {},
+    }
+    for category, titles in manifest["pages"].items():
+        for title in titles:
+            html, synthetic = load_page(args.corpus_version, category, title)
+            # peak memory of a single run
+            tracemalloc.start()
+            formatted = wiki_format_html(html)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["pages"][title] = {
+                "category": category,
+                "synthetic": synthetic,
+                "input_bytes": len(html.encode("utf-8")),
+                "output_bytes": len(formatted.encode("utf-8")),
+                "links": len(collect_links(html)),
+                "link_mismatches": link_mismatches(html, formatted),
+                "peak_memory_bytes": peak,
+                "format": measure(lambda: wiki_format_html(html), args.repeat),
+            }
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Latency of hot game queries as game history grows, and after it is pruned.
+Usage: python -m benchmarks.history [--steps 0 10000 50000] [--members 4] [--repeat 500]
+"""
+
+import argparse
+from datetime import timedelta
+
+from benchmarks import setup_django, temporary_database, measure, emit
+
+setup_django()
+
+from django.utils import timezone
+
+from wiki_app.data.db import (
+    get_latest_party_round,
+    get_latest_member_round,
+    get_member,
+)
+from wiki_app.data.retention import prune_history
+from wiki_app.models import User, Party, PartyMember, Round, MemberRound
+
+ROUNDS_PER_PARTY = 10
+
+
+def grow_history(rounds: int, members: int) -> None:
+    """
+    Adds finished parties, that have been idle for a month, with given amount of rounds in total
+    """
+    long_ago = timezone.now() - timedelta(days=30)
+    parties_count = max(rounds // ROUNDS_PER_PARTY, 1)
+    users = User.objects.bulk_create(
+        [User(created_at=long_ago) for _ in range(parties_count * members)]
+    )
+    parties = Party.objects.bulk_create(
+        [Party(time_limit=60, last_active=long_ago) for _ in range(parties_count)]
+    )
+    party_members = PartyMember.objects.bulk_create(
+        [
+            PartyMember(name="player", user=users[i * members + j], party=party)
+            for i, party in enumerate(parties)
+            for j in range(members)
+        ]
+    )
+    party_rounds = Round.objects.bulk_create(
+        [
+            Round(party=party, start_page="Milk", end_page="Mozzarella", running=False)
+            for party in parties
+            for _ in range(ROUNDS_PER_PARTY)
+        ]
+    )
+    Round.objects.filter(pk__in=[x.pk for x in party_rounds]).update(
+        start_time=long_ago
+    )
+    MemberRound.objects.bulk_create(
+        [
+            MemberRound(
+                member=party_members[i // ROUNDS_PER_PARTY * members + j],
+                round=party_round,
+                current_page="Mozzarella",
+                solved_at=30,
+            )
+            for i, party_round in enumerate(party_rounds)
+            for j in range(members)
+        ],
+        batch_size=5000,
+    )
+
+
+def measure_hot_queries(member: PartyMember, repeat: int) -> dict:
+    """
+    Measures queries made on every page view and websocket message
+    """
+    party = member.party
+    user = member.user
+    party_round = get_latest_party_round(party)
+    return {
+        "latest_party_round": measure(lambda: get_latest_party_round(party), repeat),
+        "latest_member_round": measure(lambda: get_latest_member_round(member), repeat),
+        "get_member": measure(lambda: get_member(party.uid, user.uid), repeat),
+        "is_member": measure(
+            lambda: PartyMember.objects.filter(party=party, user=user).exists(),
+            repeat,
+        ),
+        "unsolved_member_rounds": measure(
+            lambda: party_round.member_rounds.filter(solved_at=-1).exists(), repeat
+        ),
+    }
+
+
+def history_size() -> dict:
+    return {
+        "users": User.objects.count(),
+        "parties": Party.objects.count(),
+        "rounds": Round.objects.count(),
+        "member_rounds": MemberRound.objects.count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, nargs="+", default=[0, 10000, 50000])
+    parser.add_argument("--members", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    results = {"steps": []}
+    with temporary_database():
+        # live party, which is being played right now
+        user = User.objects.create()
+        party = Party.objects.create(time_limit=600)
+        member = PartyMember.objects.create(name="host", user=user, party=party)
+        party_round = Round.objects.create(
+            party=party, start_page="Milk", end_page="Mozzarella", unsolved_members=1
+        )
+        party.current_round = party_round
+        party.save(update_fields=["current_round"])
+        MemberRound.objects.create(
+            member=member, round=party_round, current_page="Milk"
+        )
+
+        grown = 0
+        for step in args.steps:
+            if step > grown:
+                grow_history(step - grown, args.members)
+                grown = step
+            results["steps"].append(
+                {
+                    "history": history_size(),
+                    "latency": measure_hot_queries(member, args.repeat),
+                }
+            )
+        pruned = prune_history(
+            round_ttl=timedelta(days=1),
+            party_ttl=timedelta(days=7),
+            user_ttl=timedelta(days=1),
+            batch_size=1000,
+        )
+        results["pruned"] = {
+            "pruned": pruned,
+            "history": history_size(),
+            "latency": measure_hot_queries(member, args.repeat),
+        }
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Lookups per second of title dictionary, memory mapped from disk, compared to an in-memory dict of titles.
+Uses dictionary from --dictionary directory, or builds one of synthetic titles.
+Usage: python -m benchmarks.title_dictionary [--dictionary PATH] [--titles 1000000] [--repeat 100000]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks import emit, setup_django
+from benchmarks.title_index import make_titles
+
+
+def lookups_per_second(lookup, titles: list) -> float:
+    started = time.perf_counter()
+    for title in titles:
+        lookup(title)
+    return round(len(titles) / (time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dictionary", help="title dictionary directory")
+    parser.add_argument("--titles", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=100000)
+    args = parser.parse_args()
+    setup_django()
+    from wiki_race.wiki_graph.dictionary import TitleDictionary, normalize_title
+
+    with tempfile.TemporaryDirectory() as path:
+        titles = []
+        if args.dictionary:
+            path = args.dictionary
+        else:
+            titles = make_titles(args.titles)
+            TitleDictionary.build(titles, range(len(titles))).save(path)
+        dictionary = TitleDictionary.load(path)
+        size = sum(
+            os.path.getsize(os.path.join(path, f"title_{name}.npy"))
+            for name in ["hashes", "pages"]
+        )
+        results = {
+            "titles": len(dictionary),
+            "bytes_per_title": round(size / max(len(dictionary), 1), 2),
+        }
+        if titles:
+            # lowercase first letter, as typed by players
+            samples = [
+                x[0].lower() + x[1:] for x in random.choices(titles, k=args.repeat)
+            ]
+            results["hits_per_second"] = lookups_per_second(dictionary.get, samples)
+            ids = {normalize_title(x): i for i, x in enumerate(titles)}
+            results["dict_hits_per_second"] = lookups_per_second(
+                lambda x: ids.get(normalize_title(x), -1), samples
+            )
+        misses = [f"Missing title {i}" for i in range(args.repeat)]
+        results["misses_per_second"] = lookups_per_second(dictionary.get, misses)
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latency of title autocomplete and existence checks with title prefix index, memory mapped from disk.
+Uses index from --index directory, or builds one of synthetic titles.
+Usage: python -m benchmarks.title_index [--index PATH] [--titles 1000000] [--repeat 1000]
+"""
+
+import argparse
+import random
+import string
+import tempfile
+
+import numpy as np
+
+from benchmarks import measure, emit, setup_django
+
+
+def make_titles(count: int) -> list:
+    """
+    Makes unique synthetic titles of one to three words
+    """
+    words = [
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))).title()
+        for _ in range(max(count // 10, 10))
+    ]
+    titles = set()
+    while len(titles) < count:
+        titles.add(" ".join(random.choices(words, k=random.randint(1, 3))))
+    return list(titles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--index", help="title index directory")
+    parser.add_argument("--titles", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+    setup_django()
+    from wiki_race.wiki_graph.titles import TitleIndex
+
+    with tempfile.TemporaryDirectory() as path:
+        if args.index:
+            path = args.index
+        else:
+            titles = make_titles(args.titles)
+            popularity = np.random.zipf(1.5, len(titles)).clip(max=10**6)
+            TitleIndex.build(titles, popularity).save(path)
+        index = TitleIndex.load(path)
+        samples = [
+            index.titles[random.randrange(len(index.titles))].decode("utf-8")
+            for _ in range(args.repeat)
+        ]
+        results = {"titles": len(index.titles)}
+        for length in [1, 2, 3, 5]:
+            prefixes = iter([x[:length] for x in samples] * 2)
+            results[f"prefix_{length}"] = measure(
+                lambda: index.search(next(prefixes)), args.repeat
+            )
+        titles = iter(samples * 2)
+        results["exists"] = measure(lambda: index.exists(next(titles)), args.repeat)
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
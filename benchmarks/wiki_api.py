@@ -0,0 +1,74 @@
+"""
+Latency of wiki api dependent hot paths, replayed from a cassette by the api stand-in,
+ with injected latency, so that results don't depend on live wiki api.
+Record a cassette with `python manage.py api_standin CASSETTE --record` to benchmark other pages.
+Usage: python -m benchmarks.wiki_api [--cassette PATH] [--latency-ms 50] [--jitter-ms 10] [--repeat 100]
+"""
+
+import argparse
+import os
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+
+from benchmarks import emit, measure, setup_django
+
+CASSETTE = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    "wiki_parser",
+    "fixtures",
+    "wiki_api.jsonl",
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cassette", default=CASSETTE)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--start", default="London")
+    parser.add_argument("--target", default="Paris")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    setup_django()
+    from wiki_race.settings import DEFAULT_WIKI, WIKIS
+    from wiki_race.wiki_api import parse
+    from wiki_race.wiki_api.sources import WikiApiSource
+    from wiki_race.wiki_api.standin import Cassette, StandIn, serve_in_thread
+
+    standin = StandIn(
+        Cassette(args.cassette),
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        seed=0,
+    )
+    with serve_in_thread(standin) as url, mock.patch.dict(
+        WIKIS[DEFAULT_WIKI], api=f"{url}/w/api.php"
+    ), mock.patch.object(parse, "SDOW_API", url):
+        source = WikiApiSource()
+        results = {
+            "load_page": measure(
+                lambda: async_to_sync(source.load)(args.start), args.repeat
+            ),
+            "check_valid_transition": measure(
+                lambda: async_to_sync(parse.check_valid_transition)(
+                    args.start, args.target
+                ),
+                args.repeat,
+            ),
+            "resolve_page_ids": measure(
+                lambda: parse.resolve_page_ids(args.start, args.target), args.repeat
+            ),
+            "find_shortest_path": measure(
+                lambda: async_to_sync(parse.find_shortest_path)(
+                    args.start, args.target
+                ),
+                args.repeat,
+            ),
+        }
+    results["standin"] = dict(standin.stats)
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Encode/decode time and size of websocket frames for every wire codec, on leaderboard updates of different party sizes.
+Usage: python -m benchmarks.wire_codecs [--members 10 100 1000] [--repeat 1000]
+"""
+
+import argparse
+import random
+
+from benchmarks import measure, emit
+from wiki_app.websockets.codecs import codecs
+
+
+def make_leaderboard_update(members: int) -> dict:
+    """
+    Makes `leaderboard_update` action, as sent by `GameConsumer`
+    """
+    leaderboards = [
+        {
+            "name": f"player{i}",
+            "is_admin": i == 0,
+            "points": random.randint(0, 5000),
+        }
+        for i in range(members)
+    ]
+    leaderboards.sort(key=(lambda x: x["points"]), reverse=True)
+    return {"type": "leaderboard_update", "data": {"leaderboards": leaderboards}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--members", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {}
+    for members in args.members:
+        message = make_leaderboard_update(members)
+        results[members] = {}
+        for name, codec in codecs.items():
+            payload = codec.encode(message)
+            frame = codec.frame(payload)
+            results[members][name] = {
+                "bytes": len(payload.encode() if isinstance(payload, str) else payload),
+                "encode": measure(lambda: codec.encode(message), args.repeat),
+                "decode": measure(lambda: codec.decode(**frame), args.repeat),
+            }
+    emit(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,2 @@
 #!/usr/bin/env bash
 pip install -r requirements.txt
-python manage.py migrate
-python manage.py createcachetable
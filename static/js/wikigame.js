@@ -1,6 +1,6 @@
 let WIKI_API_ENDPOINT;
 
-// ===== Example rounds =====
+// ===== Suggested rounds =====
 const exampleRounds = [
   ['Milk', 'Mozzarella'],
   ['Albert Einstein', 'International Space Station'],
@@ -15,6 +15,15 @@ const exampleRounds = [
 
 let suggestedOrigin, suggestedTarget;
 
+// take pre-generated round pair with known shortest solution, only on host's request, as pairs are used up
+function takeRoundPair(difficulty) {
+  return $.ajax("/api/round_pair", {
+    method: "POST",
+    data: {difficulty: difficulty, party: conf["PARTY_ID"]},
+    headers: {"X-CSRFToken": conf["CSRF_TOKEN"]},
+  });
+}
+
 function setRandomExampleRound() {
   const item = exampleRounds[Math.floor(Math.random() * exampleRounds.length)];
   suggestedOrigin = item[0];
@@ -82,6 +91,32 @@ function setSolution(solution) {
   $("#header-solution").show();
 }
 
+function setRoundAnalytics(analytics) {
+  const memberName = (memberId) => analytics["names"][memberId] || "?";
+  const optimal = analytics["optimal_clicks"];
+  $("#text-optimal-clicks").text(
+    optimal === null ? "target can't be reached" : `shortest path takes ${optimal} clicks`
+  );
+  $("#analytics-table").empty();
+  Object.entries(analytics["members"]).forEach(([memberId, stats]) => {
+    let row = $("<tr></tr>")
+      .append($("<td></td>").text(memberName(memberId)))
+      .append($("<td></td>").text(stats["clicks"]))
+      .append($("<td></td>").text(stats["wasted_clicks"]))
+      .append($("<td></td>").text(stats["distance_left"] === null ? "?" : stats["distance_left"]));
+    $("#analytics-table").append(row);
+  });
+  $("#analytics-detours").empty();
+  analytics["biggest_detours"].forEach((detour) => {
+    $("#analytics-detours").append(
+      $("<li></li>").text(
+        `${memberName(detour["member"])}: ${detour["from"]} -> ${detour["to"]} (+${detour["cost"]} clicks)`
+      )
+    );
+  });
+  $("#round-analytics").show();
+}
+
 function showModal() {
   $("#modal-1").modal("show");
 }
@@ -98,6 +133,7 @@ function initUI() {
     $("#host-panel").hide();
   }
   $("#header-solution").hide();
+  $("#round-analytics").hide();
   $("#button-new-round-spinner").hide();
   $("#button-finish-early").hide();
   setTimeout(showModal, 100);
@@ -114,11 +150,12 @@ function newGame(data) {
   $("#destination").text(destination);
 
   seconds = data["time_limit"];
-  $("#game-iframe")[0].src = "/wiki/" + origin;
+  $("#game-iframe")[0].src = wikiPageUrl(origin);
 
   $("#modal-title").text("Game in progress...");
   hideModal();
   $("#header-solution").hide();
+  $("#round-analytics").hide();
   if (is_admin) {
     $("#button-new-round-spinner").hide();
     $("#button-finish-early").show();
@@ -130,7 +167,7 @@ function newGame(data) {
   $("#mytarget").typeahead("val", "");
 }
 
-let solution, leaderboards;
+let solution, leaderboards, roundAnalytics;
 
 function roundFinished(data) {
   solution = data["solution"];
@@ -153,8 +190,13 @@ function roundFinished(data) {
   showModal();
 }
 
+// formatted page of party's wiki
+function wikiPageUrl(page) {
+  return "/wiki/" + conf["WIKI_LANGUAGE"] + "/" + page;
+}
+
 function forceRedirect(data) {
-  $("#game-iframe")[0].src = "/wiki/" + data["page"];
+  $("#game-iframe")[0].src = wikiPageUrl(data["page"]);
 }
 
 function solved() {
@@ -186,6 +228,10 @@ function parseMessage(actionName, data) {
   if (actionName === "solved") {
     return solved();
   }
+  if (actionName === "round_analytics") {
+    roundAnalytics = data;
+    return setRoundAnalytics(roundAnalytics);
+  }
   if (actionName === "set_wiki_endpoint") {
     WIKI_API_ENDPOINT = data["url"];
     console.info(`Now using this wiki endpoint: ${WIKI_API_ENDPOINT}`);
@@ -200,14 +246,23 @@ function receiveMessage(event) {
     console.error(msg["error"]);
     return;
   }
+  // several actions sent in a single frame (e.g. state snapshot on connect)
+  if (msg["type"] === "batch") {
+    msg["data"].forEach((action) => parseMessage(action["type"], action["data"]));
+    return;
+  }
   parseMessage(msg["type"], msg["data"]);
 }
 
 function connectWebsocket(url) {
   socket = new WebSocket(url);
   socket.onmessage = receiveMessage;
-  socket.onclose = function (_) {
+  socket.onclose = function (ev) {
     console.info("Websocket closed!");
+    // server closes connections of clients, which are too slow to receive messages, reconnect with fresh state
+    if (ev.code === 1013) {
+      setTimeout(() => connectWebsocket(url), 1000);
+    }
   };
   socket.onerror = function (ev) {
     console.error(ev);
@@ -262,19 +317,32 @@ $(document).ready(function () {
     {
       async: true,
       source: function (qry, _, async) {
-        $.ajax(
-          `${WIKI_API_ENDPOINT}?` +
-          $.param({
-            action: "opensearch",
-            search: qry,
-            namespace: 0,
-            redirects: "resolve",
-            origin: "*",
-          }),
-          {}
-        ).done(function (res) {
-          async(res[1]);
-        });
+        const searchWikiApi = function () {
+          $.ajax(
+            `${WIKI_API_ENDPOINT}?` +
+            $.param({
+              action: "opensearch",
+              search: qry,
+              namespace: 0,
+              redirects: "resolve",
+              origin: "*",
+            }),
+            {}
+          ).done(function (res) {
+            async(res[1]);
+          });
+        };
+        // without server-side title index, use wiki api right away
+        if (!conf["HAS_TITLE_INDEX"]) {
+          searchWikiApi();
+          return;
+        }
+        // use server-side title index, falling back to wiki api
+        $.ajax("/api/titles?" + $.param({prefix: qry, language: conf["WIKI_LANGUAGE"]}))
+          .done(function (res) {
+            async(res["titles"]);
+          })
+          .fail(searchWikiApi);
       },
       limit: 5,
     }
@@ -282,24 +350,40 @@ $(document).ready(function () {
 });
 
 function setRandomOriginAndTitle() {
-  $.ajax(
-    `${WIKI_API_ENDPOINT}?` +
-    $.param({
-      action: "query",
-      list: "random",
-      rnnamespace: 0,
-      rnlimit: 2,
-      format: "json",
-      origin: "*",
-    }),
-    {}
-  ).done(function (res) {
-    $("#myorigin").typeahead("val", res.query.random[0].title);
-    $("#mytarget").typeahead("val", res.query.random[1].title);
-  });
+  takeRoundPair($("#round-difficulty").val())
+    .done(function (res) {
+      $("#myorigin").typeahead("val", res["origin"]);
+      $("#mytarget").typeahead("val", res["target"]);
+    })
+    .fail(function () {
+      // pool is empty, fall back to random pages
+      $.ajax(
+        `${WIKI_API_ENDPOINT}?` +
+        $.param({
+          action: "query",
+          list: "random",
+          rnnamespace: 0,
+          rnlimit: 2,
+          format: "json",
+          origin: "*",
+        }),
+        {}
+      ).done(function (res) {
+        $("#myorigin").typeahead("val", res.query.random[0].title);
+        $("#mytarget").typeahead("val", res.query.random[1].title);
+      });
+    });
 }
 
 async function checkPageExists(page) {
+  // use server-side title index if there is one, falling back to wiki api
+  if (conf["HAS_TITLE_INDEX"]) {
+    try {
+      const res = await $.ajax("/api/titles?" + $.param({title: page, language: conf["WIKI_LANGUAGE"]}));
+      return res["exists"];
+    } catch (e) {
+    }
+  }
   const resp = await $.ajax(
     `${WIKI_API_ENDPOINT}?` +
     $.param({
@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+from wiki_race import metrics
+
+
+def track_queries(sender, connection, **kwargs) -> None:
+    """
+    Counts queries of websocket actions on every new database connection, see `metrics.track_queries`
+    """
+    if metrics.track_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(metrics.track_queries)
 
 
 class AppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "wiki_app"
+
+    def ready(self) -> None:
+        connection_created.connect(track_queries)
@@ -0,0 +1,119 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from wiki_app.data.replay import get_batch_offsets, load_batch
+from wiki_app.models import Round
+from wiki_race.wiki_graph.graph import LinkGraph, UNREACHABLE, get_link_graph
+
+DETOURS_REPORTED = 3
+"""
+Amount of biggest detours reported for a round
+"""
+
+
+def analyze_round(party_round: Round) -> Optional[dict]:
+    """
+    Compares members' paths in finished round with shortest paths in local link graph
+    :return: analytics, see `analyze_paths`, with members' `names` by id,
+     or None if there is no local link graph, or target isn't in it
+    """
+    graph = get_link_graph(party_round.party.language)
+    if graph is None:
+        return
+    target = graph.get_id(party_round.end_page)
+    if target == -1:
+        return
+    # load round's click events
+    events = [
+        event
+        for batch_id, _ in get_batch_offsets(party_round.pk)
+        for event in load_batch(batch_id)
+    ]
+    analytics = analyze_paths(
+        graph, graph.distances_to(target), party_round.start_page, events
+    )
+    # names for frontend to show members' stats
+    members = party_round.member_rounds.values_list("member_id", "member__name")
+    analytics["names"] = {str(member_id): name for member_id, name in members}
+    return analytics
+
+
+def analyze_paths(
+    graph: LinkGraph,
+    distances: np.ndarray,
+    start_page: str,
+    events: List[Tuple[int, int, str]],
+) -> dict:
+    """
+    Computes path stats of every member at once.
+    Click is optimal if it gets one link closer to the target, otherwise it's a detour,
+     which costs as many extra clicks as it didn't get closer by.
+    :param distances: distances to target by page id, see `LinkGraph.distances_to`
+    :param events: click events: milliseconds since round start, member id and page title
+    :return: dict with `optimal_clicks` from start page, members' `clicks`, `wasted_clicks` and `distance_left` by id,
+     and `biggest_detours` of the round
+    """
+    start = graph.get_id(start_page)
+    optimal_clicks = _distance(distances, np.array([start]))[0]
+    if not events:
+        return {
+            "optimal_clicks": _to_json(optimal_clicks),
+            "members": {},
+            "biggest_detours": [],
+        }
+    # group clicks by member, keeping time order
+    events = sorted(events, key=lambda x: (x[1], x[0]))
+    members = np.array([x[1] for x in events])
+    pages = np.array([graph.get_id(x[2]) for x in events])
+    # each member's path starts at start page
+    first = np.r_[True, members[1:] != members[:-1]]
+    last = np.r_[first[1:], True]
+    previous = np.r_[start, pages[:-1]]
+    previous[first] = start
+    # distance change of every click, ignoring pages which aren't in graph
+    before = _distance(distances, previous)
+    after = _distance(distances, pages)
+    known = (before != UNREACHABLE) & (after != UNREACHABLE)
+    cost = np.where(known, 1 - (before - after), 0)
+    # per member stats
+    member_ids, member_index = np.unique(members, return_inverse=True)
+    clicks = np.bincount(member_index)
+    wasted = np.bincount(member_index, weights=cost).astype(np.int64)
+    distance_left = after[last]
+    # biggest detours, most costly first
+    detours = np.argsort(-cost, kind="stable")[:DETOURS_REPORTED]
+    detours = detours[cost[detours] > 0]
+    return {
+        "optimal_clicks": _to_json(optimal_clicks),
+        "members": {
+            str(member_id): {
+                "clicks": int(clicks[i]),
+                "wasted_clicks": int(wasted[i]),
+                "distance_left": _to_json(distance_left[i]),
+            }
+            for i, member_id in enumerate(member_ids)
+        },
+        "biggest_detours": [
+            {
+                "member": events[i][1],
+                "from": start_page if first[i] else events[i - 1][2],
+                "to": events[i][2],
+                "cost": int(cost[i]),
+            }
+            for i in detours
+        ],
+    }
+
+
+def _distance(distances: np.ndarray, pages: np.ndarray) -> np.ndarray:
+    """
+    Gets distances to target of pages, `UNREACHABLE` for pages not in graph
+    """
+    return np.where(pages >= 0, distances[np.maximum(pages, 0)], UNREACHABLE).astype(
+        np.int16
+    )
+
+
+def _to_json(distance) -> Optional[int]:
+    return None if distance == UNREACHABLE else int(distance)
@@ -1,45 +1,49 @@
 import logging
 import math
+import time
+import uuid
 from typing import Dict, List, Optional
 
-from asgiref.sync import sync_to_async
-from django.db.models import F
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Exists, OuterRef
 from django.forms import model_to_dict
-from django.http import HttpRequest
 from django.utils import timezone
 
+from wiki_app.data.replay import record_click, flush_events
+from wiki_app.data.round_pairs import get_cached_solution
 from wiki_app.models import User, Party, PartyMember, AdminRole, Round, MemberRound
+from wiki_race import metrics
 from wiki_race.settings import (
-    USER_COOKIE_NAME,
+    DEFAULT_WIKI,
     POINTS_FOR_SOLVING,
     MIN_TIME_LIMIT_SECONDS,
     MAX_TIME_LIMIT_SECONDS,
 )
-from wiki_race.wiki_api.parse import compare_titles, solve_round, check_page_exists
+from wiki_race.tracing import sync_to_async
+from wiki_race.wiki_api.parse import (
+    compare_titles,
+    solve_round,
+    resolve_page_ids,
+)
+from wiki_race.wiki_graph.dictionary import normalize_title
+from wiki_race.wikis import check_language
 
 
-def get_user(request: HttpRequest) -> User:
+def ensure_user(user_id: uuid.UUID) -> User:
     """
-    Gets user by user cookie (or creates new user if none found)
+    Creates user with given id, unless it already exists. Uses a single query.
     :return: `User` object
     """
-    # get user_id
-    user_id = request.COOKIES.get(USER_COOKIE_NAME)
-    # if no cookie
-    if user_id is None:
-        # create new user
-        new_user = User()
-        new_user.save()
-        return new_user
-    # try to get saved user
-    # TODO: if invalid, create new user
-    return User.objects.get(uid=user_id)
+    user = User(uid=user_id)
+    User.objects.bulk_create([user], ignore_conflicts=True)
+    return user
 
 
-def create_party(admin_user: User, form: Dict) -> Party:
+def create_party(admin_user_id: uuid.UUID, form: Dict) -> Party:
     """
     Creates new party
-    :param admin_user: host user
+    :param admin_user_id: host user id
     :param form: form submitted via api
     :return: new party
     :raises: KeyError or ValueError if incorrect form data submitted
@@ -49,25 +53,31 @@ def create_party(admin_user: User, form: Dict) -> Party:
     # validate time limit
     if not (MIN_TIME_LIMIT_SECONDS <= time_limit <= MAX_TIME_LIMIT_SECONDS):
         raise ValueError(f"incorrect time limit: {time_limit}")
+    # get and validate wiki language
+    language = check_language(form.get("language", DEFAULT_WIKI))
+    # hints are opt-in
+    hints_enabled = form.get("hints") == "on"
     # get admin's name
     admin_name = form["name"]
+    # create user, if host hasn't played before
+    admin_user = ensure_user(admin_user_id)
     # create party
-    party = Party(time_limit=time_limit)
+    party = Party(time_limit=time_limit, language=language, hints_enabled=hints_enabled)
     party.save()
     # create party member
     member = PartyMember(name=admin_name, user=admin_user, party=party)
     member.save()
     # create admin
     admin_role = AdminRole(party=party, admin_member=member)
-    admin_role.save()
+    admin_role.save(force_insert=True)
     # return party
     return party
 
 
-def join_party(user: User, form: Dict) -> Party:
+def join_party(user_id: uuid.UUID, form: Dict) -> Party:
     """
     Joins party
-    :param user: user to join
+    :param user_id: id of user to join
     :param form: form submitted via api
     :return: game_id
     :raises: Party.DoesNotExist if no such party exists,
@@ -79,57 +89,79 @@ def join_party(user: User, form: Dict) -> Party:
     name = form["name"]
     # get party
     party = Party.objects.get(uid=game_id)
-    # create member
-    PartyMember(user=user, name=name, party=party).save()
+    # create user, if they haven't played before
+    user = ensure_user(user_id)
+    # create member (if user has already joined, keep existing member)
+    PartyMember.objects.get_or_create(user=user, party=party, defaults={"name": name})
     # return party
     return party
 
 
-def is_admin(party: Party, user: User) -> bool:
-    """
-    Checks whether user is an admin (host) in a party.
-    :return: True if admin, false otherwise
+def get_member(party_id: str, user_id: uuid.UUID) -> Optional[PartyMember]:
     """
-    try:
-        return party.adminrole.admin_member.user == user
-    except:
-        return False
-
-
-def get_member(party: Party, user: User) -> Optional[PartyMember]:
-    """
-    Gets party member by user.
+    Gets party member by user with its party, along with `is_admin` flag whether member is an admin (host) in a party.
     :return: `PartyMember` if found, None if no such member in party
     """
-    try:
-        return party.members.get(user=user)
-    except:
-        return
+    return (
+        PartyMember.objects.filter(party_id=party_id, user_id=user_id)
+        .annotate(
+            is_admin=Exists(AdminRole.objects.filter(admin_member=OuterRef("pk")))
+        )
+        .select_related("party")
+        .first()
+    )
 
 
 def new_round(party: Party, data: dict) -> Round:
     """
     Creates new round for party. Doesn't check if previous round has finished.
     """
+    validation_start = time.perf_counter()
     # make round package
     start = data["origin"]
     end = data["target"]
-    if compare_titles(start, end):
+    if normalize_title(start) == normalize_title(end):
+        raise ValueError("Start and end pages must be different!")
+    # validate both pages with a single request
+    page_ids = resolve_page_ids(start, end, language=party.language)
+    if page_ids[start] is not None and page_ids[start] == page_ids[end]:
         raise ValueError("Start and end pages must be different!")
-    if not check_page_exists(start):
+    if page_ids[start] is None:
         raise ValueError(f"Start page {start} doesn't exist")
-    if not check_page_exists(end):
+    if page_ids[end] is None:
         raise ValueError(f"End page {end} doesn't exist")
     # solution will be generated asynchronously separately, see `start_solving`
 
-    # create round
-    party_round = Round(party=party, start_page=start, end_page=end, solution=None)
-    party_round.save()
-    # create member round for each member
-    for member in party.members.all():
-        member_round = MemberRound(member=member, round=party_round, current_page=start)
-        member_round.save()
-    logging.debug(f"New round for {party.uid}")
+    creation_start = time.perf_counter()
+    with transaction.atomic():
+        # get members
+        members = list(party.members.all())
+        # create round
+        party_round = Round(
+            party=party,
+            start_page=start,
+            end_page=end,
+            solution=None,
+            unsolved_members=len(members),
+        )
+        party_round.save()
+        # point party to the new round
+        party.current_round = party_round
+        party.last_active = party_round.start_time
+        party.save(update_fields=["current_round", "last_active"])
+        # create member round for each member
+        MemberRound.objects.bulk_create(
+            [
+                MemberRound(member=member, round=party_round, current_page=start)
+                for member in members
+            ]
+        )
+    creation_end = time.perf_counter()
+    logging.info(
+        f"New round for {party.uid}: "
+        f"validation took {creation_start - validation_start:.3f}s, "
+        f"creation of {len(members)} member rounds took {creation_end - creation_start:.3f}s"
+    )
     # return round
     return party_round
 
@@ -138,7 +170,17 @@ async def start_solving(party_round: Round) -> None:
     """
     Asynchronously solves party round
     """
-    solution = await solve_round(party_round.start_page, party_round.end_page)
+    language = party_round.party.language
+    # round may have been suggested with known solution
+    solution = await sync_to_async(get_cached_solution)(
+        party_round.start_page, party_round.end_page, language
+    )
+    if solution is None:
+        solution = await solve_round(
+            party_round.start_page, party_round.end_page, language
+        )
+    else:
+        metrics.inc("wikirace_solve_round_total", wiki=language, outcome="cached")
     party_round.solution = solution
     await sync_to_async(party_round.save)(update_fields=["solution"])
 
@@ -167,10 +209,14 @@ def generate_leaderboards(party: Party) -> List[dict]:
     Generates leaderboards for party for frontend to display.
     """
     # get admin
-    admin = party.adminrole.admin_member
+    admin_id = party.adminrole.admin_member_id
     # generate
     res = [
-        {"name": member.name, "is_admin": admin == member, "points": member.points}
+        {
+            "name": member.name,
+            "is_admin": admin_id == member.pk,
+            "points": member.points,
+        }
         for member in party.members.all()
     ]
     # TODO: try speeding up with query
@@ -180,16 +226,22 @@ def generate_leaderboards(party: Party) -> List[dict]:
     return res
 
 
-def finish_round(party_round: Round) -> dict:
+def finish_round(party_round: Round) -> Optional[dict]:
     """
-    Finishes party round. Doesn't check whether party round is already finished.
-    :return: finished round info for frontend
+    Finishes party round. Safe to call concurrently: only one caller actually finishes the round.
+    :return: finished round info for frontend, or None if round has already been finished
     """
+    # atomically set running to false, if round is still running
+    finished = Round.objects.filter(pk=party_round.pk, running=True).update(
+        running=False
+    )
     # refresh solution
-    party_round.refresh_from_db()
-    # set running to false
-    party_round.running = False
-    party_round.save(update_fields=["running"])
+    party_round.refresh_from_db(fields=["solution", "running"])
+    # if already finished by someone else, skip
+    if not finished:
+        return
+    # write round events buffered by this worker
+    flush_events(round_id=party_round.pk)
     # generate leaderboards
     leaderboards = generate_leaderboards(party_round.party)
     logging.debug(f"{party_round.party.uid} finished!")
@@ -202,7 +254,7 @@ def get_latest_party_round(party: Party) -> Optional[Round]:
     :return: Latest round, or None if no rounds have been started yet.
     """
     try:
-        return party.rounds.latest("start_time")
+        return Round.objects.select_related("party").get(current_for=party)
     except Round.DoesNotExist:
         pass
 
@@ -212,17 +264,64 @@ def get_latest_member_round(member: PartyMember) -> Optional[MemberRound]:
     Gets latest member round for member
     :return: Latest round, or None if no rounds have been started with this member yet.
     """
-    # get latest party round
-    party_round = get_latest_party_round(member.party)
-    if not party_round:
-        return
-    # get latest member round
+    # get member round of latest party round
     try:
-        return party_round.member_rounds.get(member=member)
+        return MemberRound.objects.select_related("round__party", "member").get(
+            round__current_for=member.party_id, member=member
+        )
     except MemberRound.DoesNotExist:
         pass
 
 
+def party_exists(party_id: str) -> bool:
+    """
+    Checks whether party with given id exists
+    """
+    try:
+        return Party.objects.filter(uid=party_id).exists()
+    except ValidationError:
+        # not a uuid
+        return False
+
+
+def get_member_positions(party_id: str) -> Optional[dict]:
+    """
+    Gets current round and every member's position in it with a single query, for spectators.
+    :return: dict with `round` info and `members` dict of member id to [name, current page, solved],
+     or None if no rounds have been started yet.
+    """
+    member_rounds = MemberRound.objects.filter(round__current_for=party_id).values_list(
+        "member_id",
+        "member__name",
+        "current_page",
+        "solved_at",
+        "round__start_page",
+        "round__end_page",
+        "round__running",
+    )
+    res = None
+    for (
+        member_id,
+        name,
+        page,
+        solved_at,
+        start_page,
+        end_page,
+        running,
+    ) in member_rounds:
+        if res is None:
+            res = {
+                "round": {
+                    "start_page": start_page,
+                    "end_page": end_page,
+                    "running": running,
+                },
+                "members": {},
+            }
+        res["members"][str(member_id)] = [name, page, solved_at != -1]
+    return res
+
+
 def get_left_seconds(party_round: Round) -> int:
     """
     Gets seconds left to round end.
@@ -233,27 +332,51 @@ def get_left_seconds(party_round: Round) -> int:
     return party_round.party.time_limit - seconds_since_start
 
 
-def member_click(member_round: MemberRound, clicked_page: str) -> bool:
+def member_click(
+    member_round: MemberRound, clicked_page: str, language: str = DEFAULT_WIKI
+) -> bool:
     """
     Logic for member click FIXME
     :param member_round: member round
     :param clicked_page: wiki page title, member has clicked on
+    :param language: language of party's wiki
     :return: true if now solved, false if not yet solved
     """
+    party_round = member_round.round
     # check if member solved
-    member_solved = compare_titles(clicked_page, member_round.round.end_page)
+    member_solved = compare_titles(clicked_page, party_round.end_page, language)
     if member_solved:
-        # save time
-        member_round.solved_at = get_left_seconds(member_round.round)
-        # calculate points
-        member_round.member.points = (
-            F("points") + POINTS_FOR_SOLVING + member_round.solved_at
-        )
-        member_round.member.save(update_fields=["points"])
-
-    # update current page
-    member_round.current_page = clicked_page
-    member_round.save(update_fields=["solved_at", "current_page"])
+        with transaction.atomic():
+            # save time and page, only if member hasn't solved yet (guards against concurrent clicks)
+            solved_at = get_left_seconds(party_round)
+            member_solved = (
+                MemberRound.objects.filter(pk=member_round.pk, solved_at=-1).update(
+                    solved_at=solved_at, current_page=clicked_page
+                )
+                == 1
+            )
+            if member_solved:
+                member_round.solved_at = solved_at
+                member_round.current_page = clicked_page
+                # calculate points
+                member_round.member.points = (
+                    F("points") + POINTS_FOR_SOLVING + member_round.solved_at
+                )
+                member_round.member.save(update_fields=["points"])
+                # decrement unsolved members counter, row stays locked until commit
+                Round.objects.filter(pk=party_round.pk).update(
+                    unsolved_members=F("unsolved_members") - 1
+                )
+                party_round.unsolved_members = Round.objects.values_list(
+                    "unsolved_members", flat=True
+                ).get(pk=party_round.pk)
+    else:
+        # update current page
+        member_round.current_page = clicked_page
+        member_round.save(update_fields=["current_page"])
+    # append click to round event log, unless it has been ignored
+    if member_round.current_page == clicked_page:
+        record_click(member_round, clicked_page)
 
     logging.debug(f"Member {member_round.member.name} clicked on {clicked_page}")
 
@@ -262,20 +385,28 @@ def member_click(member_round: MemberRound, clicked_page: str) -> bool:
 
 def have_all_solved(party_round: Round) -> bool:
     """
-    Checks whether every member in party has solved the wikirace
+    Checks whether every member in party has solved the wikirace.
+    Uses unsolved members counter, which is refreshed by `member_click` on solve, so no query is made.
     """
-    return party_round.member_rounds.filter(solved_at=-1).count() == 0
+    return party_round.unsolved_members <= 0
 
 
 def get_or_create_member_round(party_round: Round, member: PartyMember) -> MemberRound:
     """
     Get or create member round for member.
     """
-    return MemberRound.objects.get_or_create(
-        round=party_round,
-        member=member,
-        defaults={"current_page": party_round.start_page},
-    )[0]
+    with transaction.atomic():
+        member_round, created = MemberRound.objects.get_or_create(
+            round=party_round,
+            member=member,
+            defaults={"current_page": party_round.start_page},
+        )
+        # late join, one more member has to solve
+        if created:
+            Round.objects.filter(pk=party_round.pk).update(
+                unsolved_members=F("unsolved_members") + 1
+            )
+    return member_round
 
 
 def check_if_time_ran_out(party_round: Round) -> bool:
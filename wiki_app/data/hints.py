@@ -0,0 +1,160 @@
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from wiki_race import metrics
+from wiki_race.settings import DEFAULT_WIKI
+from wiki_race.wiki_graph.graph import UNREACHABLE, get_link_graph
+
+
+class DistanceCache:
+    """
+    Distance-to-target arrays of running rounds in this worker, see `LinkGraph.distances_to`.
+    Rounds with the same target share an array, which is evicted when the last of them has ended.
+    """
+
+    def __init__(self):
+        self.arrays: Dict[Tuple[str, str], np.ndarray] = {}
+        """
+        Distance arrays by wiki language and target title
+        """
+        self.targets: Dict[str, Tuple[str, str]] = {}
+        """
+        Wiki languages and targets of running rounds by party id
+        """
+        self.hints_taken: Dict[str, Counter] = {}
+        """
+        Amount of pages hinted to each member in running rounds by party id and member id
+        """
+        self.lock = threading.Lock()
+
+    def get(self, party_id: str) -> Optional[np.ndarray]:
+        """
+        Gets distance array of party's running round, if it has been computed in this worker
+        """
+        with self.lock:
+            target = self.targets.get(party_id)
+            return self.arrays.get(target)
+
+    def acquire(
+        self, party_id: str, target: str, language: str = DEFAULT_WIKI
+    ) -> Optional[np.ndarray]:
+        """
+        Gets distance array for party's new round, computing it if no other round has the same target
+        :param language: language of party's wiki
+        :return: distance array, or None if there is no local link graph, or target isn't in it
+        """
+        key = (language, target)
+        with self.lock:
+            if key in self.arrays:
+                return self._assign(party_id, key)
+        graph = get_link_graph(language)
+        if graph is None or graph.get_id(target) == -1:
+            return
+        # compute outside of lock, so that hints of other rounds aren't blocked
+        distances = graph.distances_to(graph.get_id(target))
+        with self.lock:
+            distances = self._assign(party_id, key, distances)
+        logging.info(f"Hint distances computed: {self.memory()}")
+        return distances
+
+    def take_hints(self, party_id: str, member_id: int, pages: int) -> bool:
+        """
+        Counts hinted pages against member's budget for party's running round in this worker
+        :return: true if member may get hints for given amount of pages, false if budget is exceeded
+        """
+        with self.lock:
+            taken = self.hints_taken.setdefault(party_id, Counter())
+            if taken[member_id] + pages > HINT_PAGES_PER_ROUND:
+                return False
+            taken[member_id] += pages
+            return True
+
+    def release(self, party_id: str) -> None:
+        """
+        Removes party's round, evicting its distance array if no other round has the same target
+        """
+        with self.lock:
+            self._release(party_id)
+
+    def _assign(
+        self,
+        party_id: str,
+        target: Tuple[str, str],
+        distances: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        Sets party's round target, evicting distance array of its previous target if it's unused
+        """
+        previous = self.targets.get(party_id)
+        self.targets[party_id] = target
+        # party's new round starts with fresh hint budgets
+        self.hints_taken.pop(party_id, None)
+        if distances is not None:
+            self.arrays.setdefault(target, distances)
+        if previous not in (None, target) and previous not in self.targets.values():
+            del self.arrays[previous]
+        return self.arrays[target]
+
+    def _release(self, party_id: str) -> None:
+        self.hints_taken.pop(party_id, None)
+        target = self.targets.pop(party_id, None)
+        if target is not None and target not in self.targets.values():
+            del self.arrays[target]
+
+    def memory(self) -> dict:
+        """
+        Reports memory used by distance arrays
+        :return: dict with amount of `rounds`, distinct `targets`, total `bytes` and `bytes_per_round`
+        """
+        with self.lock:
+            total = sum(x.nbytes for x in self.arrays.values())
+            rounds = len(self.targets)
+            targets = len(self.arrays)
+        return {
+            "rounds": rounds,
+            "targets": targets,
+            "bytes": total,
+            "bytes_per_round": total // max(rounds, 1),
+        }
+
+
+distance_cache = DistanceCache()
+
+
+def _collect_memory() -> None:
+    memory = distance_cache.memory()
+    for key in ["rounds", "targets", "bytes"]:
+        metrics.set_value(f"wikirace_hint_{key}", memory[key])
+
+
+metrics.add_collector(_collect_memory)
+
+MAX_HINT_PAGES = 3
+"""
+Max amount of pages in a single hint request, so that hints can't rank all links of a page at once
+"""
+HINT_PAGES_PER_ROUND = 10
+"""
+Max amount of pages hinted to a member in a round
+"""
+
+
+def get_hints(
+    distances: np.ndarray, pages: List[str], language: str = DEFAULT_WIKI
+) -> Dict[str, Optional[int]]:
+    """
+    Looks up distances to target of given pages
+    :param language: language of wiki, which distances have been computed in
+    :return: dict of distances by page title, None if page isn't in graph or target can't be reached from it
+    """
+    graph = get_link_graph(language)
+    hints = {}
+    for page in pages:
+        page_id = graph.get_id(page)
+        distance = UNREACHABLE if page_id == -1 else distances[page_id]
+        hints[page] = None if distance == UNREACHABLE else int(distance)
+    return hints
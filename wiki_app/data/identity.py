@@ -0,0 +1,77 @@
+import uuid
+from typing import Optional
+
+from django.core import signing
+from django.http import HttpRequest, HttpResponse
+
+from wiki_app.models import User
+from wiki_race.settings import USER_COOKIE_NAME, PARTY_RETENTION_HOURS
+
+USER_COOKIE_SALT = "wiki_app.user"
+"""
+Salt of signed user cookie
+"""
+MEMBER_TOKEN_SALT = "wiki_app.member"
+"""
+Salt of signed member token, used for connecting to game websocket
+"""
+
+
+def get_user_id(request: HttpRequest) -> uuid.UUID:
+    """
+    Gets user id from signed user cookie (or generates new user id if none found).
+    Doesn't create `User`, users are created on joining a party, see `ensure_user`.
+    :return: user id
+    """
+    try:
+        return uuid.UUID(
+            request.get_signed_cookie(USER_COOKIE_NAME, salt=USER_COOKIE_SALT)
+        )
+    except KeyError:
+        # if no cookie, generate new user id
+        return uuid.uuid4()
+    except (signing.BadSignature, ValueError):
+        # cookies set before user ids were signed contain plain user id
+        return _get_legacy_user_id(request) or uuid.uuid4()
+
+
+def _get_legacy_user_id(request: HttpRequest) -> Optional[uuid.UUID]:
+    """
+    Gets user id from unsigned user cookie, if such user exists
+    """
+    try:
+        user_id = uuid.UUID(request.COOKIES[USER_COOKIE_NAME])
+    except ValueError:
+        return
+    if User.objects.filter(uid=user_id).exists():
+        return user_id
+
+
+def set_user_cookie(response: HttpResponse, user_id: uuid.UUID) -> None:
+    """
+    Sets signed user cookie
+    """
+    response.set_signed_cookie(USER_COOKIE_NAME, str(user_id), salt=USER_COOKIE_SALT)
+
+
+def make_member_token(party_id: str, member_id: int, is_admin: bool) -> str:
+    """
+    Makes signed token, identifying party member on game websocket connection
+    """
+    return signing.dumps(
+        {"party": str(party_id), "member": member_id, "admin": is_admin},
+        salt=MEMBER_TOKEN_SALT,
+    )
+
+
+def load_member_token(token: str) -> Optional[dict]:
+    """
+    Verifies member token. Tokens expire with party retention, so that a leaked token isn't valid forever.
+    :return: dict with `party` id, `member` id and `admin` flag, or None if token is invalid or expired
+    """
+    try:
+        return signing.loads(
+            token, salt=MEMBER_TOKEN_SALT, max_age=PARTY_RETENTION_HOURS * 3600
+        )
+    except signing.BadSignature:
+        return
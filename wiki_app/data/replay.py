@@ -0,0 +1,213 @@
+import logging
+import sys
+import threading
+import time
+from array import array
+from datetime import timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from wiki_app.models import MemberRound, Round, RoundEventBatch, RoundEventBuffer
+from wiki_race.settings import REPLAY_BATCH_SIZE, REPLAY_FLUSH_SECONDS
+
+
+class _EventBuffer:
+    """
+    Click events of a round recorded by this worker, but not yet written to database
+    """
+
+    def __init__(self, round_id: int, party_id: str):
+        self.round_id = round_id
+        self.party_id = party_id
+        self.members: Dict[int, int] = {}
+        """
+        Member indices by member id
+        """
+        self.pages: Dict[str, int] = {}
+        """
+        Page indices by title
+        """
+        self.events = array("I")
+        self.created_at = time.monotonic()
+        self.marker_id: Optional[int] = None
+        """
+        Id of `RoundEventBuffer` announcing the buffer to other workers
+        """
+
+    def __len__(self) -> int:
+        return len(self.events) // 3
+
+    def append(self, member_id: int, page: str, offset: int) -> None:
+        member_index = self.members.setdefault(member_id, len(self.members))
+        page_index = self.pages.setdefault(page, len(self.pages))
+        self.events.extend((member_index, page_index, offset))
+
+    def to_batch(self) -> RoundEventBatch:
+        events = array("I", self.events)
+        if sys.byteorder == "big":
+            events.byteswap()
+        return RoundEventBatch(
+            round_id=self.round_id,
+            members=list(self.members),
+            pages=list(self.pages),
+            events=events.tobytes(),
+            first_offset=min(self.events[2::3]),
+            last_offset=max(self.events[2::3]),
+        )
+
+
+_buffers: Dict[int, _EventBuffer] = {}
+"""
+Event buffers of this worker by round id
+"""
+_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+"""
+Thread writing buffers once they are old enough, even if no more events are recorded in this worker
+"""
+
+
+def _write(buffers: List[_EventBuffer]) -> None:
+    """
+    Writes buffers to database, deleting their markers, so that they are no longer pending in their rounds
+    """
+    with transaction.atomic():
+        RoundEventBatch.objects.bulk_create([x.to_batch() for x in buffers])
+        RoundEventBuffer.objects.filter(
+            pk__in=[x.marker_id for x in buffers if x.marker_id is not None]
+        ).delete()
+
+
+def _flush_old_buffers(created_before: float) -> None:
+    """
+    Writes buffers created before given monotonic time
+    """
+    with _lock:
+        buffers = [
+            _buffers.pop(key)
+            for key, buffer in list(_buffers.items())
+            if buffer.created_at < created_before
+        ]
+    if buffers:
+        _write(buffers)
+
+
+def _flush_periodically() -> None:
+    """
+    Loop of flusher thread
+    """
+    while True:
+        time.sleep(REPLAY_FLUSH_SECONDS / 2)
+        try:
+            _flush_old_buffers(time.monotonic() - REPLAY_FLUSH_SECONDS)
+        except Exception as e:
+            logging.error(e)
+        finally:
+            # flusher thread has its own connection
+            connection.close()
+
+
+def record_click(member_round: MemberRound, clicked_page: str) -> None:
+    """
+    Appends click to round event log. Events are buffered and written in batches,
+     when buffer is full or old enough, or when round is finished.
+    """
+    global _flusher
+    party_round = member_round.round
+    offset = int((timezone.now() - party_round.start_time).total_seconds() * 1000)
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_periodically, daemon=True)
+            _flusher.start()
+        new_buffer = party_round.pk not in _buffers
+        if new_buffer:
+            _buffers[party_round.pk] = _EventBuffer(
+                party_round.pk, str(party_round.party_id)
+            )
+        buffer = _buffers[party_round.pk]
+        buffer.append(member_round.member_id, clicked_page, max(offset, 0))
+        # check if buffer has to be written
+        full = len(buffer) >= REPLAY_BATCH_SIZE
+        if full:
+            del _buffers[party_round.pk]
+    if new_buffer:
+        # round analytics wait for buffer to be written, or for its marker to expire if this worker dies.
+        # Flusher writes buffers at most one and a half flush periods old
+        buffer.marker_id = RoundEventBuffer.objects.create(
+            round_id=party_round.pk,
+            expires_at=timezone.now() + timedelta(seconds=REPLAY_FLUSH_SECONDS * 2),
+        ).pk
+    if full:
+        _write([buffer])
+
+
+def flush_events(
+    party_id: Optional[str] = None, round_id: Optional[int] = None
+) -> None:
+    """
+    Writes buffered events of given party or round to database
+    """
+    with _lock:
+        buffers = [
+            _buffers.pop(key)
+            for key, buffer in list(_buffers.items())
+            if buffer.party_id == party_id or key == round_id
+        ]
+    if buffers:
+        _write(buffers)
+
+
+def has_pending_events(round_id: int) -> bool:
+    """
+    Checks whether any live worker still holds unwritten events of round
+    """
+    return RoundEventBuffer.objects.filter(
+        round_id=round_id, expires_at__gt=timezone.now()
+    ).exists()
+
+
+def get_replay_info(party_id: str, round_id: int) -> Optional[dict]:
+    """
+    Gets info about finished round of given party for replay
+    :return: dict with round's `start_page`, `end_page`, and `members` names by id, or None if no such finished round
+    """
+    try:
+        party_round = Round.objects.get(pk=round_id, party_id=party_id, running=False)
+    except (Round.DoesNotExist, ValueError):
+        return
+    members = party_round.member_rounds.values_list("member_id", "member__name")
+    return {
+        "start_page": party_round.start_page,
+        "end_page": party_round.end_page,
+        "members": {str(member_id): name for member_id, name in members},
+    }
+
+
+def get_batch_offsets(round_id: int) -> List[Tuple[int, int]]:
+    """
+    Gets round's event batches without loading events
+    :return: list of batch ids with their first event offset, in order of first event offset
+    """
+    return list(
+        RoundEventBatch.objects.filter(round_id=round_id)
+        .order_by("first_offset", "pk")
+        .values_list("pk", "first_offset")
+    )
+
+
+def load_batch(batch_id: int) -> List[Tuple[int, int, str]]:
+    """
+    Loads and unpacks events of a single batch
+    :return: list of events: milliseconds since round start, member id and page title, in time order
+    """
+    batch = RoundEventBatch.objects.get(pk=batch_id)
+    events = array("I")
+    events.frombytes(bytes(batch.events))
+    if sys.byteorder == "big":
+        events.byteswap()
+    return sorted(
+        (events[i + 2], batch.members[events[i]], batch.pages[events[i + 1]])
+        for i in range(0, len(events), 3)
+    )
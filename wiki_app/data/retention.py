@@ -0,0 +1,156 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from django.db import transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q, QuerySet
+from django.utils import timezone
+
+from wiki_app.models import User, Party, Round, RoundSummary
+from wiki_race.settings import MAX_TIME_LIMIT_SECONDS
+
+
+def _delete_in_batches(queryset: QuerySet, batch_size: int, pause: float) -> int:
+    """
+    Deletes objects matching queryset in small transactions, so that no long locks are held.
+    :param pause: seconds to sleep between batches, letting other queries through
+    :return: amount of deleted objects (not counting cascades)
+    """
+    deleted = 0
+    while True:
+        pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            # filter again, as objects could have become active since being selected
+            queryset.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        time.sleep(pause)
+
+
+def _rounds_with_stats(rounds: QuerySet) -> QuerySet:
+    """
+    :return: given rounds which can't be running anymore, annotated with fields needed for their summaries
+    """
+    # round may run at most for max time limit
+    started_before = timezone.now() - timedelta(seconds=MAX_TIME_LIMIT_SECONDS)
+    solved = ~Q(member_rounds__solved_at=-1)
+    return (
+        rounds.filter(start_time__lt=started_before)
+        .annotate(
+            members_count=Count("member_rounds"),
+            solved_count=Count("member_rounds", filter=solved),
+            best_solved_at=Max("member_rounds__solved_at", filter=solved),
+        )
+        .order_by("start_time")
+    )
+
+
+def _replace_with_summaries(batch: List[Round]):
+    """
+    Creates summaries of given rounds annotated by `_rounds_with_stats` and deletes the rounds with their member rounds
+    """
+    RoundSummary.objects.bulk_create(
+        [
+            RoundSummary(
+                start_page=party_round.start_page,
+                end_page=party_round.end_page,
+                start_time=party_round.start_time,
+                members_count=party_round.members_count,
+                solved_count=party_round.solved_count,
+                best_solved_at=party_round.best_solved_at,
+            )
+            for party_round in batch
+        ]
+    )
+    Round.objects.filter(pk__in=[x.pk for x in batch]).delete()
+
+
+def compact_finished_rounds(
+    started_before: datetime, batch_size: int, pause: float = 0
+) -> int:
+    """
+    Replaces rounds started before given time with `RoundSummary` records, deleting their member rounds.
+    Parties' history is compacted whether they are active or not, but rounds which may still be running
+     and current rounds of parties are never compacted, as parties show their results.
+    :return: amount of compacted rounds
+    """
+    rounds = _rounds_with_stats(
+        Round.objects.filter(start_time__lt=started_before).exclude(
+            Exists(Party.objects.filter(current_round=OuterRef("pk")))
+        )
+    )
+    compacted = 0
+    while True:
+        batch = list(rounds[:batch_size])
+        if not batch:
+            return compacted
+        with transaction.atomic():
+            _replace_with_summaries(batch)
+        compacted += len(batch)
+        time.sleep(pause)
+
+
+def delete_idle_parties(
+    inactive_since: datetime, batch_size: int, pause: float = 0
+) -> int:
+    """
+    Deletes parties which haven't started a round since given time, along with their members and rounds.
+    Remaining rounds of deleted parties (e.g. their current rounds) are summarized first.
+    :return: amount of deleted parties
+    """
+    parties = Party.objects.filter(last_active__lt=inactive_since)
+    deleted = 0
+    while True:
+        pks = list(parties.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            # lock and filter again, as parties could have become active since being selected
+            pks = list(
+                parties.filter(pk__in=pks)
+                .select_for_update()
+                .values_list("pk", flat=True)
+            )
+            _replace_with_summaries(
+                list(_rounds_with_stats(Round.objects.filter(party__in=pks)))
+            )
+            Party.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        time.sleep(pause)
+
+
+def delete_orphan_users(
+    created_before: datetime, batch_size: int, pause: float = 0
+) -> int:
+    """
+    Deletes users created before given time, who aren't members of any party.
+    :return: amount of deleted users
+    """
+    return _delete_in_batches(
+        User.objects.filter(created_at__lt=created_before, partymember__isnull=True),
+        batch_size,
+        pause,
+    )
+
+
+def prune_history(
+    round_ttl: timedelta,
+    party_ttl: timedelta,
+    user_ttl: timedelta,
+    batch_size: int,
+    pause: float = 0,
+) -> dict:
+    """
+    Prunes game history: compacts old rounds, deletes idle parties and orphan users.
+    :return: amount of pruned objects by kind
+    """
+    now = timezone.now()
+    res = {
+        "rounds": compact_finished_rounds(now - round_ttl, batch_size, pause),
+        "parties": delete_idle_parties(now - party_ttl, batch_size, pause),
+        "users": delete_orphan_users(now - user_ttl, batch_size, pause),
+    }
+    logging.info(f"Pruned history: {res}")
+    return res
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import random
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from wiki_app.models import RoundPair
+from wiki_race.settings import (
+    DEFAULT_WIKI,
+    ROUND_PAIR_POOL_SIZE,
+    SOLUTION_CACHE_SECONDS,
+)
+from wiki_race.wiki_api.parse import (
+    can_solve,
+    random_round_path,
+    standardize_wiki_title,
+)
+from wiki_race.wiki_graph.graph import get_link_graph
+
+DIFFICULTIES = {
+    "easy": (2, 2),
+    "medium": (3, 4),
+    "hard": (5, 6),
+}
+"""
+Ranges of shortest solution length in clicks (inclusive) by difficulty name
+"""
+
+
+def get_difficulty(clicks: int) -> Optional[str]:
+    """
+    Gets difficulty of round with given shortest solution length
+    """
+    for difficulty, (low, high) in DIFFICULTIES.items():
+        if low <= clicks <= high:
+            return difficulty
+
+
+def take_round_pair(
+    difficulty: str, language: str = DEFAULT_WIKI
+) -> Optional[RoundPair]:
+    """
+    Takes pair from pool of wiki, caching its solution for the round it will be used in
+    :return: round pair, or None if pool of given difficulty is empty
+    """
+    with transaction.atomic():
+        pair = (
+            RoundPair.objects.select_for_update(skip_locked=True)
+            .filter(language=language, difficulty=difficulty)
+            .order_by("pk")
+            .first()
+        )
+        if pair is None:
+            return
+        pair.delete()
+    cache_solution(pair.start_page, pair.end_page, pair.solution, language)
+    return pair
+
+
+def _solution_cache_key(start: str, end: str, language: str) -> str:
+    titles = f"{standardize_wiki_title(start)}|{standardize_wiki_title(end)}"
+    return f"solution:{language}:" + hashlib.sha1(titles.encode("utf-8")).hexdigest()
+
+
+def cache_solution(
+    start: str, end: str, solution: List[str], language: str = DEFAULT_WIKI
+) -> None:
+    cache.set(
+        _solution_cache_key(start, end, language), solution, SOLUTION_CACHE_SECONDS
+    )
+
+
+def get_cached_solution(
+    start: str, end: str, language: str = DEFAULT_WIKI
+) -> Optional[List[str]]:
+    """
+    Gets known solution of round, e.g. if it has been suggested from pool
+    """
+    return cache.get(_solution_cache_key(start, end, language))
+
+
+def generate_paths(needed: List[str], language: str = DEFAULT_WIKI) -> List[List[str]]:
+    """
+    Generates shortest paths of needed difficulties in wiki of given language.
+    With local link graph, a single reverse BFS from random target gives a path of every needed difficulty,
+     otherwise a path is made with wiki apis, see `random_round_path`.
+    :return: list of paths, as page titles (ends inclusive)
+    """
+    graph = get_link_graph(language)
+    if graph is None:
+        _, high = DIFFICULTIES[random.choice(needed)]
+        return [async_to_sync(random_round_path)(high, language)]
+    distances = graph.distances_to(random.randrange(graph.size))
+    paths = []
+    for difficulty in needed:
+        low, high = DIFFICULTIES[difficulty]
+        starts = np.flatnonzero((distances >= low) & (distances <= high))
+        if starts.size:
+            path = graph.shortest_path(int(random.choice(starts)), distances)
+            paths.append([graph.titles[x] for x in path])
+    return paths
+
+
+def refill_pool(
+    size: int = ROUND_PAIR_POOL_SIZE,
+    max_attempts: int = 100,
+    language: str = DEFAULT_WIKI,
+) -> int:
+    """
+    Generates round pairs of wiki until there are `size` pairs of every difficulty
+    :return: amount of generated pairs
+    """
+    if not can_solve(language):
+        logging.info(
+            f"Round pairs of {language} can't be generated without its link graph"
+        )
+        return 0
+    counts: Dict[str, int] = {difficulty: 0 for difficulty in DIFFICULTIES}
+    pool = RoundPair.objects.filter(language=language)
+    for difficulty in pool.values_list("difficulty", flat=True):
+        counts[difficulty] = counts.get(difficulty, 0) + 1
+    generated = 0
+    for _ in range(max_attempts):
+        needed = [x for x in DIFFICULTIES if counts[x] < size]
+        if not needed:
+            break
+        try:
+            paths = generate_paths(needed, language)
+        except Exception as e:
+            logging.warning("Unable to generate round pair", exc_info=e)
+            continue
+        pairs = []
+        for path in paths:
+            difficulty = get_difficulty(len(path) - 1)
+            if difficulty in needed and counts[difficulty] < size:
+                counts[difficulty] += 1
+                pairs.append(
+                    RoundPair(
+                        start_page=path[0],
+                        end_page=path[-1],
+                        difficulty=difficulty,
+                        language=language,
+                        solution=path,
+                    )
+                )
+        RoundPair.objects.bulk_create(pairs)
+        generated += len(pairs)
+    return generated
+
+
+_refill_threads: Dict[str, threading.Thread] = {}
+"""
+Threads refilling pools by wiki language
+"""
+_refill_lock = threading.Lock()
+
+
+def _refill(language: str) -> None:
+    try:
+        generated = refill_pool(language=language)
+        logging.info(f"Round pair pool of {language} refilled with {generated} pairs")
+    except Exception as e:
+        logging.error(e)
+    finally:
+        connection.close()
+
+
+def ensure_refilling(language: str = DEFAULT_WIKI) -> None:
+    """
+    Starts refilling pool of wiki in background thread of this worker, unless it's already being refilled
+    """
+    with _refill_lock:
+        thread = _refill_threads.get(language)
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_refill, args=(language,), daemon=True)
+        _refill_threads[language] = thread
+        thread.start()
@@ -0,0 +1,11 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+
+DROP TABLE IF EXISTS `linktarget`;
+CREATE TABLE `linktarget` (
+  `lt_id` bigint(20) unsigned NOT NULL AUTO_INCREMENT,
+  `lt_namespace` int(11) NOT NULL,
+  `lt_title` varbinary(255) NOT NULL,
+  PRIMARY KEY (`lt_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+INSERT INTO `linktarget` VALUES (101,0,'Cheese'),(102,0,'Cow'),(103,1,'Milk'),(104,0,'Dairy_cattle'),(105,0,'Milk'),(106,0,'Cow\'s_milk'),(107,0,'Mozzarella'),(108,0,'Loop_A'),(109,0,'Nonexistent'),(110,0,'Milch');
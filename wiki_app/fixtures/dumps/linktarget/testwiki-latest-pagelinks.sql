@@ -0,0 +1,12 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+
+DROP TABLE IF EXISTS `pagelinks`;
+CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_target_id` bigint(20) unsigned NOT NULL,
+  PRIMARY KEY (`pl_from`,`pl_target_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+INSERT INTO `pagelinks` VALUES (1,0,101),(1,0,102),(1,0,103),(2,0,104),(2,0,105),(3,0,106),(3,0,107),(4,0,108);
+INSERT INTO `pagelinks` VALUES (4,0,109),(5,0,101),(7,1,102),(10,0,101),(11,0,110);
@@ -0,0 +1,24 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+--
+-- Host: db1206    Database: testwiki
+
+DROP TABLE IF EXISTS `page`;
+CREATE TABLE `page` (
+  `page_id` int(8) unsigned NOT NULL AUTO_INCREMENT,
+  `page_namespace` int(11) NOT NULL DEFAULT 0,
+  `page_title` varbinary(255) NOT NULL DEFAULT '',
+  `page_is_redirect` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_is_new` tinyint(1) unsigned NOT NULL DEFAULT 0,
+  `page_random` double unsigned NOT NULL DEFAULT 0,
+  `page_touched` binary(14) NOT NULL,
+  `page_links_updated` varbinary(14) DEFAULT NULL,
+  `page_latest` int(8) unsigned NOT NULL DEFAULT 0,
+  `page_len` int(8) unsigned NOT NULL DEFAULT 0,
+  `page_content_model` varbinary(32) DEFAULT NULL,
+  `page_lang` varbinary(35) DEFAULT NULL,
+  PRIMARY KEY (`page_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+INSERT INTO `page` VALUES (1,0,'Milk',0,0,0.8,'20240101000000','20240101000000',11,1200,'wikitext',NULL),(2,0,'Cow',0,0,0.1,'20240101000000','20240101000000',12,900,'wikitext',NULL),(3,0,'Cheese',0,0,0.5,'20240101000000',NULL,13,800,'wikitext',NULL),(4,0,'Mozzarella',0,0,0.3,'20240101000000','20240101000000',14,500,'wikitext',NULL),(5,0,'Cow\'s_milk',1,0,0.2,'20240101000000','20240101000000',15,20,'wikitext',NULL);
+INSERT INTO `page` VALUES (6,0,'Dairy_cattle',1,0,0.6,'20240101000000','20240101000000',16,20,'wikitext',NULL),(7,1,'Milk',0,0,0.7,'20240101000000','20240101000000',17,300,'wikitext',NULL),(8,0,'Loop_A',1,0,0.4,'20240101000000','20240101000000',18,20,'wikitext',NULL),(9,0,'Loop_B',1,0,0.9,'20240101000000','20240101000000',19,20,'wikitext',NULL),(10,0,'Farmers\'_market_(1,2)',0,0,0.15,'20240101000000','20240101000000',20,700,'wikitext',NULL),(11,0,'Молоко',0,0,0.25,'20240101000000','20240101000000',21,600,'wikitext',NULL),(12,0,'Milch',1,0,0.35,'20240101000000','20240101000000',22,20,'wikitext',NULL);
+/*!40000 ALTER TABLE `page` ENABLE KEYS */;
@@ -0,0 +1,13 @@
+-- MySQL dump 10.19  Distrib 10.3.38-MariaDB, for debian-linux-gnu (x86_64)
+
+DROP TABLE IF EXISTS `pagelinks`;
+CREATE TABLE `pagelinks` (
+  `pl_from` int(8) unsigned NOT NULL DEFAULT 0,
+  `pl_namespace` int(11) NOT NULL DEFAULT 0,
+  `pl_title` varbinary(255) NOT NULL DEFAULT '',
+  `pl_from_namespace` int(11) NOT NULL DEFAULT 0,
+  PRIMARY KEY (`pl_from`,`pl_namespace`,`pl_title`)
+) ENGINE=InnoDB DEFAULT CHARSET=binary;
+
+INSERT INTO `pagelinks` VALUES (1,0,'Cheese',0),(1,0,'Cow',0),(1,1,'Milk',0),(2,0,'Dairy_cattle',0),(2,0,'Milk',0),(3,0,'Cow\'s_milk',0),(3,0,'Mozzarella',0),(4,0,'Loop_A',0);
+INSERT INTO `pagelinks` VALUES (4,0,'Nonexistent',0),(5,0,'Cheese',0),(7,0,'Cow',1),(10,0,'Cheese',0),(11,0,'Milch',0);
@@ -0,0 +1,70 @@
+from aiohttp import web
+from django.core.management.base import BaseCommand
+
+from wiki_race.wiki_api.standin import (
+    UPSTREAM_SDOW_API,
+    UPSTREAM_WIKI_API,
+    Cassette,
+    StandIn,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs local stand-in for wiki and six degrees of wikipedia apis, replaying responses from cassette. "
+        "Point WIKI_API to http://HOST:PORT/w/api.php and SDOW_API to http://HOST:PORT to use it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("cassette", help="cassette file (.jsonl or .jsonl.gz)")
+        parser.add_argument(
+            "--record",
+            action="store_true",
+            help="forward requests missing from cassette upstream and record them",
+        )
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--wiki-api", default=UPSTREAM_WIKI_API, help="upstream wiki api"
+        )
+        parser.add_argument(
+            "--sdow-api", default=UPSTREAM_SDOW_API, help="upstream sdow api"
+        )
+        parser.add_argument(
+            "--latency-ms", type=float, default=0, help="mean response delay"
+        )
+        parser.add_argument(
+            "--jitter-ms", type=float, default=0, help="max deviation of delay"
+        )
+        parser.add_argument(
+            "--error-rate",
+            type=float,
+            default=0,
+            help="probability of responding with 503 error",
+        )
+        parser.add_argument(
+            "--seed", type=int, help="seed of injected delays and errors"
+        )
+
+    def handle(self, *args, **options):
+        cassette = Cassette(options["cassette"])
+        standin = StandIn(
+            cassette,
+            record=options["record"],
+            wiki_api=options["wiki_api"],
+            sdow_api=options["sdow_api"],
+            latency=options["latency_ms"] / 1000,
+            jitter=options["jitter_ms"] / 1000,
+            error_rate=options["error_rate"],
+            seed=options["seed"],
+        )
+        self.stdout.write(f"Replaying {len(cassette.responses)} responses")
+        app = standin.make_app()
+
+        async def on_cleanup(_):
+            if options["record"]:
+                cassette.save()
+            self.stdout.write(f"Stand-in stats: {dict(standin.stats)}")
+
+        app.on_cleanup.append(on_cleanup)
+        web.run_app(app, host=options["host"], port=options["port"])
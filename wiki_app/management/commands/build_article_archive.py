@@ -0,0 +1,75 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from wiki_race.settings import DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_api.archive import CLUSTER_SIZE, ArchiveWriter
+from wiki_race.wiki_api.sources import WikiApiSource
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds local article archive of rendered pages and their links, loading them from wiki api. "
+        "Titles leading to an already archived page are added as redirects."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("titles", help="file with a page title per line")
+        parser.add_argument(
+            "--wiki",
+            default=DEFAULT_WIKI,
+            choices=sorted(WIKIS),
+            help="language of wiki to load pages from",
+        )
+        parser.add_argument(
+            "--output",
+            help="article archive directory (default is the wiki's configured one)",
+        )
+        parser.add_argument(
+            "--cluster-size",
+            type=int,
+            default=CLUSTER_SIZE,
+            help="uncompressed bytes of articles compressed together",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=4, help="parallel wiki api requests"
+        )
+
+    def handle(self, *args, **options):
+        options["output"] = (
+            options["output"] or WIKIS[options["wiki"]]["article_archive"]
+        )
+        if not options["output"]:
+            raise CommandError("article archive directory is required")
+        with open(options["titles"], encoding="utf-8") as f:
+            titles = [x.strip() for x in f if x.strip()]
+        with ArchiveWriter(options["output"], options["cluster_size"]) as writer:
+            missing = asyncio.run(
+                self.archive(titles, writer, options["concurrency"], options["wiki"])
+            )
+        self.stdout.write(
+            f"Archived {len(titles) - missing} titles, {missing} pages not found"
+        )
+
+    async def archive(
+        self, titles, writer: ArchiveWriter, concurrency: int, language: str
+    ) -> int:
+        """
+        Loads pages in batches of parallel requests, writing them in order of titles
+        :return: amount of pages not found
+        """
+        source = WikiApiSource(language)
+        missing = 0
+        for i in range(0, len(titles), concurrency):
+            batch = titles[i : i + concurrency]
+            articles = await asyncio.gather(*(source.load(x) for x in batch))
+            for title, article in zip(batch, articles):
+                if article is None:
+                    missing += 1
+                    continue
+                if article.title not in writer:
+                    links = [x["*"] for x in article.properties if x["ns"] == 0]
+                    writer.add(article.title, article.text, links)
+                if article.title != title:
+                    writer.add_redirect(title, article.title)
+        return missing
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from wiki_race.settings import DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_graph.builder import build_link_graph, read_redirect_titles
+from wiki_race.wiki_graph.graph import LinkGraph
+from wiki_race.wiki_graph.titles import TitleIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds local link graph from wiki SQL dumps (page, redirect, pagelinks and, for newer dumps, linktarget), "
+        "e.g. enwiki-latest-page.sql.gz. Dumps are streamed, so memory use is bounded by --memory-mb."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "dump_dir", help="directory with dumps (.sql, .sql.gz or .sql.bz2)"
+        )
+        parser.add_argument(
+            "--wiki",
+            default=DEFAULT_WIKI,
+            help="wiki language, e.g. en or ru (default is DEFAULT_WIKI)",
+        )
+        parser.add_argument(
+            "--output",
+            help="link graph directory (default is the wiki's configured one)",
+        )
+        parser.add_argument(
+            "--memory-mb",
+            type=int,
+            default=512,
+            help="approximate memory budget for link processing",
+        )
+        parser.add_argument(
+            "--title-index",
+            action="store_true",
+            help="also build title index into the wiki's configured directory",
+        )
+
+    def handle(self, *args, **options):
+        paths = WIKIS.get(options["wiki"], {})
+        options["output"] = options["output"] or paths.get("link_graph")
+        if not options["output"]:
+            raise CommandError("link graph directory is required")
+        try:
+            stats = build_link_graph(
+                options["dump_dir"],
+                options["wiki"],
+                options["output"],
+                memory_mb=options["memory_mb"],
+                report=self.stdout.write,
+            )
+        except FileNotFoundError as e:
+            raise CommandError(e)
+        self.stdout.write(json.dumps(stats))
+        if options["title_index"]:
+            title_index_path = paths.get("title_index")
+            if not title_index_path:
+                raise CommandError("title index directory is required")
+            graph = LinkGraph.load(options["output"])
+            popularity = np.diff(graph.backward_offsets)
+            redirects = read_redirect_titles(options["output"])
+            TitleIndex.build(graph.titles, popularity, redirects).save(title_index_path)
+            self.stdout.write(
+                f"Indexed {graph.size} titles and {len(redirects)} redirects"
+            )
@@ -0,0 +1,35 @@
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+
+from wiki_race.settings import DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_graph.builder import read_redirect_titles
+from wiki_race.wiki_graph.graph import LinkGraph
+from wiki_race.wiki_graph.titles import TitleIndex
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds title prefix index for autocomplete from local link graph. "
+        "Titles are ranked by amount of links to their pages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--wiki",
+            default=DEFAULT_WIKI,
+            help="wiki language, whose configured directories are default",
+        )
+        parser.add_argument("--graph", help="link graph directory")
+        parser.add_argument("--output", help="title index directory")
+
+    def handle(self, *args, **options):
+        paths = WIKIS.get(options["wiki"], {})
+        options["graph"] = options["graph"] or paths.get("link_graph")
+        options["output"] = options["output"] or paths.get("title_index")
+        if not options["graph"] or not options["output"]:
+            raise CommandError("link graph and title index directories are required")
+        graph = LinkGraph.load(options["graph"])
+        popularity = np.diff(graph.backward_offsets)
+        redirects = read_redirect_titles(options["graph"])
+        TitleIndex.build(graph.titles, popularity, redirects).save(options["output"])
+        self.stdout.write(f"Indexed {graph.size} titles and {len(redirects)} redirects")
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+DATABASE_CACHE = "django.core.cache.backends.db.DatabaseCache"
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies migrations and creates cache tables, if needed. "
+        "Unlike running `migrate` and `createcachetable`, does no schema work and no system checks "
+        "when database is up to date, so that server boots faster."
+    )
+
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        # apply migrations, if there are unapplied ones
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if plan:
+            self.stdout.write(f"Applying {len(plan)} migrations")
+            call_command("migrate", database=options["database"], interactive=False)
+        # create cache tables, if missing
+        tables = set(connection.introspection.table_names())
+        missing = [
+            cache["LOCATION"]
+            for cache in settings.CACHES.values()
+            if cache["BACKEND"] == DATABASE_CACHE and cache["LOCATION"] not in tables
+        ]
+        if missing:
+            self.stdout.write(f"Creating cache tables {', '.join(missing)}")
+            call_command("createcachetable", database=options["database"])
+        if not plan and not missing:
+            self.stdout.write("Database is up to date")
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from wiki_app.data.retention import prune_history
+from wiki_race.settings import (
+    ROUND_RETENTION_HOURS,
+    PARTY_RETENTION_HOURS,
+    USER_RETENTION_HOURS,
+    RETENTION_BATCH_SIZE,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compacts finished rounds into summaries, deletes idle parties and users who never joined a party. "
+        "Deletes in small batches, so it is safe to run periodically on a live database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--round-ttl",
+            type=float,
+            default=ROUND_RETENTION_HOURS,
+            help="hours after which past rounds of parties are compacted",
+        )
+        parser.add_argument(
+            "--party-ttl",
+            type=float,
+            default=PARTY_RETENTION_HOURS,
+            help="hours of inactivity after which parties are deleted",
+        )
+        parser.add_argument(
+            "--user-ttl",
+            type=float,
+            default=USER_RETENTION_HOURS,
+            help="hours after which users without parties are deleted",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RETENTION_BATCH_SIZE,
+            help="objects deleted per transaction",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.1,
+            help="seconds to sleep between batches",
+        )
+
+    def handle(self, *args, **options):
+        pruned = prune_history(
+            round_ttl=timedelta(hours=options["round_ttl"]),
+            party_ttl=timedelta(hours=options["party_ttl"]),
+            user_ttl=timedelta(hours=options["user_ttl"]),
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+        )
+        for kind, count in pruned.items():
+            self.stdout.write(f"Pruned {count} {kind}")
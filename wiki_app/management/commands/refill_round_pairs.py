@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from wiki_app.data.round_pairs import refill_pool
+from wiki_race.settings import DEFAULT_WIKI, ROUND_PAIR_POOL_SIZE, WIKIS
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills pool of suggested round pairs, so that there are enough pairs of every difficulty. "
+        "Uses local link graph if configured, wiki apis otherwise. "
+        "Pool is also refilled in background as pairs are taken."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=ROUND_PAIR_POOL_SIZE,
+            help="pairs of every difficulty",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=100,
+            help="max attempts to generate pairs",
+        )
+        parser.add_argument(
+            "--language",
+            default=DEFAULT_WIKI,
+            choices=sorted(WIKIS),
+            help="language of wiki to generate pairs for",
+        )
+
+    def handle(self, *args, **options):
+        generated = refill_pool(
+            options["size"], options["max_attempts"], options["language"]
+        )
+        self.stdout.write(f"Generated {generated} round pairs")
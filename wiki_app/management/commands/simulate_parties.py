@@ -0,0 +1,142 @@
+import contextlib
+import json
+import os
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+
+from wiki_app.data.round_pairs import cache_solution
+from wiki_app.models import Party, User
+from wiki_app.websockets.loadgen import (
+    CommunicatorConnection,
+    Simulation,
+    SocketConnection,
+    instrument,
+)
+from wiki_race.settings import BASE_DIR, DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_api.standin import Cassette, StandIn, serve_in_thread
+
+CASSETTE = os.path.join(BASE_DIR, "wiki_parser", "fixtures", "wiki_api.jsonl")
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates parties of players playing rounds over game websockets and reports latency per message type, "
+        "clicks per second, database queries per action and event loop lag as JSON. "
+        "By default runs in-process against a temporary database, with wiki apis replayed from a cassette; "
+        "with --url connects to a running server instead, creating parties in its database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parties", type=int, default=10)
+        parser.add_argument("--players", type=int, default=4, help="players per party")
+        parser.add_argument("--rounds", type=int, default=3, help="rounds per party")
+        parser.add_argument(
+            "--path",
+            default="London,Paris",
+            help="comma separated titles clicked by players, from start to target page",
+        )
+        parser.add_argument(
+            "--detour", default="France", help="page not linked from path pages"
+        )
+        parser.add_argument(
+            "--detour-rate",
+            type=float,
+            default=0.2,
+            help="probability of clicking detour page before next path page",
+        )
+        parser.add_argument(
+            "--think-ms", type=float, default=500, help="mean delay between clicks"
+        )
+        parser.add_argument("--timeout", type=float, default=30)
+        parser.add_argument("--seed", type=int)
+        parser.add_argument(
+            "--url", help="websocket url of running server, e.g. ws://localhost:8000"
+        )
+        parser.add_argument(
+            "--cassette", default=CASSETTE, help="wiki api cassette for in-process run"
+        )
+        parser.add_argument(
+            "--api-latency-ms",
+            type=float,
+            default=50,
+            help="latency of replayed wiki api for in-process run",
+        )
+        parser.add_argument("--output", help="file to write results to")
+
+    def handle(self, *args, **options):
+        simulation = Simulation(
+            options["parties"],
+            options["players"],
+            options["rounds"],
+            options["path"].split(","),
+            detour=options["detour"],
+            detour_rate=options["detour_rate"],
+            think_time=options["think_ms"] / 1000,
+            timeout=options["timeout"],
+            seed=options["seed"],
+        )
+        if options["url"]:
+            results = self.run_sockets(simulation, options["url"])
+        else:
+            results = self.run_in_process(simulation, options)
+        results["config"] = {
+            key: options[key]
+            for key in [
+                "parties",
+                "players",
+                "rounds",
+                "path",
+                "detour_rate",
+                "think_ms",
+            ]
+        }
+        results["config"]["mode"] = "sockets" if options["url"] else "in-process"
+        output = json.dumps(results, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def run_sockets(self, simulation: Simulation, url: str) -> dict:
+        paths = simulation.create_parties()
+        try:
+            connections = [
+                [SocketConnection(url.rstrip("/") + path) for path in party]
+                for party in paths
+            ]
+            return async_to_sync(simulation.run)(connections)
+        finally:
+            party_ids = [path[0].split("/")[2] for path in paths]
+            User.objects.filter(partymember__party__in=party_ids).delete()
+            Party.objects.filter(uid__in=party_ids).delete()
+
+    def run_in_process(self, simulation: Simulation, options: dict) -> dict:
+        # imported here, as it configures django for running outside of tests
+        from benchmarks import temporary_database
+        from wiki_race.asgi import application
+
+        standin = StandIn(
+            Cassette(options["cassette"]),
+            latency=options["api_latency_ms"] / 1000,
+            seed=options["seed"],
+        )
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(temporary_database())
+            url = stack.enter_context(serve_in_thread(standin))
+            stack.enter_context(
+                mock.patch.dict(WIKIS[DEFAULT_WIKI], api=f"{url}/w/api.php")
+            )
+            stack.enter_context(mock.patch("wiki_race.wiki_api.parse.SDOW_API", url))
+            # round solutions are known, as if suggested from round pairs pool
+            path = simulation.path
+            cache_solution(path[0], path[-1], path)
+            connections = [
+                [CommunicatorConnection(application, path) for path in party]
+                for party in simulation.create_parties()
+            ]
+            stack.enter_context(instrument(simulation.recorder))
+            results = async_to_sync(simulation.run)(connections)
+        results["api"] = dict(standin.stats)
+        return results
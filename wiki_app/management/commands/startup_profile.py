@@ -0,0 +1,152 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from wiki_race.settings import BASE_DIR
+
+CHILD = """
+import asyncio, json, sys, time
+
+started = time.perf_counter()
+from wiki_race.asgi import application
+
+imported = time.perf_counter()
+
+
+async def request(path):
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]["status"]
+
+
+status = asyncio.run(request(sys.argv[1]))
+print(json.dumps({
+    "import": imported - started,
+    "first_response": time.perf_counter() - started,
+    "status": status,
+}))
+"""
+"""
+Script of worker process, which imports application and serves a single request
+"""
+
+MODES = {"default": {}, "fast": {"FAST_START": "1"}}
+"""
+Environment variables of each startup mode
+"""
+
+
+def parse_import_times(stderr: str, top: int, depth: int = 2) -> list:
+    """
+    Parses `-X importtime` output
+    :param depth: max nesting of reported imports, zero for top-level imports only
+    :return: list of `top` slowest imports with their cumulative milliseconds
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # nested imports are indented by two spaces per level
+        if not cumulative.strip().isdigit():
+            continue
+        if len(name) - len(name.lstrip()) > 2 * depth + 1:
+            continue
+        imports.append([name.strip(), int(cumulative) / 1000])
+    imports.sort(key=lambda x: -x[1])
+    return imports[:top]
+
+
+class Command(BaseCommand):
+    help = (
+        "Starts fresh worker processes in each startup mode (default and FAST_START), "
+        "each importing the application and serving a single request, and reports as JSON median time "
+        "of application import, time to first response since import started and process lifetime, "
+        "along with slowest imports."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default="/favicon.ico", help="path of first request"
+        )
+        parser.add_argument("--runs", type=int, default=3, help="processes per mode")
+        parser.add_argument(
+            "--imports", type=int, default=10, help="slowest imports reported"
+        )
+        parser.add_argument(
+            "--import-depth",
+            type=int,
+            default=2,
+            help="max nesting of reported imports, zero for top-level imports only",
+        )
+        parser.add_argument(
+            "--mode", choices=list(MODES), action="append", help="modes to profile"
+        )
+
+    def run_worker(self, path: str, mode: str, import_time: bool = False):
+        # mode is chosen by environment only, regardless of this process' one
+        env = {k: v for k, v in os.environ.items() if k != "FAST_START"}
+        env.update(MODES[mode])
+        env.setdefault("DJANGO_SETTINGS_MODULE", "wiki_race.settings")
+        command = [sys.executable, *(["-X", "importtime"] if import_time else [])]
+        started = time.perf_counter()
+        result = subprocess.run(
+            [*command, "-c", CHILD, path],
+            cwd=BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        lifetime = time.perf_counter() - started
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr)
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report["process"] = lifetime
+        return report, result.stderr
+
+    def handle(self, *args, **options):
+        report = {}
+        for mode in options["mode"] or list(MODES):
+            runs = [
+                self.run_worker(options["path"], mode)[0]
+                for _ in range(options["runs"])
+            ]
+            # import times are measured separately, as measuring slows imports down
+            _, stderr = self.run_worker(options["path"], mode, import_time=True)
+            report[mode] = {
+                **{
+                    key: statistics.median(run[key] for run in runs)
+                    for key in ["import", "first_response", "process"]
+                },
+                "status": runs[-1]["status"],
+                "slowest_imports": parse_import_times(
+                    stderr, options["imports"], options["import_depth"]
+                ),
+            }
+        self.stdout.write(json.dumps(report, indent=2))
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.9 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+def count_unsolved_members(apps, schema_editor):
+    """
+    Backfills unsolved members counter for rounds that are still running
+    """
+    Round = apps.get_model("wiki_app", "Round")
+    for party_round in Round.objects.filter(running=True):
+        party_round.unsolved_members = party_round.member_rounds.filter(
+            solved_at=-1
+        ).count()
+        party_round.save(update_fields=["unsolved_members"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0004_alter_round_solution"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="round",
+            name="unsolved_members",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_unsolved_members, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:21
+
+from django.db import migrations, models
+
+
+def merge_duplicate_members(apps, schema_editor):
+    """
+    Merges members of the same user in a party into a single member, preferring the host.
+    Member rounds and points of duplicates are moved to the kept member. If both played the same round,
+     the better result is kept.
+    """
+    PartyMember = apps.get_model("wiki_app", "PartyMember")
+    MemberRound = apps.get_model("wiki_app", "MemberRound")
+    Round = apps.get_model("wiki_app", "Round")
+    duplicates = (
+        PartyMember.objects.values("party", "user")
+        .annotate(members_count=models.Count("id"))
+        .filter(members_count__gt=1)
+    )
+    for duplicate in duplicates:
+        kept, *others = PartyMember.objects.filter(
+            party=duplicate["party"], user=duplicate["user"]
+        ).order_by(models.F("adminrole").asc(nulls_last=True), "id")
+        for member in others:
+            kept_rounds = {
+                x.round_id: x for x in MemberRound.objects.filter(member=kept)
+            }
+            for member_round in MemberRound.objects.filter(member=member):
+                other = kept_rounds.get(member_round.round_id)
+                if other is None:
+                    member_round.member = kept
+                    member_round.save(update_fields=["member"])
+                    continue
+                # round is counted once for merged member
+                worse = min(other, member_round, key=lambda x: x.solved_at)
+                if worse.solved_at == -1:
+                    Round.objects.filter(pk=worse.round_id).update(
+                        unsolved_members=models.F("unsolved_members") - 1
+                    )
+                if worse is other:
+                    member_round.member = kept
+                    member_round.save(update_fields=["member"])
+                worse.delete()
+            kept.points += member.points
+            member.delete()
+        kept.save(update_fields=["points"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0005_round_unsolved_members"),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_members, migrations.RunPython.noop),
+    ]
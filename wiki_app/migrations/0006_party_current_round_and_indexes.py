@@ -0,0 +1,54 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_current_rounds(apps, schema_editor):
+    """
+    Points each party to its latest round
+    """
+    Party = apps.get_model("wiki_app", "Party")
+    for party in Party.objects.all():
+        party.current_round = party.rounds.order_by("-start_time").first()
+        party.save(update_fields=["current_round"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0006_merge_duplicate_members"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="party",
+            name="current_round",
+            field=models.OneToOneField(
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="current_for",
+                to="wiki_app.round",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="memberround",
+            index=models.Index(
+                fields=["round", "solved_at"], name="wiki_app_me_round_i_4a329f_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="round",
+            index=models.Index(
+                fields=["party", "start_time"], name="wiki_app_ro_party_i_4a3eaf_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="partymember",
+            constraint=models.UniqueConstraint(
+                fields=("party", "user"), name="unique_party_member"
+            ),
+        ),
+        # rows are updated last, as tables with pending trigger events can't be altered
+        migrations.RunPython(set_current_rounds, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0006_party_current_round_and_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoundSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_page", models.CharField(max_length=100)),
+                ("end_page", models.CharField(max_length=100)),
+                ("start_time", models.DateTimeField()),
+                ("members_count", models.IntegerField()),
+                ("solved_count", models.IntegerField()),
+                ("best_solved_at", models.IntegerField(null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="party",
+            name="last_active",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="created_at",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.AlterField(
+            model_name="round",
+            name="start_time",
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:36
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0007_retention"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoundEventBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "members",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.BigIntegerField(), size=None
+                    ),
+                ),
+                (
+                    "pages",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100), size=None
+                    ),
+                ),
+                ("events", models.BinaryField()),
+                ("first_offset", models.IntegerField()),
+                ("last_offset", models.IntegerField()),
+                (
+                    "round",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="event_batches",
+                        to="wiki_app.round",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="roundeventbatch",
+            index=models.Index(
+                fields=["round", "first_offset"], name="wiki_app_ro_round_i_640bfd_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.9 on 2026-10-19 13:44
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0008_round_event_batch"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RoundPair",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("start_page", models.CharField(max_length=100)),
+                ("end_page", models.CharField(max_length=100)),
+                ("difficulty", models.CharField(db_index=True, max_length=10)),
+                (
+                    "solution",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.CharField(max_length=100), size=None
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.2.9 on 2026-10-19 14:11
+
+from django.db import migrations, models
+import wiki_app.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0009_round_pair"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="party",
+            name="language",
+            field=models.CharField(
+                default=wiki_app.models.default_language, max_length=16
+            ),
+        ),
+        migrations.AddField(
+            model_name="roundpair",
+            name="language",
+            field=models.CharField(
+                default=wiki_app.models.default_language, max_length=16
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="roundpair",
+            index=models.Index(
+                fields=["language", "difficulty"], name="wiki_app_ro_languag_e7751f_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-19 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0010_languages"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="round",
+            name="pending_event_buffers",
+            field=models.IntegerField(default=0),
+        ),
+    ]
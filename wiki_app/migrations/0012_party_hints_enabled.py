@@ -0,0 +1,18 @@
+# Generated by Django 3.2.9 on 2026-10-19 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0011_round_pending_event_buffers"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="party",
+            name="hints_enabled",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.9 on 2026-10-19 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_app", "0012_party_hints_enabled"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="round",
+            name="pending_event_buffers",
+        ),
+        migrations.CreateModel(
+            name="RoundEventBuffer",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("expires_at", models.DateTimeField()),
+                (
+                    "round",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="event_buffers",
+                        to="wiki_app.round",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -2,6 +2,16 @@ import uuid
 
 from django.contrib.postgres.fields import ArrayField
 from django.db import models
+from django.utils import timezone
+
+from wiki_race.settings import DEFAULT_WIKI
+
+
+def default_language() -> str:
+    """
+    Language of parties created before parties had languages, and of parties not choosing one
+    """
+    return DEFAULT_WIKI
 
 
 class User(models.Model):
@@ -10,6 +20,10 @@ class User(models.Model):
     """
 
     uid = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    """
+    Time the user was created. Users who haven't joined any party are pruned after a while, see `retention`
+    """
 
 
 class Party(models.Model):
@@ -22,6 +36,28 @@ class Party(models.Model):
     """
     Time limit for each round played in party
     """
+    current_round = models.OneToOneField(
+        "Round",
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="current_for",
+    )
+    """
+    Latest (or currently running) round. Null if no rounds have been started yet.
+    Denormalized from `rounds`, so that the latest round is fetched by primary key.
+    """
+    last_active = models.DateTimeField(default=timezone.now, db_index=True)
+    """
+    Time the party was created or last started a round. Idle parties are pruned, see `retention`
+    """
+    language = models.CharField(max_length=16, default=default_language)
+    """
+    Language of wiki the party plays on, see `wikis`
+    """
+    hints_enabled = models.BooleanField(default=False)
+    """
+    Whether host allowed members to ask for hints (distances to target), see `hints`
+    """
 
 
 class PartyMember(models.Model):
@@ -38,6 +74,13 @@ class PartyMember(models.Model):
     Points received in a round
     """
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["party", "user"], name="unique_party_member"
+            ),
+        ]
+
 
 class AdminRole(models.Model):
     """
@@ -69,7 +112,7 @@ class Round(models.Model):
     
     NOTICE: requires postgres
     """
-    start_time = models.DateTimeField(auto_now_add=True)
+    start_time = models.DateTimeField(auto_now_add=True, db_index=True)
     """
     Time the round was started
     """
@@ -77,6 +120,16 @@ class Round(models.Model):
     """
     Whether round is currently active. Has to be updated in regards to `start_time`.
     """
+    unsolved_members = models.IntegerField(default=0)
+    """
+    Amount of members who haven't solved the round (yet). Set on round creation, incremented on late join
+     and atomically decremented on solve, so that checking whether everyone has solved doesn't need a count query.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["party", "start_time"]),
+        ]
 
 
 class MemberRound(models.Model):
@@ -98,3 +151,108 @@ class MemberRound(models.Model):
     """
     Seconds left until time would run out, as member solved the wikirace. If -1, then member hasn't solved it (yet).
     """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["round", "solved_at"]),
+        ]
+
+
+class RoundSummary(models.Model):
+    """
+    Round summary. Compact record of a finished round, kept after the round and its member rounds are pruned.
+    """
+
+    start_page = models.CharField(max_length=100)
+    end_page = models.CharField(max_length=100)
+    start_time = models.DateTimeField()
+    members_count = models.IntegerField()
+    """
+    Amount of members who played the round
+    """
+    solved_count = models.IntegerField()
+    """
+    Amount of members who solved the round
+    """
+    best_solved_at = models.IntegerField(null=True)
+    """
+    Most seconds left among members who solved the round. Null if nobody solved it.
+    """
+
+
+class RoundEventBatch(models.Model):
+    """
+    Batch of round click events, used for replaying rounds.
+    Events are packed into a single binary array instead of a row per click, see `replay`.
+    """
+
+    round = models.ForeignKey(
+        Round, on_delete=models.CASCADE, related_name="event_batches"
+    )
+    members = ArrayField(models.BigIntegerField())
+    """
+    Ids of members, referenced by events by index
+    """
+    pages = ArrayField(models.CharField(max_length=100))
+    """
+    Titles of pages, referenced by events by index
+    """
+    events = models.BinaryField()
+    """
+    Events packed as little-endian uint32 triples: member index, page index, milliseconds since round start
+    """
+    first_offset = models.IntegerField()
+    """
+    Milliseconds since round start of the first event in batch
+    """
+    last_offset = models.IntegerField()
+    """
+    Milliseconds since round start of the last event in batch
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["round", "first_offset"]),
+        ]
+
+
+class RoundEventBuffer(models.Model):
+    """
+    Click event buffer of a round held by a worker and not yet written, see `replay`.
+    Created when a worker starts buffering and deleted when its buffer is written,
+     so that round analytics can wait until every worker has written its events.
+    """
+
+    round = models.ForeignKey(
+        Round, on_delete=models.CASCADE, related_name="event_buffers"
+    )
+    expires_at = models.DateTimeField()
+    """
+    Time by which the buffer is written at the latest, unless its worker has died
+    """
+
+
+class RoundPair(models.Model):
+    """
+    Pre-generated origin and target pages with known shortest solution, suggested to hosts, see `round_pairs`.
+    """
+
+    start_page = models.CharField(max_length=100)
+    end_page = models.CharField(max_length=100)
+    difficulty = models.CharField(max_length=10, db_index=True)
+    """
+    Difficulty name, see `round_pairs.DIFFICULTIES`
+    """
+    language = models.CharField(max_length=16, default=default_language)
+    """
+    Language of wiki the pages are from
+    """
+    solution = ArrayField(models.CharField(max_length=100))
+    """
+    Shortest solution: array of page titles leading from start to end (ends inclusive)
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["language", "difficulty"]),
+        ]
@@ -0,0 +1,13 @@
+from wiki_race.tracing import span
+
+
+def tracing_middleware(get_response):
+    """
+    Traces every http request, so that slow requests are logged with their spans, see `wiki_race.tracing`
+    """
+
+    def middleware(request):
+        with span(f"http {request.method} {request.path}"):
+            return get_response(request)
+
+    return middleware
@@ -0,0 +1,72 @@
+import hmac
+
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseBadRequest,
+    HttpResponseNotFound,
+)
+
+from wiki_race import metrics, profiler
+from wiki_race.settings import DEBUG, METRICS_TOKEN, PROFILE_MAX_SECONDS
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Prometheus scrape endpoint with metrics of all workers.
+    If `METRICS_TOKEN` is set, requests have to be authorized with `Authorization: Bearer <token>` header.
+    Without it, endpoint is only served in debug mode, so that production metrics aren't public by accident.
+    """
+    if not METRICS_TOKEN and not DEBUG:
+        return HttpResponseNotFound()
+    if METRICS_TOKEN:
+        authorization = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(authorization, f"Bearer {METRICS_TOKEN}"):
+            return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def profile_view(request: HttpRequest) -> HttpResponse:
+    """
+    Admin-only view starting to sample stacks of the worker serving it for `seconds` (default 10)
+     every `interval` seconds. Sampling runs in a background thread, so that no worker thread waits for it,
+     and its result is fetched from `profile_result_view`.
+    Responds with 202, or 409 if worker is already being profiled.
+    """
+    if not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden()
+    try:
+        seconds = float(request.GET.get("seconds", 10))
+        interval = float(request.GET.get("interval", 0.005))
+    except ValueError:
+        return HttpResponseBadRequest()
+    if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0 < interval < seconds:
+        return HttpResponseBadRequest()
+    try:
+        profiler.start(seconds, interval)
+    except RuntimeError:
+        return HttpResponse("already profiling", status=409)
+    return HttpResponse(f"profiling for {seconds}s", status=202)
+
+
+def profile_result_view(request: HttpRequest) -> HttpResponse:
+    """
+    Admin-only view with collapsed stacks of the last profile of the worker serving it, to be rendered as a flame graph.
+    Responds with 202 while still profiling, or 404 if worker hasn't been profiled yet.
+    As each worker profiles itself, result has to be fetched from the same worker, e.g. with a single worker process.
+    """
+    if not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden()
+    if profiler.is_profiling():
+        return HttpResponse("still profiling", status=202)
+    if profiler.last_profile is None:
+        return HttpResponseNotFound()
+    response = HttpResponse(
+        profiler.collapsed(profiler.last_profile),
+        content_type="text/plain; charset=utf-8",
+    )
+    response["Content-Disposition"] = 'attachment; filename="profile.collapsed"'
+    return response
@@ -5,26 +5,26 @@ from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect
 
 import wiki_app.views
-from wiki_race.settings import USER_COOKIE_NAME
-from wiki_app.data.db import get_user, create_party, join_party
+from wiki_app.data.db import create_party, join_party
+from wiki_app.data.identity import get_user_id, set_user_cookie
 
 
 def api_create_party(request: HttpRequest) -> HttpResponse:
     """
     API view for creating a party.
     """
-    # get user from cookie
-    user = get_user(request)
+    # get user id from cookie
+    user_id = get_user_id(request)
     try:
         # try to create party
-        party = create_party(user, request.GET.dict())
+        party = create_party(user_id, request.GET.dict())
         # redirect host to game page
         response = redirect(wiki_app.views.game_page, game_id=party.uid)
     except Exception as e:
         logging.error(e)
         response = django.http.HttpResponseBadRequest()
     # set user cookie
-    response.set_cookie(USER_COOKIE_NAME, user.uid)
+    set_user_cookie(response, user_id)
     return response
 
 
@@ -32,16 +32,16 @@ def api_enter_party(request: HttpRequest) -> HttpResponse:
     """
     API view for joining party
     """
-    # get user from cookie
-    user = get_user(request)
+    # get user id from cookie
+    user_id = get_user_id(request)
     try:
         # try to join party
-        party = join_party(user, request.GET.dict())
+        party = join_party(user_id, request.GET.dict())
         # redirect host to game page
         response = redirect(wiki_app.views.game_page, game_id=party.uid)
     except Exception as e:
         logging.error(e)
         response = django.http.HttpResponseBadRequest()
     # set user cookie
-    response.set_cookie(USER_COOKIE_NAME, user.uid)
+    set_user_cookie(response, user_id)
     return response
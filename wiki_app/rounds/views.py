@@ -0,0 +1,47 @@
+from django.core.exceptions import ValidationError
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    HttpResponseBadRequest,
+    HttpResponseForbidden,
+)
+from django.views.decorators.http import require_POST
+
+from wiki_app.data.db import get_member
+from wiki_app.data.identity import get_user_id
+from wiki_app.data.round_pairs import DIFFICULTIES, take_round_pair, ensure_refilling
+
+
+@require_POST
+def api_round_pair(request: HttpRequest) -> HttpResponse:
+    """
+    API view for suggesting round origin and target pages of given difficulty for `party`,
+     with known shortest solution. Suggested pair is taken from pool, so view only accepts POST,
+     made on explicit request of party's host.
+    """
+    difficulty = request.POST.get("difficulty", "medium")
+    if difficulty not in DIFFICULTIES:
+        return HttpResponseBadRequest()
+    # only hosts of existing parties may take pairs from pool
+    try:
+        member = get_member(request.POST.get("party", ""), get_user_id(request))
+    except ValidationError:
+        member = None
+    if member is None or not member.is_admin:
+        return HttpResponseForbidden()
+    language = member.party.language
+    # take pre-generated pair
+    pair = take_round_pair(difficulty, language)
+    # refill pool in background
+    ensure_refilling(language)
+    if pair is None:
+        return JsonResponse({"error": "no pairs available"}, status=503)
+    return JsonResponse(
+        {
+            "origin": pair.start_page,
+            "target": pair.end_page,
+            "difficulty": pair.difficulty,
+            "clicks": len(pair.solution) - 1,
+        }
+    )
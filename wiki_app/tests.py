@@ -1,3 +1,1526 @@
-from django.test import TestCase
+import asyncio
+import bz2
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
 
-# Create your tests here.
+from contextlib import asynccontextmanager
+from unittest import mock
+
+import msgpack
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User as DjangoUser
+from django.core import signing
+from django.core.management import call_command
+from django.db import connection, connections, DEFAULT_DB_ALIAS
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from wiki_app.data.db import (
+    new_round,
+    member_click,
+    have_all_solved,
+    finish_round,
+    get_or_create_member_round,
+    start_solving,
+)
+from wiki_app.data.analytics import analyze_paths, analyze_round
+from wiki_app.data.hints import DistanceCache, distance_cache, get_hints
+from wiki_app.data.identity import USER_COOKIE_SALT, make_member_token
+from wiki_app.data.replay import (
+    _flush_old_buffers,
+    flush_events,
+    has_pending_events,
+    record_click,
+)
+from wiki_app.data.retention import compact_finished_rounds, prune_history
+from wiki_app.data.round_pairs import DIFFICULTIES, refill_pool
+from wiki_app.management.commands.startup_profile import parse_import_times
+from wiki_app.models import (
+    User,
+    Party,
+    PartyMember,
+    AdminRole,
+    Round,
+    MemberRound,
+    RoundSummary,
+    RoundEventBatch,
+    RoundPair,
+)
+from wiki_app.websockets.codecs import EncodingCache, JsonCodec, codecs
+from wiki_app.websockets.consumers import GameConsumer
+from wiki_app.websockets.flow import (
+    MERGEABLE_ACTIONS,
+    SUPERSEDED_MESSAGES,
+    TokenBucket,
+    BoundedQueue,
+)
+from wiki_app.websockets.loadgen import CommunicatorConnection, Simulation, instrument
+from wiki_app.websockets.replay import stream_round_events
+from wiki_app.websockets.spectators import SpectatorConsumer
+from wiki_app.websockets.urls import websocket_router
+from wiki_race import metrics, profiler, tracing
+from wiki_race.startup import lifespan
+from wiki_race.settings import (
+    BASE_DIR,
+    DEFAULT_WIKI,
+    PARTY_RETENTION_HOURS,
+    REPLAY_FLUSH_SECONDS,
+    USER_COOKIE_NAME,
+    WIKIS,
+)
+from wiki_race.wiki_api.api_metrics import http_session
+from wiki_race.wiki_api.archive import ArchiveWriter, ArticleArchive
+from wiki_race.wiki_api.parse import (
+    check_valid_transition,
+    compare_titles,
+    load_wiki_page,
+    resolve_page_ids,
+    solve_round,
+)
+from wiki_race.wiki_api.sources import Article, ArchiveSource
+from wiki_race.wiki_graph.builder import build_link_graph
+from wiki_race.wiki_graph.dictionary import TitleDictionary, normalize_title
+from wiki_race.wiki_graph.graph import LinkGraph, UNREACHABLE
+from wiki_race.wiki_graph.titles import TitleIndex
+
+
+def make_party(members_count: int) -> Party:
+    """
+    Creates party with given amount of members, first member being the host
+    """
+    party = Party(time_limit=600)
+    party.save()
+    for i in range(members_count):
+        user = User()
+        user.save()
+        member = PartyMember(name=f"player{i}", user=user, party=party)
+        member.save()
+        if i == 0:
+            AdminRole(party=party, admin_member=member).save()
+    return party
+
+
+def log_in(client: Client, user_id: uuid.UUID) -> None:
+    """
+    Sets signed user cookie of given user to test client
+    """
+    client.cookies[USER_COOKIE_NAME] = signing.get_cookie_signer(
+        salt=USER_COOKIE_NAME + USER_COOKIE_SALT
+    ).sign(str(user_id))
+
+
+def mock_resolve_page_ids(*titles: str, language: str = DEFAULT_WIKI) -> dict:
+    return {title: hash(title.lower()) for title in titles}
+
+
+def make_round(party: Party):
+    """
+    Creates round for party without checking pages via wiki api
+    """
+    with mock.patch("wiki_app.data.db.resolve_page_ids", mock_resolve_page_ids):
+        return new_round(party, {"origin": "Milk", "target": "Mozzarella"})
+
+
+class UnsolvedCounterTests(TestCase):
+    def test_counter_set_on_creation_and_late_join(self):
+        party = make_party(3)
+        party_round = make_round(party)
+        self.assertEqual(party_round.unsolved_members, 3)
+
+        late_user = User()
+        late_user.save()
+        late_member = PartyMember(name="late", user=late_user, party=party)
+        late_member.save()
+        get_or_create_member_round(party_round, late_member)
+        # second call must not count the member twice
+        get_or_create_member_round(party_round, late_member)
+        party_round.refresh_from_db()
+        self.assertEqual(party_round.unsolved_members, 4)
+
+    def test_counter_decremented_on_solve(self):
+        party = make_party(2)
+        party_round = make_round(party)
+        first, second = MemberRound.objects.filter(round=party_round)
+
+        self.assertTrue(member_click(first, "Mozzarella"))
+        self.assertFalse(have_all_solved(first.round))
+        self.assertTrue(member_click(second, "mozzarella"))
+        self.assertTrue(have_all_solved(second.round))
+
+
+class NewRoundTests(TestCase):
+    def test_pages_validated_with_single_request(self):
+        party = make_party(3)
+        response = mock.Mock()
+        response.json.return_value = {
+            "query": {
+                "normalized": [{"from": "milk", "to": "Milk"}],
+                "redirects": [{"from": "Mozarella", "to": "Mozzarella"}],
+                "pages": {
+                    "1": {"pageid": 1, "title": "Milk"},
+                    "2": {"pageid": 2, "title": "Mozzarella"},
+                },
+            }
+        }
+        with mock.patch("requests.Session.get", return_value=response) as get:
+            party_round = new_round(party, {"origin": "milk", "target": "Mozarella"})
+        get.assert_called_once()
+        self.assertEqual(party_round.member_rounds.count(), 3)
+        party.refresh_from_db()
+        self.assertEqual(party.current_round, party_round)
+
+    def test_same_page_rejected(self):
+        party = make_party(1)
+        response = mock.Mock()
+        response.json.return_value = {
+            "query": {
+                "redirects": [{"from": "Cow milk", "to": "Milk"}],
+                "pages": {"1": {"pageid": 1, "title": "Milk"}},
+            }
+        }
+        with mock.patch("requests.Session.get", return_value=response):
+            with self.assertRaises(ValueError):
+                new_round(party, {"origin": "Milk", "target": "Cow milk"})
+
+
+class RetentionTests(TestCase):
+    def prune(self):
+        return prune_history(
+            round_ttl=timedelta(days=1),
+            party_ttl=timedelta(days=7),
+            user_ttl=timedelta(days=1),
+            batch_size=2,
+        )
+
+    def test_old_rounds_compacted(self):
+        party = make_party(2)
+        old_round = make_round(party)
+        member_click(old_round.member_rounds.first(), "Mozzarella")
+        finish_round(old_round)
+        Round.objects.filter(pk=old_round.pk).update(
+            start_time=timezone.now() - timedelta(days=2)
+        )
+        current_round = make_round(party)
+        finish_round(current_round)
+        Round.objects.filter(pk=current_round.pk).update(
+            start_time=timezone.now() - timedelta(days=8)
+        )
+        Party.objects.filter(pk=party.pk).update(
+            last_active=timezone.now() - timedelta(days=8)
+        )
+
+        # past rounds are compacted by age, current round before its idle party is deleted
+        pruned = self.prune()
+        self.assertEqual(pruned["rounds"], 1)
+        self.assertEqual(pruned["parties"], 1)
+        self.assertFalse(Round.objects.exists())
+        summaries = RoundSummary.objects.order_by("start_time")
+        self.assertEqual([x.members_count for x in summaries], [2, 2])
+        self.assertEqual([x.solved_count for x in summaries], [0, 1])
+        self.assertIsNotNone(summaries[1].best_solved_at)
+
+    def test_rounds_compacted_by_age(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        party = make_party(1)
+        old_round = make_round(party)
+        finish_round(old_round)
+        recent_round = make_round(party)
+        finish_round(recent_round)
+        running_round = make_round(party)
+        Round.objects.filter(pk=old_round.pk).update(start_time=long_ago)
+        Round.objects.filter(pk=running_round.pk).update(start_time=long_ago)
+
+        compacted = compact_finished_rounds(
+            timezone.now() - timedelta(days=1), batch_size=2
+        )
+        # history of active parties is compacted too, but not their current round
+        self.assertEqual(compacted, 1)
+        self.assertQuerysetEqual(
+            Round.objects.order_by("pk"), [recent_round, running_round]
+        )
+        # rounds which may be running are never compacted
+        Party.objects.filter(pk=party.pk).update(current_round=None)
+        Round.objects.update(start_time=timezone.now())
+        self.assertEqual(compact_finished_rounds(timezone.now(), batch_size=2), 0)
+
+    def test_idle_parties_and_orphan_users_deleted(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        idle_parties = [make_party(2) for _ in range(3)]
+        Party.objects.filter(pk__in=[x.pk for x in idle_parties]).update(
+            last_active=long_ago
+        )
+        active_party = make_party(2)
+        User.objects.update(created_at=long_ago)
+        orphan = User.objects.create(created_at=long_ago)
+        new_user = User.objects.create()
+
+        pruned = self.prune()
+        self.assertEqual(pruned["parties"], 3)
+        self.assertEqual(pruned["users"], 7)
+        self.assertQuerysetEqual(Party.objects.all(), [active_party])
+        self.assertFalse(User.objects.filter(pk=orphan.pk).exists())
+        self.assertTrue(User.objects.filter(pk=new_user.pk).exists())
+        self.assertEqual(User.objects.count(), 3)
+
+
+class ConcurrentSolveTests(TransactionTestCase):
+    def test_round_finishes_exactly_once(self):
+        members_count = 8
+        party = make_party(members_count)
+        party_round = make_round(party)
+        member_rounds = list(
+            MemberRound.objects.filter(round=party_round).select_related(
+                "round", "member"
+            )
+        )
+
+        barrier = threading.Barrier(members_count)
+        finished = []
+
+        def solve(member_round: MemberRound):
+            try:
+                barrier.wait()
+                member_click(member_round, "Mozzarella")
+                if have_all_solved(member_round.round):
+                    finished.append(finish_round(member_round.round))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=solve, args=(x,)) for x in member_rounds]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        party_round.refresh_from_db()
+        self.assertEqual(party_round.unsolved_members, 0)
+        self.assertFalse(party_round.running)
+        self.assertEqual(len([x for x in finished if x is not None]), 1)
+
+
+class FlowControlTests(TestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        self.assertTrue(bucket.take())
+        self.assertTrue(bucket.take())
+        self.assertFalse(bucket.take())
+        self.assertGreater(bucket.delay(), 0)
+
+    def test_queue_merges_and_drops(self):
+        queue = BoundedQueue(size=4, mergeable=MERGEABLE_ACTIONS)
+        self.assertEqual(queue.put("hint", {"pages": ["Cow"]}), "queued")
+        self.assertEqual(queue.put("click", {"destination": "Cow"}), "queued")
+        # clicks are never merged, every one of them moves member
+        self.assertEqual(queue.put("click", {"destination": "Milk"}), "queued")
+        self.assertEqual(queue.put("hint", {"pages": ["Milk"]}), "merged")
+        self.assertEqual(queue.put("finish_early", {}), "queued")
+        # queued clicks are never dropped to make room for newer actions
+        self.assertEqual(queue.put("new_round", {}), "dropped")
+        # merged item keeps its place
+        self.assertEqual(queue.get(), ("hint", {"pages": ["Milk"]}))
+        self.assertEqual(queue.get(), ("click", {"destination": "Cow"}))
+        self.assertEqual(queue.get(), ("click", {"destination": "Milk"}))
+        self.assertEqual(queue.get(), ("finish_early", {}))
+        self.assertEqual(len(queue), 0)
+
+    def test_spectator_backpressure(self):
+        spectator = SpectatorConsumer()
+        spectator.codec = JsonCodec()
+        spectator.has_state = True
+        spectator.outbox = BoundedQueue(size=2, mergeable=set())
+        spectator.sender = None
+        sent = []
+
+        async def stalled_send(text_data: str):
+            sent.append(text_data)
+            await asyncio.Event().wait()
+
+        async def scenario():
+            spectator.send = stalled_send
+            spectator.queue_positions(True, "full0")
+            await asyncio.sleep(0)
+            # slow spectator doesn't get changes it can't keep up with
+            for i in range(3):
+                spectator.queue_positions(False, f"delta{i}")
+            self.assertEqual(len(spectator.outbox), 0)
+            self.assertFalse(spectator.has_state)
+            # full state supersedes pending changes
+            spectator.queue_positions(False, "delta3")
+            spectator.queue_positions(True, "full1")
+            self.assertEqual(spectator.outbox.get(), ("positions", "full1"))
+            self.assertEqual(sent, ["full0"])
+            spectator.sender.cancel()
+
+        async_to_sync(scenario)()
+
+    def test_outbox_supersedes_state(self):
+        outbox = BoundedQueue(size=3, mergeable=SUPERSEDED_MESSAGES)
+        self.assertEqual(outbox.put("leaderboard_update", "1"), "queued")
+        self.assertEqual(outbox.put("solved", "1"), "queued")
+        self.assertEqual(outbox.put("round_finished", "1"), "queued")
+        # only the latest state is sent, events are all delivered
+        self.assertEqual(outbox.put("leaderboard_update", "2"), "merged")
+        self.assertEqual(
+            [outbox.get() for _ in range(len(outbox))],
+            [("leaderboard_update", "2"), ("solved", "1"), ("round_finished", "1")],
+        )
+
+    def test_encoding_cache(self):
+        cache = EncodingCache(size=1)
+        message = {"type": "solved", "data": {}}
+        with mock.patch.object(
+            JsonCodec, "encode", side_effect=JsonCodec.encode, autospec=True
+        ) as encode:
+            payload = cache.encode("a", codecs["json"], message)
+            # message is encoded once per codec for every receiver in the worker
+            self.assertEqual(cache.encode("a", codecs["json"], message), payload)
+            self.assertEqual(encode.call_count, 1)
+            # payloads of older messages are evicted
+            self.assertEqual(cache.encode("b", codecs["json"], message), payload)
+            self.assertEqual(encode.call_count, 2)
+            self.assertEqual(list(cache.payloads), [("b", "json")])
+
+
+def mock_compare_titles(a: str, b: str, language: str = DEFAULT_WIKI) -> bool:
+    return a.lower() == b.lower()
+
+
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class PageQueryCountTests(TestCase):
+    def setUp(self):
+        self.party = make_party(2)
+        self.host = self.party.adminrole.admin_member.user
+        self.set_user_cookie(self.host.uid)
+
+    def set_user_cookie(self, user_id: uuid.UUID):
+        log_in(self.client, user_id)
+
+    def test_static_pages(self):
+        for url in ["/", "/new", f"/join/{self.party.uid}"]:
+            with self.assertNumQueries(0):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_game_page_member(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/game/{self.party.uid}")
+        self.assertEqual(response.status_code, 200)
+
+    def test_game_page_not_member(self):
+        self.set_user_cookie(uuid.uuid4())
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/game/{self.party.uid}")
+        self.assertEqual(response.status_code, 302)
+        # visitors who haven't joined don't get a user
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_game_page_legacy_cookie(self):
+        self.client.cookies[USER_COOKIE_NAME] = str(self.host.uid)
+        response = self.client.get(f"/game/{self.party.uid}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.cookies[USER_COOKIE_NAME].value,
+            signing.get_cookie_signer(salt=USER_COOKIE_NAME + USER_COOKIE_SALT).sign(
+                str(self.host.uid)
+            ),
+        )
+
+    def test_api_create_party(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                "/api/create", {"name": "host", "time_limit_seconds": 600}
+            )
+        self.assertEqual(response.status_code, 302)
+
+    def test_api_enter_party(self):
+        self.set_user_cookie(uuid.uuid4())
+        with self.assertNumQueries(6):
+            response = self.client.get(
+                "/api/enter", {"name": "player", "game_id": self.party.uid}
+            )
+        self.assertEqual(response.status_code, 302)
+
+
+@mock.patch("wiki_app.data.db.compare_titles", mock_compare_titles)
+@mock.patch("wiki_app.data.db.resolve_page_ids", mock_resolve_page_ids)
+@mock.patch("wiki_app.websockets.consumers.start_solving", mock.AsyncMock())
+@mock.patch(
+    "wiki_app.websockets.consumers.check_valid_transition",
+    mock.AsyncMock(return_value=True),
+)
+@mock.patch.object(GameConsumer, "start_round_timer", mock.AsyncMock())
+class WebsocketTests(TestCase):
+    def setUp(self):
+        self.party = make_party(2)
+        self.host = self.party.adminrole.admin_member
+        # connection of test thread, used by thread sensitive database calls of consumer
+        self.connection = connections[DEFAULT_DB_ALIAS]
+
+    @asynccontextmanager
+    async def capture_queries(self):
+        """
+        Captures queries made by consumer to test database
+        """
+        context = CaptureQueriesContext(self.connection)
+        await sync_to_async(context.__enter__)()
+        try:
+            yield context
+        finally:
+            await sync_to_async(context.__exit__)(None, None, None)
+
+    async def connect(
+        self, member: PartyMember, is_admin: bool = True, drain: bool = True
+    ) -> WebsocketCommunicator:
+        communicator = WebsocketCommunicator(
+            websocket_router,
+            f"/game_connect/{self.party.uid}/"
+            + make_member_token(str(self.party.uid), member.pk, is_admin),
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        # drain initial messages
+        while drain and not await communicator.receive_nothing():
+            await communicator.receive_from()
+        return communicator
+
+    async def act(self, communicator: WebsocketCommunicator, data: dict) -> None:
+        """
+        Sends action and waits for it to be processed
+        """
+        await communicator.send_json_to(data)
+        while not await communicator.receive_nothing():
+            await communicator.receive_from()
+
+    def run_scenario(self, scenario):
+        async_to_sync(scenario)()
+
+    def test_connect(self):
+        async def scenario():
+            async with self.capture_queries() as queries:
+                communicator = await self.connect(self.host)
+            self.assertEqual(len(queries), 4)
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_connect_snapshot(self):
+        make_round(self.party)
+        player = self.party.members.exclude(pk=self.host.pk).get()
+
+        async def scenario():
+            host_communicator = await self.connect(self.host)
+            communicator = await self.connect(player, is_admin=False, drain=False)
+            # connected member gets state as a single frame
+            snapshot = await communicator.receive_json_from()
+            self.assertEqual(snapshot["type"], "batch")
+            self.assertEqual(
+                [x["type"] for x in snapshot["data"]],
+                [
+                    "set_wiki_endpoint",
+                    "leaderboard_update",
+                    "new_round",
+                    "force_redirect",
+                ],
+            )
+            self.assertTrue(await communicator.receive_nothing())
+            # other members get updated leaderboards
+            update = await host_communicator.receive_json_from()
+            self.assertEqual(update["type"], "leaderboard_update")
+            self.assertEqual(len(update["data"]["leaderboards"]), 2)
+            await communicator.disconnect()
+            await host_communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_msgpack_codec(self):
+        make_round(self.party)
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                websocket_router,
+                f"/game_connect/{self.party.uid}/"
+                + make_member_token(str(self.party.uid), self.host.pk, True),
+                subprotocols=["wikirace.msgpack"],
+            )
+            connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            self.assertEqual(subprotocol, "wikirace.msgpack")
+            snapshot = msgpack.unpackb(await communicator.receive_from())
+            self.assertEqual(snapshot["type"], "batch")
+            # group messages are sent in negotiated codec as well
+            await communicator.send_to(
+                bytes_data=msgpack.packb({"type": "click", "destination": "Mozzarella"})
+            )
+            messages = [
+                msgpack.unpackb(await communicator.receive_from()) for _ in range(2)
+            ]
+            self.assertCountEqual(
+                [x["type"] for x in messages],
+                ["leaderboard_update", "solved"],
+            )
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_connect_invalid_token(self):
+        other_party = make_party(1)
+        issued_long_ago = time.time() - PARTY_RETENTION_HOURS * 3600 - 1
+        with mock.patch("time.time", return_value=issued_long_ago):
+            expired = make_member_token(str(self.party.uid), self.host.pk, True)
+        tokens = [
+            "forged",
+            make_member_token(str(other_party.uid), self.host.pk, True),
+            expired,
+        ]
+
+        async def scenario():
+            for token in tokens:
+                communicator = WebsocketCommunicator(
+                    websocket_router, f"/game_connect/{self.party.uid}/{token}"
+                )
+                async with self.capture_queries() as queries:
+                    connected, _ = await communicator.connect()
+                self.assertFalse(connected)
+                self.assertEqual(len(queries), 0)
+
+        self.run_scenario(scenario)
+
+    def test_new_round(self):
+        async def scenario():
+            communicator = await self.connect(self.host)
+            async with self.capture_queries() as queries:
+                await self.act(
+                    communicator,
+                    {"type": "new_round", "origin": "Milk", "target": "Mozzarella"},
+                )
+            self.assertEqual(len(queries), 7)
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_click(self):
+        make_round(self.party)
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            async with self.capture_queries() as queries:
+                await self.act(communicator, {"type": "click", "destination": "Cow"})
+            # first click of round in worker counts its event buffer as pending
+            self.assertEqual(len(queries), 3)
+            async with self.capture_queries() as queries:
+                await self.act(
+                    communicator, {"type": "click", "destination": "Mozzarella"}
+                )
+            self.assertEqual(len(queries), 8)
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_finish_early(self):
+        make_round(self.party)
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            async with self.capture_queries() as queries:
+                await self.act(communicator, {"type": "finish_early"})
+            self.assertEqual(len(queries), 5)
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    @mock.patch("wiki_app.data.hints.HINT_PAGES_PER_ROUND", 3)
+    def test_hint(self):
+        make_round(self.party)
+        graph = LinkGraph.from_links(["Milk", "Cow", "Mozzarella"], [(0, 1), (1, 2)])
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            # hints are opt-in
+            await communicator.send_json_to({"type": "hint", "pages": ["Milk"]})
+            self.assertEqual(
+                await communicator.receive_json_from(), {"error": "hints disabled"}
+            )
+            await communicator.disconnect()
+            await sync_to_async(Party.objects.filter(pk=self.party.pk).update)(
+                hints_enabled=True
+            )
+            communicator = await self.connect(self.host)
+            await communicator.send_json_to({"type": "hint", "pages": ["Milk"]})
+            self.assertEqual(
+                await communicator.receive_json_from(), {"error": "hints unavailable"}
+            )
+            with mock.patch.dict(WIKIS[DEFAULT_WIKI], link_graph="graph"), mock.patch(
+                "wiki_app.data.hints.get_link_graph", return_value=graph
+            ):
+                await communicator.send_json_to(
+                    {"type": "hint", "pages": ["Milk", "Cow"]}
+                )
+                hint = await communicator.receive_json_from()
+                self.assertEqual(hint["data"], {"distances": {"Milk": 2, "Cow": 1}})
+                # a page can't be ranked by all of its links
+                await communicator.send_json_to(
+                    {"type": "hint", "pages": ["Milk", "Cow", "Cheese", "Mozzarella"]}
+                )
+                self.assertEqual(
+                    await communicator.receive_json_from(), {"error": "no pages"}
+                )
+                # hints are limited per round
+                await communicator.send_json_to(
+                    {"type": "hint", "pages": ["Milk", "Cow"]}
+                )
+                self.assertEqual(
+                    await communicator.receive_json_from(), {"error": "no hints left"}
+                )
+                # distances are evicted when round ends
+                await self.act(communicator, {"type": "finish_early"})
+                self.assertIsNone(distance_cache.get(str(self.party.uid)))
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    @mock.patch("wiki_app.websockets.spectators.SPECTATOR_TICK_SECONDS", 0.01)
+    def test_spectator(self):
+        make_round(self.party)
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            spectator = WebsocketCommunicator(
+                websocket_router, f"/spectate/{self.party.uid}"
+            )
+            connected, _ = await spectator.connect()
+            self.assertTrue(connected)
+            # spectator gets full positions first
+            positions = await spectator.receive_json_from()
+            self.assertEqual(positions["type"], "positions")
+            self.assertTrue(positions["data"]["full"])
+            self.assertEqual(len(positions["data"]["members"]), 2)
+            # then only changed positions
+            await self.act(communicator, {"type": "click", "destination": "Cow"})
+            positions = await spectator.receive_json_from()
+            self.assertEqual(
+                positions["data"],
+                {"members": {str(self.host.pk): [self.host.name, "Cow", False]}},
+            )
+            # spectators are read only
+            await spectator.send_json_to({"type": "finish_early"})
+            self.assertEqual(
+                await spectator.receive_json_from(), {"error": "read only"}
+            )
+            await spectator.disconnect()
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_spectator_unknown_party(self):
+        async def scenario():
+            for party_id in [uuid.uuid4(), "unknown"]:
+                spectator = WebsocketCommunicator(
+                    websocket_router, f"/spectate/{party_id}"
+                )
+                connected, _ = await spectator.connect()
+                self.assertFalse(connected)
+
+        self.run_scenario(scenario)
+
+    def test_clicks_validated_in_order(self):
+        make_round(self.party)
+        check = mock.AsyncMock(return_value=True)
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            for i in range(5):
+                await communicator.send_json_to(
+                    {"type": "click", "destination": f"Page{i}"}
+                )
+            while not await communicator.receive_nothing():
+                await communicator.receive_from()
+            # every click moves member, so none of them is merged away
+            self.assertEqual(
+                [x.args[:2] for x in check.await_args_list],
+                [("Milk", "Page0")] + [(f"Page{i}", f"Page{i + 1}") for i in range(4)],
+            )
+            await communicator.disconnect()
+
+        with mock.patch("wiki_app.websockets.consumers.check_valid_transition", check):
+            self.run_scenario(scenario)
+
+    @mock.patch("wiki_app.websockets.flow.ACTION_RATE_PER_PARTY", 0.01)
+    @mock.patch("wiki_app.websockets.flow.ACTION_BURST_PER_PARTY", 1)
+    def test_party_rate_limit(self):
+        make_round(self.party)
+
+        async def scenario():
+            communicator = await self.connect(self.host)
+            await communicator.send_json_to({"type": "click", "destination": "Cow"})
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.send_json_to({"type": "click", "destination": "Milk"})
+            self.assertEqual(
+                await communicator.receive_json_from(), {"error": "rate limited"}
+            )
+            # rejected click is undone on client
+            self.assertEqual(
+                await communicator.receive_json_from(),
+                {"type": "force_redirect", "data": {"page": "Cow"}},
+            )
+            await communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_replay(self):
+        make_round(self.party)
+        player = self.party.members.exclude(pk=self.host.pk).get()
+
+        async def scenario():
+            host_communicator = await self.connect(self.host)
+            communicator = await self.connect(player, is_admin=False)
+            await self.act(host_communicator, {"type": "click", "destination": "Cow"})
+            await self.act(communicator, {"type": "click", "destination": "Grass"})
+            await self.act(
+                host_communicator, {"type": "click", "destination": "Mozzarella"}
+            )
+            await self.act(host_communicator, {"type": "finish_early"})
+            round_id = await sync_to_async(
+                lambda: Party.objects.get(pk=self.party.pk).current_round_id
+            )()
+            replay = WebsocketCommunicator(
+                websocket_router, f"/replay/{self.party.uid}/{round_id}"
+            )
+            connected, _ = await replay.connect()
+            self.assertTrue(connected)
+            start = await replay.receive_json_from()
+            self.assertEqual(start["type"], "replay_start")
+            self.assertEqual(len(start["data"]["members"]), 2)
+            events = await replay.receive_json_from()
+            self.assertEqual(events["type"], "replay_events")
+            self.assertEqual(
+                [x[1:] for x in events["data"]],
+                [
+                    [self.host.pk, "Cow"],
+                    [player.pk, "Grass"],
+                    [self.host.pk, "Mozzarella"],
+                ],
+            )
+            self.assertEqual((await replay.receive_json_from())["type"], "replay_end")
+            await communicator.disconnect()
+            await host_communicator.disconnect()
+
+        self.run_scenario(scenario)
+
+    def test_load_generator(self):
+        simulation = Simulation(
+            2, 2, 1, ["Milk", "Cow", "Mozzarella"], think_time=0, timeout=5
+        )
+        connections = [
+            [CommunicatorConnection(websocket_router, path) for path in party]
+            for party in simulation.create_parties()
+        ]
+        with instrument(simulation.recorder):
+            results = async_to_sync(simulation.run)(connections)
+        self.assertEqual(results["clicks"], 8)
+        self.assertEqual(results["timeouts"], {})
+        for message_type in ["connect", "new_round", "solved", "round_finished"]:
+            self.assertEqual(results["latency"][message_type]["count"], 4)
+        self.assertEqual(results["handlers"]["new_round"]["count"], 2)
+        self.assertGreater(results["queries_per_action"]["click"], 0)
+
+
+class ReplayTests(TestCase):
+    @mock.patch("wiki_app.data.replay.REPLAY_BATCH_SIZE", 2)
+    def test_batches_merged_in_time_order(self):
+        party = make_party(3)
+        make_round(party)
+        member_rounds = list(party.current_round.member_rounds.all())
+        start_time = party.current_round.start_time
+        # overlapping batches, e.g. written by different workers
+        for i, member_round in enumerate(member_rounds):
+            for j in range(2):
+                click_time = start_time + timedelta(seconds=j * 10 + i)
+                with mock.patch("django.utils.timezone.now", return_value=click_time):
+                    record_click(member_round, f"Page{i}{j}")
+        self.assertEqual(RoundEventBatch.objects.count(), 3)
+
+        async def collect():
+            return [x async for x in stream_round_events(party.current_round_id)]
+
+        events = async_to_sync(collect)()
+        self.assertEqual([x[0] for x in events], [0, 1000, 2000, 10000, 11000, 12000])
+        self.assertEqual(events[1][1:], (member_rounds[1].member_id, "Page10"))
+
+    @mock.patch("wiki_app.data.replay._flusher", mock.Mock())
+    def test_buffer_written_by_flusher(self):
+        party = make_party(1)
+        make_round(party)
+        member_round = party.current_round.member_rounds.get()
+        record_click(member_round, "Cow")
+        self.assertTrue(has_pending_events(party.current_round_id))
+        # buffer is written once old enough, even if nothing else happens in worker
+        _flush_old_buffers(time.monotonic() - REPLAY_FLUSH_SECONDS)
+        self.assertFalse(RoundEventBatch.objects.exists())
+        _flush_old_buffers(time.monotonic())
+        self.assertEqual(RoundEventBatch.objects.count(), 1)
+        self.assertFalse(has_pending_events(party.current_round_id))
+        flush_events(round_id=party.current_round_id)
+        self.assertEqual(RoundEventBatch.objects.count(), 1)
+
+    @mock.patch("wiki_app.data.replay._flusher", mock.Mock())
+    def test_buffer_of_dead_worker_expires(self):
+        party = make_party(1)
+        make_round(party)
+        record_click(party.current_round.member_rounds.get(), "Cow")
+        self.assertTrue(has_pending_events(party.current_round_id))
+        # buffer of a worker which died before writing it isn't waited for forever
+        later = timezone.now() + timedelta(seconds=REPLAY_FLUSH_SECONDS * 2)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertFalse(has_pending_events(party.current_round_id))
+        flush_events(party_id=str(party.uid))
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        titles = ["Milk", "Cow", "Grass", "Cheese", "Mozzarella"]
+        links = [(0, 1), (0, 3), (1, 2), (2, 1), (3, 4), (1, 3)]
+        self.graph = LinkGraph.from_links(titles, links)
+
+    def test_distances(self):
+        distances = self.graph.distances_to(self.graph.get_id("Mozzarella"))
+        self.assertEqual(list(distances), [2, 2, 3, 1, 0])
+        distances = self.graph.distances_to(self.graph.get_id("Milk"))
+        self.assertEqual(list(distances), [0] + [UNREACHABLE] * 4)
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as path:
+            self.graph.save(path)
+            graph = LinkGraph.load(path)
+            self.assertEqual(graph.titles[3], "Cheese")
+            self.assertEqual(graph.size, 5)
+            # titles are resolved like wiki does: only the first letter is case-insensitive
+            self.assertEqual(graph.get_id("mozzarella"), 4)
+            self.assertEqual(graph.get_id("MOZZARELLA"), -1)
+
+    def test_paths(self):
+        distances = self.graph.distances_to(self.graph.get_id("Mozzarella"))
+        events = [
+            (1000, 1, "Cheese"),
+            (2000, 1, "Mozzarella"),
+            (1000, 2, "Cow"),
+            (2000, 2, "Grass"),
+            (3000, 2, "Cow"),
+            (4000, 2, "Unknown"),
+        ]
+        analytics = analyze_paths(self.graph, distances, "Milk", events)
+        self.assertEqual(analytics["optimal_clicks"], 2)
+        self.assertEqual(
+            analytics["members"],
+            {
+                "1": {"clicks": 2, "wasted_clicks": 0, "distance_left": 0},
+                "2": {"clicks": 4, "wasted_clicks": 3, "distance_left": None},
+            },
+        )
+        self.assertEqual(
+            analytics["biggest_detours"][0],
+            {"member": 2, "from": "Cow", "to": "Grass", "cost": 2},
+        )
+        self.assertEqual(len(analytics["biggest_detours"]), 2)
+
+    @mock.patch("wiki_app.data.replay._flusher", mock.Mock())
+    def test_round_analytics(self):
+        party = make_party(2)
+        party_round = make_round(party)
+        member_round = party_round.member_rounds.get(member__name="player0")
+        for page in ["Cheese", "Mozzarella"]:
+            record_click(member_round, page)
+        flush_events(round_id=party_round.pk)
+        with mock.patch(
+            "wiki_app.data.analytics.get_link_graph", return_value=self.graph
+        ):
+            analytics = analyze_round(party_round)
+        member_id = str(member_round.member_id)
+        self.assertEqual(list(analytics["members"]), [member_id])
+        # frontend shows stats by members' names
+        self.assertEqual(len(analytics["names"]), 2)
+        self.assertEqual(analytics["names"][member_id], "player0")
+
+    def test_distance_cache(self):
+        cache = DistanceCache()
+        with mock.patch("wiki_app.data.hints.get_link_graph", return_value=self.graph):
+            cheese = cache.acquire("party1", "Cheese")
+            # rounds with the same target share distances
+            self.assertIs(cache.acquire("party2", "Cheese"), cheese)
+            self.assertIsNone(cache.acquire("party3", "Unknown"))
+            self.assertEqual(
+                cache.memory(),
+                {"rounds": 2, "targets": 1, "bytes": 5, "bytes_per_round": 2},
+            )
+            # party's new round replaces previous one
+            cache.acquire("party1", "Mozzarella")
+            self.assertEqual(cache.memory()["targets"], 2)
+            self.assertEqual(
+                get_hints(cache.get("party1"), ["Milk", "Grass", "Unknown"]),
+                {"Milk": 2, "Grass": 3, "Unknown": None},
+            )
+            # distances are evicted, once their rounds have ended
+            cache.release("party1")
+            cache.release("party2")
+            self.assertEqual(cache.memory()["bytes"], 0)
+            self.assertIsNone(cache.get("party1"))
+
+
+@mock.patch("wiki_app.rounds.views.ensure_refilling", mock.Mock())
+class RoundPairTests(TestCase):
+    def setUp(self):
+        # chain of pages: Page0 -> Page1 -> ... -> Page7
+        titles = [f"Page{i}" for i in range(8)]
+        self.graph = LinkGraph.from_links(titles, [(i, i + 1) for i in range(7)])
+
+    def test_refill_from_graph(self):
+        with mock.patch(
+            "wiki_app.data.round_pairs.get_link_graph", return_value=self.graph
+        ):
+            refill_pool(size=2, max_attempts=200)
+        for difficulty, (low, high) in DIFFICULTIES.items():
+            pairs = RoundPair.objects.filter(difficulty=difficulty)
+            self.assertEqual(len(pairs), 2)
+            for pair in pairs:
+                self.assertTrue(low <= len(pair.solution) - 1 <= high)
+                self.assertEqual(pair.solution[0], pair.start_page)
+                self.assertEqual(pair.solution[-1], pair.end_page)
+
+    def test_api_round_pair(self):
+        RoundPair(
+            start_page="Milk",
+            end_page="Mozzarella",
+            difficulty="easy",
+            solution=["Milk", "Cheese", "Mozzarella"],
+        ).save()
+        party = make_party(2)
+        params = {"difficulty": "easy", "party": str(party.uid)}
+        # only party hosts may drain pools
+        response = self.client.post("/api/round_pair", params)
+        self.assertEqual(response.status_code, 403)
+        log_in(self.client, party.members.get(name="player1").user_id)
+        response = self.client.post("/api/round_pair", params)
+        self.assertEqual(response.status_code, 403)
+        log_in(self.client, party.adminrole.admin_member.user_id)
+        response = self.client.post("/api/round_pair", {**params, "party": "x"})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.post("/api/round_pair", params)
+        self.assertEqual(
+            response.json(),
+            {
+                "origin": "Milk",
+                "target": "Mozzarella",
+                "difficulty": "easy",
+                "clicks": 2,
+            },
+        )
+        # pool is empty now
+        response = self.client.post("/api/round_pair", params)
+        self.assertEqual(response.status_code, 503)
+        response = self.client.post(
+            "/api/round_pair", {**params, "difficulty": "impossible"}
+        )
+        self.assertEqual(response.status_code, 400)
+        # pairs are taken only on explicit requests
+        response = self.client.get("/api/round_pair", params)
+        self.assertEqual(response.status_code, 405)
+        # round starts with known solution
+        party_round = make_round(party)
+        party_round.start_page, party_round.end_page = "milk", "Mozzarella"
+        with mock.patch("wiki_app.data.db.solve_round") as solve_round:
+            async_to_sync(start_solving)(party_round)
+        solve_round.assert_not_called()
+        self.assertEqual(party_round.solution, ["Milk", "Cheese", "Mozzarella"])
+
+
+class TitleIndexTests(TestCase):
+    def setUp(self):
+        titles = ["Milk", "Milky Way", "Milkshake", "Mozzarella", "Millet", "Cow"]
+        popularity = [50, 40, 5, 30, 1, 100]
+        with tempfile.TemporaryDirectory() as path:
+            TitleIndex.build(titles, popularity).save(path)
+            self.index = TitleIndex.load(path)
+
+    def test_search(self):
+        self.assertEqual(
+            self.index.search("mil", 3), ["Milk", "Milky Way", "Milkshake"]
+        )
+        self.assertEqual(self.index.search("milky_w"), ["Milky Way"])
+        self.assertEqual(self.index.search("M", 2), ["Milk", "Milky Way"])
+        self.assertEqual(self.index.search("Cheese"), [])
+
+    def test_exists(self):
+        self.assertTrue(self.index.exists("milky_Way"))
+        self.assertFalse(self.index.exists("Milky"))
+
+    def test_api_titles(self):
+        with mock.patch("wiki_app.titles.views.get_title_index", return_value=None):
+            self.assertEqual(self.client.get("/api/titles?prefix=a").status_code, 503)
+        with mock.patch(
+            "wiki_app.titles.views.get_title_index", return_value=self.index
+        ):
+            response = self.client.get("/api/titles", {"prefix": "Mo"})
+            self.assertEqual(response.json(), {"titles": ["Mozzarella"]})
+            response = self.client.get("/api/titles", {"title": "Cow"})
+            self.assertEqual(response.json(), {"exists": True})
+            # limit is clamped to a sane range
+            response = self.client.get("/api/titles", {"prefix": "M", "limit": -10})
+            self.assertEqual(response.json(), {"titles": ["Milk"]})
+            response = self.client.get("/api/titles", {"prefix": "M", "limit": "x"})
+            self.assertEqual(response.status_code, 400)
+
+
+DUMPS = os.path.join(BASE_DIR, "wiki_app", "fixtures", "dumps")
+
+
+class LinkGraphBuilderTests(TestCase):
+    def compress_dumps(self, path, tables, opener, extension):
+        for table, source in tables.items():
+            with open(os.path.join(DUMPS, source), "rb") as f, opener(
+                os.path.join(path, f"testwiki-latest-{table}.sql{extension}"), "wb"
+            ) as out:
+                out.write(f.read())
+
+    def assertGraph(self, path):
+        graph = LinkGraph.load(path)
+        self.assertEqual(
+            list(graph.titles),
+            ["Milk", "Cow", "Cheese", "Mozzarella", "Farmers' market (1,2)", "Молоко"],
+        )
+
+        def links(title):
+            page = graph.get_id(title)
+            targets = graph.forward_targets[
+                graph.forward_offsets[page] : graph.forward_offsets[page + 1]
+            ]
+            return sorted(graph.titles[x] for x in targets)
+
+        self.assertEqual(links("Milk"), ["Cheese", "Cow"])
+        # links to redirects are folded, self-links are dropped
+        self.assertEqual(links("Cow"), ["Milk"])
+        self.assertEqual(links("Cheese"), ["Milk", "Mozzarella"])
+        # links to redirect loops and missing pages are dropped
+        self.assertEqual(links("Mozzarella"), [])
+        # redirect chain
+        self.assertEqual(links("Молоко"), ["Milk"])
+        self.assertEqual(list(np.diff(graph.backward_offsets)), [3, 1, 2, 1, 0, 0])
+        with open(os.path.join(path, "redirect_titles.txt"), encoding="utf-8") as f:
+            self.assertEqual(
+                f.read().split("\n")[:-1], ["Cow's milk", "Dairy cattle", "Milch"]
+            )
+        self.assertEqual(
+            list(np.load(os.path.join(path, "redirect_targets.npy"))), [0, 1, 0]
+        )
+        dictionary = TitleDictionary.load(path)
+        self.assertEqual(dictionary.get("milch"), 0)
+        self.assertEqual(dictionary.get("Dairy_cattle"), 1)
+        self.assertEqual(dictionary.get("Loop A"), -1)
+
+    def test_title_links(self):
+        tables = {
+            x: f"testwiki-latest-{x}.sql" for x in ["page", "redirect", "pagelinks"]
+        }
+        with tempfile.TemporaryDirectory() as dumps, tempfile.TemporaryDirectory() as output:
+            self.compress_dumps(dumps, tables, gzip.open, ".gz")
+            stats = build_link_graph(
+                dumps, "test", output, memory_mb=0, report=lambda x: None
+            )
+            self.assertGraph(output)
+            call_command(
+                "build_title_index",
+                graph=output,
+                output=os.path.join(output, "index"),
+                stdout=io.StringIO(),
+            )
+            index = TitleIndex.load(os.path.join(output, "index"))
+        # redirects exist, as wiki follows them, but aren't suggested
+        self.assertTrue(index.exists("Milch"))
+        self.assertTrue(index.exists("Dairy_cattle"))
+        self.assertFalse(index.exists("Loop A"))
+        self.assertEqual(index.search("mil"), ["Milk"])
+        self.assertEqual(stats["pages"], 6)
+        self.assertEqual(stats["links"], 7)
+        self.assertEqual(stats["tables"]["pagelinks"]["rows"], 13)
+
+    def test_link_targets(self):
+        tables = {
+            "page": "testwiki-latest-page.sql",
+            "redirect": "testwiki-latest-redirect.sql",
+            "pagelinks": "linktarget/testwiki-latest-pagelinks.sql",
+            "linktarget": "linktarget/testwiki-latest-linktarget.sql",
+        }
+        with tempfile.TemporaryDirectory() as dumps, tempfile.TemporaryDirectory() as output:
+            self.compress_dumps(dumps, tables, bz2.open, ".bz2")
+            call_command(
+                "build_link_graph",
+                dumps,
+                wiki="test",
+                output=output,
+                stdout=io.StringIO(),
+            )
+            self.assertGraph(output)
+
+
+class TitleDictionaryTests(TestCase):
+    def setUp(self):
+        titles = ["Milk", "Cow", "Cow's milk", "Dairy cattle", "iPhone"]
+        with tempfile.TemporaryDirectory() as path:
+            TitleDictionary.build(titles, [0, 1, 0, 1, 2]).save(path)
+            self.dictionary = TitleDictionary.load(path)
+
+    def test_normalize_title(self):
+        self.assertEqual(normalize_title("cow%27s__milk "), "Cow's milk")
+        self.assertEqual(normalize_title("milk#History"), "Milk")
+        # only the first letter is case-insensitive
+        self.assertNotEqual(
+            normalize_title("Cow's Milk"), normalize_title("cow's milk")
+        )
+
+    def test_get(self):
+        self.assertEqual(self.dictionary.get("cow's_milk"), 0)
+        self.assertEqual(self.dictionary.get("IPhone"), 2)
+        self.assertEqual(self.dictionary.get("Cow's Milk"), -1)
+        self.assertEqual(len(self.dictionary), 5)
+
+    def test_resolve_locally(self):
+        with mock.patch(
+            "wiki_race.wiki_api.parse.get_title_dictionary",
+            return_value=self.dictionary,
+        ), mock.patch("requests.Session.get", side_effect=AssertionError) as get:
+            self.assertTrue(compare_titles("milk", "Cow's milk"))
+            self.assertFalse(compare_titles("Milk", "Dairy cattle"))
+            self.assertEqual(
+                resolve_page_ids("Milk", "Dairy_cattle"),
+                {"Milk": 0, "Dairy_cattle": 1},
+            )
+            # unknown titles are resolved with wiki api
+            with self.assertRaises(AssertionError):
+                compare_titles("Milk", "Cheese")
+            self.assertEqual(get.call_count, 1)
+
+
+class ArticleArchiveTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        # tiny clusters, so that articles are spread over several
+        with ArchiveWriter(self.directory.name, cluster_size=100) as writer:
+            writer.add("Milk", "<p>Milk of <a>Cow</a></p>", ["Cow", "Cheese"])
+            writer.add("Cow", "<p>Cow</p>" * 50, ["Milk"], redirects=["Dairy cattle"])
+            writer.add("Молоко", "<p>Молоко</p>", [])
+            writer.add_redirect("Cow's milk", "Milk")
+        self.archive = ArticleArchive(self.directory.name, cache_size=1)
+        self.addCleanup(self.directory.cleanup)
+
+    def test_get(self):
+        self.assertEqual(len(self.archive.cluster_offsets) - 1, 2)
+        self.assertEqual(self.archive.get("cow's_milk")["title"], "Milk")
+        self.assertEqual(self.archive.get("Dairy cattle")["links"], ["Milk"])
+        self.assertEqual(self.archive.get("молоко")["text"], "<p>Молоко</p>")
+        self.assertIsNone(self.archive.get("Cheese"))
+
+    def test_source(self):
+        with mock.patch(
+            "wiki_race.wiki_api.parse.get_article_source",
+            return_value=ArchiveSource(self.archive),
+        ), mock.patch("aiohttp.ClientSession", side_effect=AssertionError):
+            article = async_to_sync(load_wiki_page)("dairy_cattle")
+            self.assertEqual(article.title, "Cow")
+            self.assertEqual(article.properties, [{"ns": 0, "exists": "", "*": "Milk"}])
+            self.assertIsNone(async_to_sync(load_wiki_page)("Cheese"))
+            self.assertTrue(async_to_sync(check_valid_transition)("Milk", "cow"))
+            self.assertFalse(async_to_sync(check_valid_transition)("Молоко", "Milk"))
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        patcher = mock.patch("wiki_race.metrics.METRICS_DIR", self.directory.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_render(self):
+        metrics.inc("wikirace_solve_round_total", outcome='"odd"\n')
+        metrics.observe("wikirace_format_seconds", 0.01)
+        metrics.observe("wikirace_format_seconds", 100)
+        text = metrics.render()
+        self.assertIn("# TYPE wikirace_format_seconds histogram", text)
+        self.assertIn('wikirace_solve_round_total{outcome="\\"odd\\"\\n"}', text)
+        # buckets are cumulative
+        self.assertRegex(text, r'wikirace_format_seconds_bucket{le="0.01"} [1-9]')
+        count = float(text.split("wikirace_format_seconds_count ")[1].split()[0])
+        infinite = text.split('wikirace_format_seconds_bucket{le="+Inf"} ')[1]
+        self.assertEqual(float(infinite.split()[0]), count)
+
+    def test_aggregate(self):
+        # metrics of another live worker are added, those of stopped workers are dropped
+        stopped = subprocess.Popen([sys.executable, "-c", ""])
+        stopped.wait()
+        for pid in [os.getppid(), stopped.pid]:
+            with open(os.path.join(self.directory.name, f"{pid}.json"), "w") as f:
+                json.dump(
+                    {
+                        "values": [["wikirace_active_sockets", [], 5]],
+                        "histograms": [],
+                    },
+                    f,
+                )
+        own = sum(
+            value
+            for name, _, value in metrics.snapshot()["values"]
+            if name == "wikirace_active_sockets"
+        )
+        sockets = metrics.aggregate()["values"]["wikirace_active_sockets", ()]
+        self.assertEqual(sockets, own + 5)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.directory.name, f"{stopped.pid}.json"))
+        )
+
+    def test_track_queries(self):
+        queries = metrics.QueryStats()
+        token = metrics.current_queries.set(queries)
+        try:
+            list(Party.objects.all())
+            User.objects.count()
+        finally:
+            metrics.current_queries.reset(token)
+        self.assertEqual(queries.count, 2)
+
+    @mock.patch("wiki_app.monitoring.views.DEBUG", True)
+    def test_endpoint(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"# TYPE wikirace_active_sockets gauge", response.content)
+        with mock.patch("wiki_app.monitoring.views.METRICS_TOKEN", "secret"):
+            self.assertEqual(self.client.get("/metrics").status_code, 403)
+            response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer secret")
+            self.assertEqual(response.status_code, 200)
+        # production metrics require token
+        with mock.patch("wiki_app.monitoring.views.DEBUG", False):
+            self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+    def test_http_session_per_thread(self):
+        session = http_session("ru")
+        self.assertIs(http_session("ru"), session)
+        self.assertIsNot(http_session(DEFAULT_WIKI), session)
+        # sessions aren't shared with other threads, e.g. round pair refills
+        other = []
+        thread = threading.Thread(target=lambda: other.append(http_session("ru")))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], session)
+
+
+class TracingTests(TestCase):
+    def test_slow_trace(self):
+        @tracing.traced("inner")
+        def inner():
+            pass
+
+        async def handler():
+            with tracing.span("ws click"):
+                await tracing.sync_to_async(inner)()
+
+        with mock.patch("wiki_race.tracing.SLOW_OPERATION_SECONDS", 1e-9):
+            with self.assertLogs("wikirace.slow") as logs:
+                async_to_sync(handler)()
+        # spans made in database thread are nested in trace
+        message = logs.output[0]
+        self.assertIn("\nws click", message)
+        self.assertIn("\n  sync:", message)
+        self.assertIn("\n    inner", message)
+
+    def test_fast_trace(self):
+        with mock.patch("wiki_race.tracing.SLOW_OPERATION_SECONDS", 60):
+            with mock.patch.object(tracing.logger, "warning") as warning:
+                with tracing.span("fast") as span:
+                    with tracing.span("nested"):
+                        pass
+        warning.assert_not_called()
+        self.assertEqual([x.name for x in span.children], ["nested"])
+
+    def test_profile(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=stop.wait, name="busy")
+        worker.start()
+        try:
+            stacks = profiler.sample(0.05, 0.01)
+        finally:
+            stop.set()
+            worker.join()
+        self.assertTrue(any(stack.startswith("busy;") for stack in stacks))
+        self.assertRegex(profiler.collapsed(stacks), r"(?m)^busy;.*wait .* \d+$")
+
+    def test_profile_view(self):
+        self.assertEqual(self.client.get("/debug/profile").status_code, 403)
+        admin = DjangoUser.objects.create_user("admin", password="admin", is_staff=True)
+        self.client.force_login(admin)
+        self.assertEqual(
+            self.client.get("/debug/profile?seconds=1000").status_code, 400
+        )
+        self.assertEqual(self.client.get("/debug/profile/result").status_code, 404)
+        # profile is recorded in background, without the request waiting for it
+        response = self.client.get("/debug/profile?seconds=0.05&interval=0.01")
+        self.assertEqual(response.status_code, 202)
+        response = self.client.get("/debug/profile?seconds=0.05&interval=0.01")
+        self.assertEqual(response.status_code, 409)
+        while profiler.is_profiling():
+            time.sleep(0.01)
+        response = self.client.get("/debug/profile/result")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"MainThread;", response.content)
+
+
+class StartupTests(TestCase):
+    def test_prepare_database(self):
+        out = io.StringIO()
+        call_command("prepare_database", stdout=out)
+        self.assertEqual(out.getvalue().strip(), "Database is up to date")
+
+    def test_lifespan(self):
+        messages = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message["type"])
+
+        async def prewarm():
+            sent.append("prewarm")
+
+        async def run():
+            await lifespan({"type": "lifespan"}, receive, send)
+            # let pre-warming task run
+            await asyncio.sleep(0)
+
+        with mock.patch("wiki_race.startup.FAST_START", True), mock.patch(
+            "wiki_race.startup.prewarm", prewarm
+        ):
+            async_to_sync(run)()
+        self.assertEqual(sent[0], "lifespan.startup.complete")
+        self.assertIn("lifespan.shutdown.complete", sent)
+
+    def test_import_times(self):
+        stderr = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       100 |        100 |     aiohttp.http",
+                "import time:       300 |       4000 |   aiohttp",
+                "import time:       500 |       5000 | wiki_race.asgi",
+                "import time:       200 |        200 | json",
+            ]
+        )
+        self.assertEqual(
+            parse_import_times(stderr, 2), [["wiki_race.asgi", 5.0], ["aiohttp", 4.0]]
+        )
+        self.assertEqual(parse_import_times(stderr, 5, depth=0)[-1], ["json", 0.2])
+
+
+RU_WIKI = {
+    "api": "https://ru.wikipedia.org/w/api.php",
+    "link_graph": None,
+    "title_index": None,
+    "title_dictionary": None,
+    "article_archive": None,
+}
+
+
+@mock.patch.dict(WIKIS, {"ru": RU_WIKI})
+@mock.patch("wiki_app.rounds.views.ensure_refilling", mock.Mock())
+class MultiWikiTests(TestCase):
+    def test_create_party(self):
+        form = {"name": "host", "time_limit_seconds": 600}
+        self.client.get("/api/create", {**form, "language": "ru"})
+        self.assertEqual(Party.objects.get().language, "ru")
+        self.assertFalse(Party.objects.get().hints_enabled)
+        response = self.client.get("/api/create", {**form, "language": "xx"})
+        self.assertEqual(response.status_code, 400)
+        # hints are enabled by host
+        self.client.get("/api/create", {**form, "hints": "on"})
+        self.assertTrue(Party.objects.filter(hints_enabled=True).exists())
+        # parties without language play on default wiki
+        self.assertEqual(make_party(1).language, DEFAULT_WIKI)
+
+    def test_wiki_page(self):
+        article = Article("Молоко", "<p>Молоко</p>", [])
+        with mock.patch(
+            "wiki_parser.views.load_wiki_page", mock.AsyncMock(return_value=article)
+        ) as load:
+            response = self.client.get("/wiki/ru/Молоко")
+            load.assert_called_once_with("Молоко", "ru")
+            self.assertContains(response, "https://ru.wikipedia.org/w/load.php?lang=ru")
+            response = self.client.get("/wiki/xx/Молоко")
+            self.assertEqual(response.status_code, 404)
+            load.assert_called_once()
+        # unknown wikis don't add metric series
+        self.assertIn(
+            'wikirace_page_cache_total{outcome="miss",wiki="unknown"}',
+            metrics.render(),
+        )
+        self.assertNotIn('wiki="xx"', metrics.render())
+
+    def test_round_pairs(self):
+        RoundPair(
+            start_page="Milk",
+            end_page="Mozzarella",
+            difficulty="easy",
+            solution=["Milk", "Cheese", "Mozzarella"],
+        ).save()
+        # pairs are taken from pool of party's wiki
+        parties = [make_party(1) for _ in range(2)]
+        Party.objects.filter(pk=parties[0].pk).update(language="ru")
+        params = {"difficulty": "easy"}
+        log_in(self.client, parties[0].adminrole.admin_member.user_id)
+        response = self.client.post(
+            "/api/round_pair", {**params, "party": str(parties[0].uid)}
+        )
+        self.assertEqual(response.status_code, 503)
+        log_in(self.client, parties[1].adminrole.admin_member.user_id)
+        response = self.client.post(
+            "/api/round_pair", {**params, "party": str(parties[1].uid)}
+        )
+        self.assertEqual(response.json()["origin"], "Milk")
+
+    def test_distance_cache(self):
+        graphs = {
+            DEFAULT_WIKI: LinkGraph.from_links(["Milk", "Cheese"], [(0, 1)]),
+            "ru": LinkGraph.from_links(["Молоко", "Cheese", "Milk"], [(2, 1)]),
+        }
+        cache = DistanceCache()
+        with mock.patch("wiki_app.data.hints.get_link_graph", graphs.get):
+            english = cache.acquire("party1", "Cheese")
+            # the same target in another wiki has distances of its own
+            russian = cache.acquire("party2", "Cheese", "ru")
+            self.assertEqual(cache.memory()["targets"], 2)
+            self.assertEqual(get_hints(english, ["Milk"]), {"Milk": 1})
+            self.assertEqual(get_hints(russian, ["Молоко"], "ru"), {"Молоко": None})
+
+    def test_solve_round(self):
+        graph = LinkGraph.from_links(["Молоко", "Корова", "Сыр"], [(0, 1), (1, 2)])
+        with mock.patch(
+            "wiki_race.wiki_graph.graph.get_link_graph", return_value=graph
+        ), mock.patch.dict(RU_WIKI, link_graph="graph"):
+            self.assertEqual(
+                async_to_sync(solve_round)("Молоко", "Сыр", "ru"),
+                ["Молоко", "Корова", "Сыр"],
+            )
+            self.assertIsNone(async_to_sync(solve_round)("Сыр", "Молоко", "ru"))
+        # six degrees of wikipedia only knows english wiki
+        with mock.patch("aiohttp.ClientSession", side_effect=AssertionError):
+            self.assertIsNone(async_to_sync(solve_round)("Молоко", "Сыр", "ru"))
+            self.assertEqual(refill_pool(size=1, language="ru"), 0)
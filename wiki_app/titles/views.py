@@ -0,0 +1,29 @@
+from django.http import HttpRequest, HttpResponse, JsonResponse, HttpResponseBadRequest
+
+from wiki_race.settings import DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_graph.titles import get_title_index
+
+MAX_SUGGESTIONS = 20
+
+
+def api_titles(request: HttpRequest) -> HttpResponse:
+    """
+    API view for title autocomplete (`prefix` parameter) and page existence checks (`title` parameter)
+     in wiki of given `language`.
+    """
+    language = request.GET.get("language", DEFAULT_WIKI)
+    if language not in WIKIS:
+        return HttpResponseBadRequest()
+    index = get_title_index(language)
+    # without local index, clients have to use wiki api
+    if index is None:
+        return JsonResponse({"error": "no title index"}, status=503)
+    if "title" in request.GET:
+        return JsonResponse({"exists": index.exists(request.GET["title"])})
+    if "prefix" not in request.GET:
+        return HttpResponseBadRequest()
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 5)), MAX_SUGGESTIONS))
+    except ValueError:
+        return HttpResponseBadRequest()
+    return JsonResponse({"titles": index.search(request.GET["prefix"], limit)})
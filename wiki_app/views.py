@@ -2,15 +2,18 @@ from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 
-from wiki_app.data.db import get_user, is_admin
-from wiki_app.models import Party, PartyMember
+from wiki_app.data.db import get_member
+from wiki_app.data.identity import get_user_id, set_user_cookie, make_member_token
+from wiki_app.models import Party
 from wiki_app.websockets import urls
 from wiki_race.settings import (
-    USER_COOKIE_NAME,
     MIN_TIME_LIMIT_SECONDS,
     MAX_TIME_LIMIT_SECONDS,
     USE_SECURE_WEBSOCKETS,
+    DEFAULT_WIKI,
+    WIKIS,
 )
+from wiki_race.wikis import wiki_path
 
 
 def index_view(request: HttpRequest) -> HttpResponse:
@@ -30,6 +33,8 @@ def new_party_page(request: HttpRequest) -> HttpResponse:
         context={
             "min_seconds": MIN_TIME_LIMIT_SECONDS,
             "max_seconds": MAX_TIME_LIMIT_SECONDS,
+            "languages": sorted(WIKIS),
+            "default_language": DEFAULT_WIKI,
         },
     )
 
@@ -45,21 +50,22 @@ def game_page(request: HttpRequest, game_id: str) -> HttpResponse:
     """
     Main game view
     """
-    # get user via cookie
-    user = get_user(request)
-    # get party object
-    party = get_object_or_404(Party, uid=game_id)
+    # get user id via cookie
+    user_id = get_user_id(request)
     # check if user is already a party member
-    member_present = PartyMember.objects.filter(party=party, user=user).count()
-    if member_present == 0:
+    member = get_member(game_id, user_id)
+    if member is None:
+        # get party object
+        party = get_object_or_404(Party, uid=game_id)
         # if no such member, redirect to join
         response = redirect(join_page, game_id=party.uid)
     else:
-        # if already member, generate websocket url
+        # if already member, generate websocket url with signed member token
+        token = make_member_token(game_id, member.pk, member.is_admin)
         uri = reverse(
             "game-websocket",
             urlconf=urls,
-            kwargs={"game_id": game_id, "user_id": user.uid},
+            kwargs={"game_id": game_id, "token": token},
         )
         websocket_protocol = "wss" if USE_SECURE_WEBSOCKETS else "ws"
         # load game page
@@ -69,9 +75,14 @@ def game_page(request: HttpRequest, game_id: str) -> HttpResponse:
             context={
                 "WEBSOCKET_URL": f"{websocket_protocol}://{request.get_host()}{uri}",
                 "GAME_URL": f"{request.get_host()}{reverse('game-page', kwargs={'game_id': game_id})}",
-                "is_admin": is_admin(party, user),
+                "PARTY_ID": game_id,
+                "is_admin": member.is_admin,
+                "WIKI_LANGUAGE": member.party.language,
+                "HAS_TITLE_INDEX": bool(
+                    wiki_path(member.party.language, "title_index")
+                ),
             },
         )
     # set user's cookie
-    response.set_cookie(USER_COOKIE_NAME, user.uid)
+    set_user_cookie(response, user_id)
     return response
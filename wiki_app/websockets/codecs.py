@@ -0,0 +1,130 @@
+import json
+from collections import OrderedDict
+from typing import Iterable, Optional, Union, List
+
+import msgpack
+
+
+class Codec:
+    """
+    Wire codec of `GameConsumer` websocket frames.
+    """
+
+    name: str
+    """
+    Codec name, used as websocket subprotocol (except for default codec)
+    """
+
+    def encode(self, message: dict) -> Union[str, bytes]:
+        """
+        Encodes message to frame payload
+        """
+        raise NotImplementedError
+
+    def decode(
+        self, text_data: Optional[str] = None, bytes_data: Optional[bytes] = None
+    ) -> dict:
+        """
+        Decodes received frame
+        :raises: ValueError if frame can't be decoded
+        """
+        raise NotImplementedError
+
+    def frame(self, payload: Union[str, bytes]) -> dict:
+        """
+        Makes keyword arguments for `AsyncWebsocketConsumer.send` from encoded payload
+        """
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """
+    Default codec: text frames with JSON.
+    """
+
+    name = "json"
+
+    def encode(self, message: dict) -> str:
+        return json.dumps(message)
+
+    def decode(
+        self, text_data: Optional[str] = None, bytes_data: Optional[bytes] = None
+    ) -> dict:
+        return json.loads(text_data if text_data is not None else bytes_data)
+
+    def frame(self, payload: str) -> dict:
+        return {"text_data": payload}
+
+
+class MsgpackCodec(Codec):
+    """
+    Binary frames with msgpack. Smaller and faster to encode than JSON for big payloads, e.g. leaderboards.
+    """
+
+    name = "wikirace.msgpack"
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message)
+
+    def decode(
+        self, text_data: Optional[str] = None, bytes_data: Optional[bytes] = None
+    ) -> dict:
+        if bytes_data is None:
+            raise ValueError("msgpack codec expects binary frames")
+        return msgpack.unpackb(bytes_data)
+
+    def frame(self, payload: bytes) -> dict:
+        return {"bytes_data": payload}
+
+
+DEFAULT_CODEC = JsonCodec()
+
+codecs = {codec.name: codec for codec in [DEFAULT_CODEC, MsgpackCodec()]}
+"""
+Dict of supported codecs by name
+"""
+
+
+def negotiate_codec(subprotocols: List[str]) -> Codec:
+    """
+    Chooses codec by websocket subprotocols requested by client, in their order of preference.
+    :return: first supported codec, or default JSON codec if none requested
+    """
+    for subprotocol in subprotocols:
+        if subprotocol in codecs:
+            return codecs[subprotocol]
+    return DEFAULT_CODEC
+
+
+def encode_all(message: dict, names: Iterable[str]) -> dict:
+    """
+    Encodes message with each of given codecs, so that it is encoded once for every receiver
+    :param names: names of codecs used by receivers
+    :return: dict of payloads by codec name
+    """
+    return {name: codecs[name].encode(message) for name in set(names)}
+
+
+class EncodingCache:
+    """
+    Payloads of recently received group messages by message id and codec name.
+    Consumers of a worker receive their own copies of a group message, so its payloads are cached,
+     and message is encoded once per codec actually used by its receivers in the worker.
+    """
+
+    def __init__(self, size: int = 64):
+        self.size = size
+        self.payloads: OrderedDict = OrderedDict()
+
+    def encode(self, message_id: str, codec: Codec, message: dict) -> Union[str, bytes]:
+        """
+        Gets payload of message encoded with codec, encoding it on first request
+        """
+        key = (message_id, codec.name)
+        if key in self.payloads:
+            return self.payloads[key]
+        payload = codec.encode(message)
+        self.payloads[key] = payload
+        if len(self.payloads) > self.size:
+            self.payloads.popitem(last=False)
+        return payload
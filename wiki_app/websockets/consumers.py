@@ -1,13 +1,15 @@
 import asyncio
 import base64
-import json
 import logging
+import time
+import uuid
+from collections import Counter
+from typing import List, Tuple
 
-from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from wiki_app.data.analytics import analyze_round
 from wiki_app.data.db import (
-    is_admin,
     new_round,
     get_initial_round_info,
     finish_round,
@@ -17,20 +19,70 @@ from wiki_app.data.db import (
     get_latest_party_round,
     get_time_specific_round_info,
     have_all_solved,
-    get_member,
     get_or_create_member_round,
     check_if_time_ran_out,
     start_solving,
 )
-from wiki_app.models import User, Party, Round, MemberRound
+from wiki_app.data.hints import distance_cache, get_hints, MAX_HINT_PAGES
+from wiki_app.data.identity import load_member_token
+from wiki_app.data.replay import flush_events, has_pending_events
+from wiki_app.models import Party, PartyMember, Round, MemberRound
+from wiki_app.websockets.codecs import negotiate_codec, EncodingCache
+from wiki_app.websockets.flow import (
+    RATE_LIMITED_ACTIONS,
+    MERGEABLE_ACTIONS,
+    SUPERSEDED_MESSAGES,
+    TokenBucket,
+    BoundedQueue,
+    get_party_bucket,
+    stats,
+)
 from wiki_app.websockets.protocol_handlers import protocol_handler, protocol_handlers
-from wiki_race.settings import WIKI_API
+from wiki_race import metrics
+from wiki_race.settings import (
+    ACTION_RATE_PER_SOCKET,
+    ACTION_BURST_PER_SOCKET,
+    ACTION_QUEUE_SIZE,
+    OUTBOX_SIZE,
+    ROUND_ANALYTICS_POLL_SECONDS,
+    ROUND_ANALYTICS_TIMEOUT_SECONDS,
+)
+from wiki_race.tracing import span, sync_to_async
 from wiki_race.wiki_api.parse import check_valid_transition
+from wiki_race.wikis import wiki_api, wiki_path
+
+connected_sockets: Counter = Counter()
+"""
+Accepted websockets of this worker by party id
+"""
+# payloads of group messages received by this worker's consumers
+encoding_cache = EncodingCache()
+
+
+def _collect_sockets() -> None:
+    metrics.set_value("wikirace_active_sockets", sum(connected_sockets.values()))
+    metrics.set_value(
+        "wikirace_active_parties", sum(1 for x in connected_sockets.values() if x)
+    )
+
+
+metrics.add_collector(_collect_sockets)
 
 
 class GameConsumer(AsyncWebsocketConsumer):
     """
     Asynchronous websocket consumer for interacting with web wikirace game page.
+
+    Each frame sent to client is either a single action `{"type": ..., "data": ...}`,
+     or a batch of actions `{"type": "batch", "data": [action, ...]}` to be processed in order.
+    Frames are JSON text by default, client may request another codec via websocket subprotocol, see `codecs`.
+
+    Received actions are queued and handled one by one, with pending hint requests merged, so that only the latest
+     is answered. Clicks and new rounds are rate limited per socket and per party. Clicks are never merged:
+     once a click is dropped or rejected, the following queued ones are skipped and member is redirected
+     to the last confirmed page, so that client and server agree on member's position.
+    Sent frames are queued as well, with pending leaderboards superseded by newer ones,
+     and clients too slow to keep up are disconnected, see `flow`.
     """
 
     async def connect(self) -> None:
@@ -41,18 +93,36 @@ class GameConsumer(AsyncWebsocketConsumer):
         successful_init = await self.init_fields()
         # if data incorrect, refuse connection
         if not successful_init:
-            await self.close()
+            return await self.close()
+        # initialize flow control
+        self.actions = BoundedQueue(ACTION_QUEUE_SIZE, MERGEABLE_ACTIONS)
+        self.outbox = BoundedQueue(OUTBOX_SIZE, SUPERSEDED_MESSAGES)
+        self.bucket = TokenBucket(ACTION_RATE_PER_SOCKET, ACTION_BURST_PER_SOCKET)
+        self.party_bucket = get_party_bucket(str(self.party.uid))
+        self.resync_clicks = False
+        self.action_worker = None
+        self.sender = None
+        self.closing = False
         # join party channel group
         await self.channel_layer.group_add(self.room_name, self.channel_name)
+        # choose wire codec
+        subprotocols = self.scope.get("subprotocols", [])
+        self.codec = negotiate_codec(subprotocols)
         # accept websocket
-        await self.accept()
+        await self.accept(
+            subprotocol=self.codec.name if self.codec.name in subprotocols else None
+        )
+        self.counted = True
+        connected_sockets[str(self.party.uid)] += 1
 
-        # send used api wiki endpoint
-        await self.send_wiki_endpoint()
-        # send leaderboards
-        await self.update_leaderboards()
-        # send round if in progress
-        await self.send_connected_member()
+        # get leaderboards
+        leaderboards = await sync_to_async(generate_leaderboards)(self.party)
+        # send leaderboards to other members
+        await self.group_send(
+            "leaderboard_update", {"leaderboards": leaderboards}, exclude_self=True
+        )
+        # send state snapshot to connected member
+        await self.send_snapshot(leaderboards)
 
     @sync_to_async
     def init_fields(self) -> bool:
@@ -60,21 +130,24 @@ class GameConsumer(AsyncWebsocketConsumer):
         Initializes fields on new websocket request
         :return: true if correct data, false otherwise
         """
-        # get user id in args
-        user_id = self.scope["url_route"]["kwargs"]["user_id"]
+        # get member token in args
+        token = self.scope["url_route"]["kwargs"]["token"]
         # get party id in args
         game_id = self.scope["url_route"]["kwargs"]["game_id"]
-        # get user
-        self.user = User.objects.get(uid=user_id)
+        # verify member token, so that no member lookup is needed
+        identity = load_member_token(token)
+        # if token is invalid or issued for other party, refuse connection
+        if identity is None or identity["party"] != game_id:
+            return False
         # get party
-        self.party = Party.objects.get(uid=game_id)
-        # get member
-        self.member = get_member(self.party, self.user)
-        # if not member, refuse connection
-        if not self.member:
+        try:
+            self.party = Party.objects.get(uid=game_id)
+        except Party.DoesNotExist:
             return False
+        # member is identified by primary key only, which is enough for querying member rounds
+        self.member = PartyMember(pk=identity["member"], party=self.party)
         # check if admin
-        self.is_admin = is_admin(self.party, self.user)
+        self.is_admin = identity["admin"]
 
         # generate channel room name (required to be ascii)
         self.room_name = base64.b64encode(bytes(game_id.encode("ascii"))).decode(
@@ -84,68 +157,222 @@ class GameConsumer(AsyncWebsocketConsumer):
         # clear to accept connection
         return True
 
+    @property
+    def has_link_graph(self) -> bool:
+        """
+        Whether party's wiki has local link graph, so that hints and round analytics are available
+        """
+        return bool(wiki_path(self.party.language, "link_graph"))
+
     async def disconnect(self, close_code) -> None:
         """
         Disconnect from group
         """
-        # Leave room group
-        await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        # stop counting socket
+        if getattr(self, "counted", False):
+            self.counted = False
+            party_id = str(self.party.uid)
+            connected_sockets[party_id] -= 1
+            if connected_sockets[party_id] <= 0:
+                del connected_sockets[party_id]
+                # no socket of party is left in this worker to see its round finished, so write its events now
+                await sync_to_async(flush_events)(party_id=party_id)
+        # Leave room group, if connection has been accepted
+        if hasattr(self, "room_name"):
+            await self.channel_layer.group_discard(self.room_name, self.channel_name)
+        # stop handling actions and sending messages
+        for task in [
+            getattr(self, "action_worker", None),
+            getattr(self, "sender", None),
+        ]:
+            if task is not None:
+                task.cancel()
 
     # Receive message from WebSocket
-    async def receive(self, text_data) -> None:
+    async def receive(self, text_data=None, bytes_data=None) -> None:
         """
         Receive message from websocket
         """
-        # load json data
-        data = json.loads(text_data)
+        # decode data
+        try:
+            data = self.codec.decode(text_data, bytes_data)
+        except ValueError:
+            return await self.send_error("undecodable")
         # get action name
         action = data["type"]
         # if action has no registered handlers, respond with not found
         if action not in protocol_handlers:
             await self.send_error("notfound")
             return
-        # call corresponding handler
-        await protocol_handlers[action](self, data)
+        # queue action, merging it with pending one of the same type if possible
+        outcome = self.actions.put(action, data)
+        stats["receive", action, outcome] += 1
+        if outcome == "dropped":
+            await self.send_error("too many actions")
+            if action != "click":
+                return
+            # member's position is unknown now, so resync it once queued clicks are skipped
+            self.resync_clicks = True
+        # start handling queued actions, if not yet
+        if self.action_worker is None or self.action_worker.done():
+            self.action_worker = asyncio.ensure_future(self.handle_actions())
+
+    async def handle_actions(self) -> None:
+        """
+        Handles queued actions in order, applying rate limits
+        """
+        while self.actions:
+            action = self.actions.head()
+            # skip clicks following a lost one, they would start from a page server doesn't know of
+            if action == "click" and self.resync_clicks:
+                self.actions.get()
+                stats["receive", action, "skipped"] += 1
+                continue
+            if action in RATE_LIMITED_ACTIONS:
+                # wait for socket's rate limit, meanwhile newer actions are queued
+                delay = self.bucket.delay()
+                if delay > 0:
+                    stats["receive", action, "delayed"] += 1
+                    await asyncio.sleep(delay)
+                    continue
+                self.bucket.take()
+            action, data = self.actions.get()
+            # party's rate limit is shared by its members, so reject instead of waiting
+            if action in RATE_LIMITED_ACTIONS and not self.party_bucket.take():
+                stats["receive", action, "rejected"] += 1
+                await self.send_error("rate limited")
+                if action == "click":
+                    self.resync_clicks = True
+                continue
+            # call corresponding handler, counting its database queries
+            queries = metrics.QueryStats()
+            token = metrics.current_queries.set(queries)
+            try:
+                with metrics.timed("wikirace_ws_action_seconds", action=action):
+                    with span(f"ws {action}"):
+                        await protocol_handlers[action](self, data)
+            except Exception as e:
+                logging.error(e)
+            finally:
+                metrics.current_queries.reset(token)
+            metrics.observe("wikirace_ws_action_queries", queries.count, action=action)
+            metrics.inc(
+                "wikirace_ws_action_query_seconds_total", queries.seconds, action=action
+            )
+        if self.resync_clicks:
+            self.resync_clicks = False
+            await self.resync_position()
+
+    async def resync_position(self) -> None:
+        """
+        Redirects member to the last confirmed page of running round, after some of member's clicks were lost
+        """
+        member_round = await sync_to_async(get_latest_member_round)(self.member)
+        if member_round and member_round.round.running and member_round.solved_at == -1:
+            await self.send_action(
+                "force_redirect", {"page": member_round.current_page}
+            )
 
-    async def group_send(self, action_name: str, data: dict) -> None:
+    async def group_send(
+        self, action_name: str, data: dict, exclude_self: bool = False
+    ) -> None:
+        """
+        Send action to every room group (party) member.
+        Action is encoded by receiving consumers, once per codec in each worker.
+        :param exclude_self: if true, action isn't sent to this consumer's websocket
         """
-        Send action to every room group (party) member
+        message = {
+            "type": "receive_group_message",
+            "action": action_name,
+            "id": uuid.uuid4().hex,
+            "message": {"type": action_name, "data": data},
+            "exclude": self.channel_name if exclude_self else None,
+        }
+        with metrics.timed("wikirace_group_send_seconds", action=action_name):
+            await self.channel_layer.group_send(self.room_name, message)
+
+    async def send_message(self, message: dict) -> None:
         """
-        await self.channel_layer.group_send(
-            self.room_name,
-            {
-                "type": "receive_group_message",
-                "message": {"type": action_name, "data": data},
-            },
+        Send message via websocket, encoded with negotiated codec
+        """
+        await self.send_encoded(
+            message.get("type", "error"), self.codec.encode(message)
         )
 
+    async def send_encoded(self, action_name: str, payload) -> None:
+        """
+        Queue message encoded with negotiated codec to be sent via websocket.
+        If client is too slow to receive queued messages, it is disconnected and has to reconnect for fresh state.
+        """
+        outcome = self.outbox.put(action_name, payload)
+        if outcome != "queued":
+            stats["send", action_name, outcome] += 1
+        if outcome == "dropped":
+            if not self.closing:
+                self.closing = True
+                await self.close(code=1013)
+            return
+        # start sending queued messages, if not yet
+        if self.sender is None or self.sender.done():
+            self.sender = asyncio.ensure_future(self.flush_outbox())
+
+    async def flush_outbox(self) -> None:
+        """
+        Sends queued messages in order, waiting for each to be written
+        """
+        while self.outbox:
+            _, payload = self.outbox.get()
+            await self.send(**self.codec.frame(payload))
+
     async def send_error(self, error_text: str) -> None:
         """
         Send error via websocket
         """
-        await self.send(text_data=json.dumps({"error": error_text}))
+        await self.send_message({"error": error_text})
 
     async def send_action(self, action_name: str, data: dict) -> None:
         """
         Send action via websocket
         """
-        await self.send(text_data=json.dumps({"type": action_name, "data": data}))
+        await self.send_message({"type": action_name, "data": data})
+
+    async def send_actions(self, actions: List[Tuple[str, dict]]) -> None:
+        """
+        Send several actions via websocket as a single batch frame
+        :param actions: list of action names with their data
+        """
+        if len(actions) == 1:
+            return await self.send_action(*actions[0])
+        batch = [{"type": action_name, "data": data} for action_name, data in actions]
+        await self.send_message({"type": "batch", "data": batch})
 
     async def receive_group_message(self, event) -> None:
         """
         Receive internal message from room group
         """
-        # get data
-        raw_data = event["message"]
-        # send message to websocket
-        await self.send(text_data=json.dumps(raw_data))
+        # skip messages not meant for this member
+        if event.get("exclude") == self.channel_name:
+            return
+        if event["action"] == "round_finished":
+            # round events buffered by this worker have to be written for replay
+            await sync_to_async(flush_events)(party_id=str(self.party.uid))
+            # hint distances aren't needed anymore
+            distance_cache.release(str(self.party.uid))
+        # send message encoded with negotiated codec to websocket,
+        # reusing payload encoded for another member in this worker
+        payload = encoding_cache.encode(event["id"], self.codec, event["message"])
+        await self.send_encoded(event["action"], payload)
 
     async def start_round_timer(self, party_round: Round) -> None:
         """
         Start internal round timer
         """
         # asynchronously sleep until round has ended
-        await asyncio.sleep(self.party.time_limit)
+        metrics.inc("wikirace_pending_round_timers")
+        try:
+            await asyncio.sleep(self.party.time_limit)
+        finally:
+            metrics.inc("wikirace_pending_round_timers", -1)
         # announce finish
         await self.announce_finish_round(party_round)
 
@@ -153,15 +380,39 @@ class GameConsumer(AsyncWebsocketConsumer):
         """
         Finish round
         """
-        # refresh party round object instance
-        await sync_to_async(party_round.refresh_from_db)()
-        # if already finished, skip
-        if not party_round.running:
-            return
         # finish round and get data for frontend to be sent
         finished_data = await sync_to_async(finish_round)(party_round)
+        # if already finished, skip
+        if finished_data is None:
+            return
         # send data to every member
         await self.group_send("round_finished", finished_data)
+        # send path analytics, once other workers have written their buffered round events
+        if self.has_link_graph:
+            asyncio.ensure_future(self.announce_round_analytics(party_round))
+
+    async def announce_round_analytics(self, party_round: Round) -> None:
+        """
+        Analyze members' paths in finished round and send results to every member
+        """
+        # wait until every worker has written its buffered round events
+        deadline = time.monotonic() + ROUND_ANALYTICS_TIMEOUT_SECONDS
+        while await sync_to_async(has_pending_events)(party_round.pk):
+            if time.monotonic() > deadline:
+                logging.warning(
+                    f"Round {party_round.pk} events weren't written in time"
+                )
+                break
+            await asyncio.sleep(ROUND_ANALYTICS_POLL_SECONDS)
+        try:
+            analytics = await sync_to_async(analyze_round)(party_round)
+        except Exception as e:
+            logging.error(e)
+            return
+        # if no local link graph, skip
+        if analytics is None:
+            return
+        await self.group_send("round_analytics", analytics)
 
     async def update_leaderboards(self) -> None:
         """
@@ -172,48 +423,61 @@ class GameConsumer(AsyncWebsocketConsumer):
         # send to every member
         await self.group_send("leaderboard_update", {"leaderboards": leaderboards})
 
-    async def send_connected_member(self) -> None:
+    async def send_snapshot(self, leaderboards: List[dict]) -> None:
+        """
+        Send state snapshot to newly connected member as a single frame
         """
-        Send data to newly connected member
+        actions = [
+            # used api wiki endpoint for client-side verification
+            (
+                "set_wiki_endpoint",
+                {"url": wiki_api(self.party.language), "language": self.party.language},
+            ),
+            ("leaderboard_update", {"leaderboards": leaderboards}),
+        ]
+        # add round if in progress
+        actions += await self.get_round_snapshot()
+        await self.send_actions(actions)
+
+    async def get_round_snapshot(self) -> List[Tuple[str, dict]]:
+        """
+        Get actions restoring currently running round for newly connected member
         """
         # get latest party round
         party_round: Round = await sync_to_async(get_latest_party_round)(self.party)
         # if no party round is active, skip
         if not party_round or not party_round.running:
-            return
+            return []
         # if round has ended, but hasn't been declared as finished,
         #  this may happen if round has started right before server restart, so timer has been killed
         if check_if_time_ran_out(party_round):
             # finish forcefully
-            return await self.announce_finish_round(party_round)
+            await self.announce_finish_round(party_round)
+            return []
         # get member round
         member_round: MemberRound = await sync_to_async(get_or_create_member_round)(
             party_round, self.member
         )
         # generate data for frontend
         round_info = await sync_to_async(get_time_specific_round_info)(party_round)
-        # send connected member 'new_round' (actually it can be already started, but they will never know)
-        await self.send_action("new_round", round_info)
-        # force redirect to current page
-        await self.send_action("force_redirect", {"page": member_round.current_page})
+        actions = [
+            # send connected member 'new_round' (actually it can be already started, but they will never know)
+            ("new_round", round_info),
+            # force redirect to current page
+            ("force_redirect", {"page": member_round.current_page}),
+        ]
         # if member has solved, send solved
         if member_round.solved_at != -1:
-            await self.send_action("solved", {})
+            actions.append(("solved", {}))
+        return actions
 
     async def finish_if_all_solved(self, party_round: Round) -> None:
         """
         Checks if all members have solved the wikirace. If yes, finishes round.
         """
-        round_should_be_finished = await sync_to_async(have_all_solved)(party_round)
-        if round_should_be_finished:
+        if have_all_solved(party_round):
             await self.announce_finish_round(party_round)
 
-    async def send_wiki_endpoint(self):
-        """
-        Sends used wikimedia API endpoint for client-side verification
-        """
-        await self.send_action("set_wiki_endpoint", {"url": WIKI_API})
-
 
 # ===== Protocol handlers =====
 
@@ -240,6 +504,13 @@ async def new_round_handler(self: GameConsumer, data: dict):
         return await self.send_error("unable to create new round")
     # start looking for solution
     asyncio.ensure_future(start_solving(party_round))
+    # precompute hint distances off the database thread
+    if self.has_link_graph:
+        asyncio.ensure_future(
+            sync_to_async(distance_cache.acquire, thread_sensitive=False)(
+                str(self.party.uid), party_round.end_page, self.party.language
+            )
+        )
 
     # get info for frontend
     round_info = await sync_to_async(get_initial_round_info)(party_round)
@@ -271,8 +542,8 @@ async def click_handler(self: GameConsumer, data: dict):
         if member_round.solved_at != -1:
             return await self.send_error("already solved")
         # check if correct transition
-        correct_transition = check_valid_transition(
-            member_round.current_page, clicked_page
+        correct_transition = await check_valid_transition(
+            member_round.current_page, clicked_page, self.party.language
         )
         if not correct_transition:
             # if incorrect, force redirect to last confirmed
@@ -280,14 +551,16 @@ async def click_handler(self: GameConsumer, data: dict):
                 "force_redirect", {"page": member_round.current_page}
             )
         # save to db and check if solved
-        solved: bool = await sync_to_async(member_click)(member_round, clicked_page)
+        solved: bool = await sync_to_async(member_click)(
+            member_round, clicked_page, self.party.language
+        )
         if solved:
             # update leaderboards
             await self.update_leaderboards()
             # send solved
             await self.send_action("solved", {})
-        # check if everyone has solved
-        await self.finish_if_all_solved(member_round.round)
+            # check if everyone has solved
+            await self.finish_if_all_solved(member_round.round)
     except Exception as e:
         logging.error(e)
 
@@ -307,3 +580,36 @@ async def finish_early_handler(self: GameConsumer, _: dict):
         return await self.send_error("no active round")
     # announce finish
     await self.announce_finish_round(party_round)
+
+
+@protocol_handler("hint")
+async def hint_handler(self: GameConsumer, data: dict):
+    """
+    Hint websocket command handler: sends distances to target of given pages (e.g. current page and a few links).
+    Hints are available only if host enabled them, for a few pages per member and round.
+    """
+    if not self.party.hints_enabled:
+        return await self.send_error("hints disabled")
+    pages = data.get("pages")
+    if not isinstance(pages, list) or not 0 < len(pages) <= MAX_HINT_PAGES:
+        return await self.send_error("no pages")
+    party_id = str(self.party.uid)
+    # get distances precomputed on round start
+    distances = distance_cache.get(party_id)
+    if distances is None:
+        # hints are available only with local link graph
+        if not self.has_link_graph:
+            return await self.send_error("hints unavailable")
+        # round may have been started in other worker, so compute distances here
+        party_round: Round = await sync_to_async(get_latest_party_round)(self.party)
+        if party_round is None or not party_round.running:
+            return await self.send_error("no active round")
+        distances = await sync_to_async(distance_cache.acquire, thread_sensitive=False)(
+            party_id, party_round.end_page, self.party.language
+        )
+        if distances is None:
+            return await self.send_error("hints unavailable")
+    if not distance_cache.take_hints(party_id, self.member.pk, len(pages)):
+        return await self.send_error("no hints left")
+    hints = get_hints(distances, pages, self.party.language)
+    await self.send_action("hint", {"distances": hints})
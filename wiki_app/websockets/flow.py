@@ -0,0 +1,160 @@
+import time
+from collections import Counter, deque
+from typing import Dict, Set, Tuple, Union
+
+from wiki_race import metrics
+from wiki_race.settings import ACTION_RATE_PER_PARTY, ACTION_BURST_PER_PARTY
+
+RATE_LIMITED_ACTIONS = {"click", "new_round"}
+"""
+Actions, which cost Wikipedia API calls, database writes and broadcasts, so they are rate limited
+"""
+MERGEABLE_ACTIONS = {"hint"}
+"""
+Received actions, which supersede pending actions of the same type, e.g. only hints of the latest pages are needed.
+Clicks are never merged, as each of them moves member, so every one has to be validated in order.
+"""
+SUPERSEDED_MESSAGES = {"leaderboard_update"}
+"""
+Sent actions, which supersede pending actions of the same type, e.g. only latest leaderboards have to be sent
+"""
+
+stats: Counter = Counter()
+"""
+Flow control events of this worker by `(direction, action, outcome)`, e.g. `("receive", "hint", "merged")`
+"""
+
+
+def _collect_stats() -> None:
+    for (direction, action, outcome), count in list(stats.items()):
+        metrics.set_value(
+            "wikirace_flow_events_total",
+            count,
+            direction=direction,
+            action=action,
+            outcome=outcome,
+        )
+
+
+metrics.add_collector(_collect_stats)
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter: allows `burst` actions at once, refilled at `rate` actions per second.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self) -> bool:
+        """
+        Takes a token, if there is one
+        :return: true if action is allowed
+        """
+        self.refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def delay(self) -> float:
+        """
+        Gets seconds until a token is available
+        """
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+    def is_full(self) -> bool:
+        self.refill()
+        return self.tokens >= self.burst
+
+
+party_buckets: Dict[str, TokenBucket] = {}
+"""
+Rate limiters of parties in this worker by party id
+"""
+
+
+def get_party_bucket(party_id: str) -> TokenBucket:
+    """
+    Gets rate limiter of a party, shared by its members' sockets in this worker
+    """
+    if party_id not in party_buckets:
+        # full buckets are the same as new ones, so they can be forgotten
+        if len(party_buckets) >= 1000:
+            for key in [x for x, bucket in party_buckets.items() if bucket.is_full()]:
+                del party_buckets[key]
+        party_buckets[party_id] = TokenBucket(
+            ACTION_RATE_PER_PARTY, ACTION_BURST_PER_PARTY
+        )
+    return party_buckets[party_id]
+
+
+class BoundedQueue:
+    """
+    Bounded FIFO queue of `(action name, item)` pairs.
+    Item of an action from `mergeable` set replaces pending item of the same action, keeping its place in the queue.
+    """
+
+    def __init__(self, size: int, mergeable: Set[str]):
+        self.size = size
+        self.mergeable = mergeable
+        self.items: deque = deque()
+        self.pending: Dict[str, list] = {}
+        """
+        Pending entries of mergeable actions by action name
+        """
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def put(self, action: str, item: Union[dict, str, bytes]) -> str:
+        """
+        Adds item to queue
+        :return: outcome: "queued", "merged" or "dropped" if queue is full
+        """
+        if action in self.pending:
+            self.pending[action][1] = item
+            return "merged"
+        if len(self.items) >= self.size:
+            return "dropped"
+        entry = [action, item]
+        self.items.append(entry)
+        if action in self.mergeable:
+            self.pending[action] = entry
+        return "queued"
+
+    def head(self) -> str:
+        """
+        Gets action name of oldest item
+        """
+        return self.items[0][0]
+
+    def get(self) -> Tuple[str, Union[dict, str, bytes]]:
+        """
+        Pops oldest item
+        """
+        entry = self.items.popleft()
+        action, item = entry
+        if self.pending.get(action) is entry:
+            del self.pending[action]
+        return action, item
+
+    def clear(self) -> int:
+        """
+        Drops all pending items
+        :return: amount of dropped items
+        """
+        dropped = len(self.items)
+        self.items.clear()
+        self.pending.clear()
+        return dropped
@@ -0,0 +1,388 @@
+"""
+Headless load generator: simulated parties playing rounds over game websockets,
+ either in-process through channels' communicator, or over real sockets against a running server.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import aiohttp
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+
+from wiki_app.data.identity import make_member_token
+from wiki_app.models import AdminRole, Party, PartyMember, User
+from wiki_app.websockets import flow
+from wiki_app.websockets.consumers import GameConsumer
+from wiki_app.websockets.protocol_handlers import protocol_handlers
+
+current_action: contextvars.ContextVar[str] = contextvars.ContextVar(
+    "current_action", default="other"
+)
+"""
+Action being handled by consumer, database queries are attributed to it
+"""
+
+
+def percentiles(values: List[float]) -> dict:
+    """
+    :return: count and p50/p95/p99 of values given in seconds, in milliseconds
+    """
+    if not values:
+        return {"count": 0}
+    quantiles = (
+        statistics.quantiles(values, n=100, method="inclusive")
+        if len(values) > 1
+        else values * 99
+    )
+    return {
+        "count": len(values),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p95_ms": round(quantiles[94] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+    }
+
+
+class Recorder:
+    """
+    Collects measurements of a load run
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        """
+        Seconds from sending action to receiving message it triggers, by message type
+        """
+        self.handlers: Dict[str, List[float]] = defaultdict(list)
+        """
+        Seconds spent in consumer's action handlers, by action (in-process only)
+        """
+        self.actions = Counter()
+        self.queries = Counter()
+        """
+        Database queries by action (in-process only)
+        """
+        self.timeouts = Counter()
+        self.errors = Counter()
+        self.loop_lag: List[float] = []
+        self.clicks = 0
+
+    async def wait(
+        self, message_type: str, future: asyncio.Future, started: float, timeout: float
+    ) -> Optional[dict]:
+        """
+        Waits for expected message, recording its latency
+        :return: message data, or None on timeout
+        """
+        try:
+            data = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts[message_type] += 1
+            return None
+        self.latencies[message_type].append(time.perf_counter() - started)
+        return data
+
+    async def monitor_loop_lag(self, interval: float = 0.05) -> None:
+        """
+        Measures how late event loop wakes up from sleep
+        """
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(time.perf_counter() - started - interval)
+
+    def count_query(self, execute, sql, params, many, context):
+        """
+        Database execute wrapper counting queries of current action
+        """
+        self.queries[current_action.get()] += 1
+        return execute(sql, params, many, context)
+
+    def report(self, duration: float) -> dict:
+        lag = percentiles(self.loop_lag)
+        if self.loop_lag:
+            lag["max_ms"] = round(max(self.loop_lag) * 1000, 3)
+        return {
+            "duration_s": round(duration, 3),
+            "clicks": self.clicks,
+            "clicks_per_second": round(self.clicks / duration, 2),
+            "latency": {k: percentiles(v) for k, v in sorted(self.latencies.items())},
+            "handlers": {k: percentiles(v) for k, v in sorted(self.handlers.items())},
+            "queries_per_action": {
+                action: round(self.queries[action] / count, 2)
+                for action, count in sorted(self.actions.items())
+            },
+            "timeouts": dict(self.timeouts),
+            "errors": dict(self.errors),
+            "loop_lag": lag,
+            "flow": {" ".join(k): v for k, v in sorted(flow.stats.items())},
+        }
+
+
+class CommunicatorConnection:
+    """
+    Websocket connection to ASGI application in this process
+    """
+
+    def __init__(self, application, path: str):
+        self.communicator = WebsocketCommunicator(application, path)
+
+    async def connect(self) -> None:
+        connected, _ = await self.communicator.connect(timeout=30)
+        if not connected:
+            raise ConnectionError("connection refused")
+
+    async def send(self, data: dict) -> None:
+        await self.communicator.send_json_to(data)
+
+    async def receive(self) -> Optional[dict]:
+        message = await self.communicator.receive_output(timeout=None)
+        if message["type"] != "websocket.send":
+            return None
+        return json.loads(message["text"])
+
+    async def close(self) -> None:
+        await self.communicator.disconnect()
+
+
+class SocketConnection:
+    """
+    Websocket connection to running server
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def connect(self) -> None:
+        self.session = aiohttp.ClientSession()
+        self.socket = await self.session.ws_connect(self.url)
+
+    async def send(self, data: dict) -> None:
+        await self.socket.send_json(data)
+
+    async def receive(self) -> Optional[dict]:
+        message = await self.socket.receive()
+        if message.type != aiohttp.WSMsgType.TEXT:
+            return None
+        return json.loads(message.data)
+
+    async def close(self) -> None:
+        await self.socket.close()
+        await self.session.close()
+
+
+class Player:
+    """
+    Simulated party member, dispatching received messages to whoever waits for them
+    """
+
+    def __init__(self, connection, recorder: Recorder):
+        self.connection = connection
+        self.recorder = recorder
+        self.waiters: Dict[str, List[asyncio.Future]] = defaultdict(list)
+        self.reader: Optional[asyncio.Task] = None
+
+    def expect(self, message_type: str) -> asyncio.Future:
+        """
+        Registers waiter for next message of given type, before triggering it
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[message_type].append(future)
+        return future
+
+    async def connect(self, timeout: float) -> None:
+        snapshot = self.expect("set_wiki_endpoint")
+        started = time.perf_counter()
+        await self.connection.connect()
+        self.reader = asyncio.ensure_future(self.read())
+        await self.recorder.wait("connect", snapshot, started, timeout)
+
+    async def read(self) -> None:
+        while True:
+            message = await self.connection.receive()
+            if message is None:
+                return
+            batch = message["data"] if message.get("type") == "batch" else [message]
+            for action in batch:
+                if "error" in action:
+                    self.recorder.errors[action["error"]] += 1
+                for future in self.waiters.pop(action.get("type", "error"), []):
+                    if not future.done():
+                        future.set_result(action.get("data"))
+
+    async def send(self, data: dict) -> None:
+        await self.connection.send(data)
+
+    async def request(self, data: dict, message_type: str, timeout: float) -> None:
+        """
+        Sends action and waits for message it triggers
+        """
+        future = self.expect(message_type)
+        started = time.perf_counter()
+        await self.send(data)
+        await self.recorder.wait(message_type, future, started, timeout)
+
+    async def close(self) -> None:
+        if self.reader is not None:
+            self.reader.cancel()
+        await self.connection.close()
+
+
+class Simulation:
+    """
+    Parties of players playing rounds along a known path: host starts round,
+     every member clicks through the path (occasionally clicking an unlinked page), and round finishes once all solved
+    """
+
+    def __init__(
+        self,
+        parties: int,
+        players: int,
+        rounds: int,
+        path: List[str],
+        detour: Optional[str] = None,
+        detour_rate: float = 0,
+        think_time: float = 0.5,
+        timeout: float = 30,
+        seed: Optional[int] = None,
+    ):
+        self.parties = parties
+        self.players = players
+        self.rounds = rounds
+        self.path = path
+        self.detour = detour
+        self.detour_rate = detour_rate if detour else 0
+        self.think_time = think_time
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.recorder = Recorder()
+
+    def create_parties(self) -> List[List[str]]:
+        """
+        Creates parties with members in database
+        :return: websocket paths of members of every party, host first
+        """
+        paths = []
+        for _ in range(self.parties):
+            party = Party.objects.create(time_limit=3600)
+            members = []
+            for i in range(self.players):
+                member = PartyMember.objects.create(
+                    name=f"bot{i}", user=User.objects.create(), party=party
+                )
+                if i == 0:
+                    AdminRole.objects.create(party=party, admin_member=member)
+                token = make_member_token(str(party.uid), member.pk, i == 0)
+                members.append(f"/game_connect/{party.uid}/{token}")
+            paths.append(members)
+        return paths
+
+    async def run(self, connections: List[list]) -> dict:
+        """
+        Runs simulation
+        :param connections: connections of members of every party, host first
+        :return: report, see `Recorder.report`
+        """
+        monitor = asyncio.ensure_future(self.recorder.monitor_loop_lag())
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(self.run_party(x) for x in connections))
+        finally:
+            monitor.cancel()
+        return self.recorder.report(time.perf_counter() - started)
+
+    async def run_party(self, connections: list) -> None:
+        players = [Player(x, self.recorder) for x in connections]
+        await asyncio.gather(*(x.connect(self.timeout) for x in players))
+        try:
+            for _ in range(self.rounds):
+                await self.play_round(players)
+        finally:
+            await asyncio.gather(*(x.close() for x in players))
+
+    async def play_round(self, players: List[Player]) -> None:
+        host = players[0]
+        # host starts round
+        announced = [x.expect("new_round") for x in players]
+        started = time.perf_counter()
+        await host.send(
+            {"type": "new_round", "origin": self.path[0], "target": self.path[-1]}
+        )
+        results = await asyncio.gather(
+            *(
+                self.recorder.wait("new_round", x, started, self.timeout)
+                for x in announced
+            )
+        )
+        if None in results:
+            return
+        # everyone plays, round finishes once all have solved
+        finished = [x.expect("round_finished") for x in players]
+        await asyncio.gather(*(self.play(x) for x in players))
+        started = time.perf_counter()
+        results = await asyncio.gather(
+            *(
+                self.recorder.wait("round_finished", x, started, self.timeout)
+                for x in finished
+            )
+        )
+        if None in results:
+            await host.request({"type": "finish_early"}, "round_finished", self.timeout)
+
+    async def play(self, player: Player) -> None:
+        for i, page in enumerate(self.path[1:], start=1):
+            if self.think_time:
+                await asyncio.sleep(self.random.expovariate(1 / self.think_time))
+            if self.random.random() < self.detour_rate:
+                self.recorder.clicks += 1
+                await player.request(
+                    {"type": "click", "destination": self.detour},
+                    "force_redirect",
+                    self.timeout,
+                )
+            self.recorder.clicks += 1
+            click = {"type": "click", "destination": page}
+            if i == len(self.path) - 1:
+                await player.request(click, "solved", self.timeout)
+            else:
+                await player.send(click)
+
+
+@contextlib.contextmanager
+def instrument(recorder: Recorder) -> Iterator[None]:
+    """
+    Measures consumer's action handlers and their database queries in this process.
+    Has to be entered in the thread running database calls of consumers, i.e. the one calling `async_to_sync`.
+    """
+    original_handlers = dict(protocol_handlers)
+    original_connect = GameConsumer.connect
+
+    def timed(action: str, handler):
+        async def wrapper(*args):
+            token = current_action.set(action)
+            recorder.actions[action] += 1
+            started = time.perf_counter()
+            try:
+                return await handler(*args)
+            finally:
+                recorder.handlers[action].append(time.perf_counter() - started)
+                current_action.reset(token)
+
+        return wrapper
+
+    for action, handler in original_handlers.items():
+        protocol_handlers[action] = timed(action, handler)
+    GameConsumer.connect = timed("connect", original_connect)
+    try:
+        with connection.execute_wrapper(recorder.count_query):
+            yield
+    finally:
+        protocol_handlers.update(original_handlers)
+        GameConsumer.connect = original_connect
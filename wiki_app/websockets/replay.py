@@ -0,0 +1,84 @@
+import heapq
+import itertools
+from typing import AsyncIterator, List, Tuple
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from wiki_app.data.replay import get_replay_info, get_batch_offsets, load_batch
+from wiki_app.websockets.codecs import negotiate_codec
+from wiki_race.settings import REPLAY_CHUNK_SIZE
+from wiki_race.tracing import sync_to_async
+
+
+async def stream_round_events(round_id: int) -> AsyncIterator[Tuple[int, int, str]]:
+    """
+    Streams round's click events in time order.
+    Batches are loaded one by one in order of their first event, and merged while their time ranges overlap,
+     so that only overlapping batches are held in memory.
+    :return: async iterator of events: milliseconds since round start, member id and page title
+    """
+    batches = await sync_to_async(get_batch_offsets)(round_id)
+    # heap of next events of loaded batches, with remaining events iterator
+    heap = []
+    order = itertools.count()
+    for batch_id, first_offset in batches + [(None, None)]:
+        # events preceding next batch's first event can be sent
+        while heap and (first_offset is None or heap[0][0] <= first_offset):
+            offset, _, member_id, page, events = heapq.heappop(heap)
+            yield offset, member_id, page
+            event = next(events, None)
+            if event is not None:
+                heapq.heappush(heap, (event[0], next(order), *event[1:], events))
+        if batch_id is None:
+            return
+        events = iter(await sync_to_async(load_batch)(batch_id))
+        event = next(events, None)
+        if event is not None:
+            heapq.heappush(heap, (event[0], next(order), *event[1:], events))
+
+
+class ReplayConsumer(AsyncWebsocketConsumer):
+    """
+    Websocket consumer streaming finished round's click events for replay, then closing.
+    Sends `replay_start` action with round info, `replay_events` actions with chunks of
+     `[milliseconds since round start, member id, page]` events in time order, and `replay_end` action.
+    """
+
+    async def connect(self) -> None:
+        """
+        Connect to websocket
+        """
+        kwargs = self.scope["url_route"]["kwargs"]
+        info = await sync_to_async(get_replay_info)(
+            kwargs["game_id"], kwargs["round_id"]
+        )
+        # if no such finished round, refuse connection
+        if info is None:
+            return await self.close()
+        # choose wire codec
+        subprotocols = self.scope.get("subprotocols", [])
+        self.codec = negotiate_codec(subprotocols)
+        # accept websocket
+        await self.accept(
+            subprotocol=self.codec.name if self.codec.name in subprotocols else None
+        )
+        # stream events, each send waits for the frame to be written
+        await self.send_action("replay_start", info)
+        chunk: List[list] = []
+        async for event in stream_round_events(kwargs["round_id"]):
+            chunk.append(list(event))
+            if len(chunk) >= REPLAY_CHUNK_SIZE:
+                await self.send_action("replay_events", chunk)
+                chunk = []
+        if chunk:
+            await self.send_action("replay_events", chunk)
+        await self.send_action("replay_end", {})
+        await self.close()
+
+    async def send_action(self, action_name: str, data) -> None:
+        """
+        Send action via websocket, encoded with negotiated codec
+        """
+        await self.send(
+            **self.codec.frame(self.codec.encode({"type": action_name, "data": data}))
+        )
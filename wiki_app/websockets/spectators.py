@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from wiki_app.data.db import get_member_positions, party_exists
+from wiki_app.websockets.codecs import negotiate_codec, encode_all
+from wiki_app.websockets.flow import BoundedQueue, stats
+from wiki_race.settings import SPECTATOR_OUTBOX_SIZE, SPECTATOR_TICK_SECONDS
+from wiki_race.tracing import sync_to_async
+
+
+class SpectatorHub:
+    """
+    Spectators of a single party in this worker process.
+    Polls racers' positions at a fixed tick rate and sends changes to every spectator, so that
+     clicks coalesce between ticks, and spectators cost a single query per party per tick no matter how many there are.
+    """
+
+    def __init__(self, party_id: str):
+        self.party_id = party_id
+        self.spectators: Set["SpectatorConsumer"] = set()
+        self.state: Optional[dict] = None
+        """
+        Last polled positions, see `get_member_positions`
+        """
+        self.task: Optional[asyncio.Task] = None
+
+    def add(self, spectator: "SpectatorConsumer") -> None:
+        self.spectators.add(spectator)
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def remove(self, spectator: "SpectatorConsumer") -> None:
+        self.spectators.discard(spectator)
+        if not self.spectators and self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def run(self) -> None:
+        """
+        Polls positions and broadcasts changes until there are no spectators left
+        """
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(e)
+            await asyncio.sleep(SPECTATOR_TICK_SECONDS)
+
+    async def tick(self) -> None:
+        state = await sync_to_async(get_member_positions)(self.party_id)
+        if state is None:
+            return
+        # send full state to spectators who haven't received it yet
+        newcomers = [x for x in self.spectators if not x.has_state]
+        if newcomers:
+            self.broadcast(newcomers, {"full": True, **state})
+        # send changes to others
+        delta = self.make_delta(state)
+        if delta:
+            self.broadcast(
+                [x for x in self.spectators if x.has_state and x not in newcomers],
+                delta,
+            )
+        for spectator in newcomers:
+            spectator.has_state = True
+        self.state = state
+
+    def make_delta(self, state: dict) -> dict:
+        """
+        Gets what has changed since last tick
+        :return: dict with changed `round` and `members`, and `left` member ids; empty if nothing changed
+        """
+        previous = self.state or {"round": None, "members": {}}
+        if state["round"] != previous["round"]:
+            # new round, positions are reset
+            return {"full": True, **state}
+        delta = {}
+        members = {
+            member_id: position
+            for member_id, position in state["members"].items()
+            if previous["members"].get(member_id) != position
+        }
+        if members:
+            delta["members"] = members
+        left = [x for x in previous["members"] if x not in state["members"]]
+        if left:
+            delta["left"] = left
+        return delta
+
+    def broadcast(self, spectators: list, data: dict) -> None:
+        """
+        Queues positions to be sent to spectators, encoding them once per codec used by them.
+        Doesn't wait for spectators to receive them, so that slow spectators don't delay others.
+        """
+        if not spectators:
+            return
+        encoded = encode_all(
+            {"type": "positions", "data": data}, [x.codec.name for x in spectators]
+        )
+        for spectator in spectators:
+            spectator.queue_positions(
+                data.get("full", False), encoded[spectator.codec.name]
+            )
+
+
+hubs: Dict[str, SpectatorHub] = {}
+"""
+Spectator hubs of this worker by party id
+"""
+
+
+class SpectatorConsumer(AsyncWebsocketConsumer):
+    """
+    Read-only websocket consumer for spectating a party's race, e.g. on a stream.
+    Sends `positions` actions at a fixed tick rate: first with full state (`full` flag),
+     then only with changed members' `[name, current page, solved]` by member id, and ids of members who `left`.
+    Positions are queued, and spectators too slow to receive them get full state instead of pending changes.
+    """
+
+    async def connect(self) -> None:
+        """
+        Connect to websocket
+        """
+        self.party_id = self.scope["url_route"]["kwargs"]["game_id"]
+        self.has_state = False
+        self.outbox = BoundedQueue(SPECTATOR_OUTBOX_SIZE, set())
+        self.sender: Optional[asyncio.Future] = None
+        # if no such party, refuse connection
+        if not await sync_to_async(party_exists)(self.party_id):
+            return await self.close()
+        # choose wire codec
+        subprotocols = self.scope.get("subprotocols", [])
+        self.codec = negotiate_codec(subprotocols)
+        # accept websocket
+        await self.accept(
+            subprotocol=self.codec.name if self.codec.name in subprotocols else None
+        )
+        # join party hub
+        if self.party_id not in hubs:
+            hubs[self.party_id] = SpectatorHub(self.party_id)
+        hubs[self.party_id].add(self)
+
+    async def disconnect(self, close_code) -> None:
+        """
+        Leave party hub
+        """
+        if getattr(self, "sender", None) is not None:
+            self.sender.cancel()
+        hub = hubs.get(getattr(self, "party_id", None))
+        if hub is None:
+            return
+        hub.remove(self)
+        if not hub.spectators:
+            del hubs[self.party_id]
+
+    async def receive(self, text_data=None, bytes_data=None) -> None:
+        """
+        Spectators can't act
+        """
+        await self.send(**self.codec.frame(self.codec.encode({"error": "read only"})))
+
+    def queue_positions(self, full: bool, payload) -> None:
+        """
+        Queues positions encoded with negotiated codec to be sent.
+        Full state makes pending positions obsolete, so they are dropped. If spectator can't keep up with changes,
+         pending ones are dropped as well, and spectator gets full state on next tick.
+        """
+        if full:
+            dropped = self.outbox.clear()
+            if dropped:
+                stats["send", "positions", "superseded"] += dropped
+        outcome = self.outbox.put("positions", payload)
+        if outcome == "dropped":
+            stats["send", "positions", "dropped"] += self.outbox.clear() + 1
+            self.has_state = False
+            return
+        # start sending queued positions, if not yet
+        if self.sender is None or self.sender.done():
+            self.sender = asyncio.ensure_future(self.flush_outbox())
+
+    async def flush_outbox(self) -> None:
+        """
+        Sends queued positions in order, waiting for each to be written
+        """
+        while self.outbox:
+            _, payload = self.outbox.get()
+            await self.send(**self.codec.frame(payload))
@@ -1,18 +1,26 @@
-import django
 from channels.routing import URLRouter
 from django.urls import path
 
-django.setup()
-# NOTICE: place this above import of consumers, as settings have not been initialized!
-
 from wiki_app.websockets.consumers import GameConsumer
+from wiki_app.websockets.replay import ReplayConsumer
+from wiki_app.websockets.spectators import SpectatorConsumer
 
 urlpatterns = [
     path(
-        "game_connect/<str:game_id>/<str:user_id>",
+        "game_connect/<str:game_id>/<str:token>",
         GameConsumer.as_asgi(),
         name="game-websocket",
     ),
+    path(
+        "spectate/<str:game_id>",
+        SpectatorConsumer.as_asgi(),
+        name="spectator-websocket",
+    ),
+    path(
+        "replay/<str:game_id>/<int:round_id>",
+        ReplayConsumer.as_asgi(),
+        name="replay-websocket",
+    ),
 ]
 """
 Websockets url patterns
@@ -2,7 +2,11 @@ import json
 import re
 from typing import List, Optional
 
-from bs4 import BeautifulSoup, Tag
+from wiki_race.lazy import lazy_import
+from wiki_race.tracing import traced
+
+# parser is imported on first formatted page
+bs4 = lazy_import("bs4")
 
 
 def _format_link(url: str) -> Optional[str]:
@@ -18,15 +22,16 @@ def _format_link(url: str) -> Optional[str]:
     return match[1]
 
 
+@traced("wiki_format_html")
 def wiki_format_html(html: str) -> str:
     """
     Formats html according to game rules
     :return: formatted html
     """
     # load html
-    soup = BeautifulSoup(html, "html.parser")
+    soup = bs4.BeautifulSoup(html, "html.parser")
     # get all links
-    links: List[Tag] = soup.find_all("a")
+    links: List[bs4.Tag] = soup.find_all("a")
     for link in links:
         # if no href, skip
         if "href" not in link.attrs:
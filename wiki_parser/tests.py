@@ -1,14 +1,66 @@
-from django.test import TestCase, RequestFactory
+import contextlib
+import os
 
+from asgiref.sync import async_to_sync
+from django.test import TestCase, RequestFactory
+from unittest import mock
 
 # Create your tests here.
 from wiki_parser.views import parse_wiki_page
+from wiki_race.settings import BASE_DIR, DEFAULT_WIKI, WIKIS
+from wiki_race.wiki_api.parse import (
+    check_valid_transition,
+    find_shortest_path,
+    resolve_page_ids,
+)
+from wiki_race.wiki_api.standin import Cassette, StandIn, serve_in_thread
+
+CASSETTE = os.path.join(BASE_DIR, "wiki_parser", "fixtures", "wiki_api.jsonl")
+
+
+@contextlib.contextmanager
+def replay_api(**options):
+    """
+    Points wiki and sdow apis to stand-in replaying recorded responses
+    """
+    standin = StandIn(Cassette(CASSETTE), **options)
+    with serve_in_thread(standin) as url, mock.patch.dict(
+        WIKIS[DEFAULT_WIKI], api=f"{url}/w/api.php"
+    ), mock.patch("wiki_race.wiki_api.parse.SDOW_API", url):
+        yield standin
 
 
 class ParserTests(TestCase):
     def test_simple_parsing(self):
-        request = RequestFactory().get("/")
-        response = parse_wiki_page(request, "London")
+        factory = RequestFactory()
+        with replay_api():
+            response = parse_wiki_page(factory.get("/wiki/London"), "London")
+            missing = parse_wiki_page(
+                factory.get("/wiki/Atlantis_(city)"), "Atlantis (city)"
+            )
 
         self.assertEqual(response.status_code, 200)
         self.assertIn("London", response.content.__str__())
+        self.assertNotIn("london.gov.uk", response.content.__str__())
+        self.assertEqual(missing.status_code, 404)
+
+    def test_api_paths(self):
+        with replay_api() as standin:
+            self.assertTrue(async_to_sync(check_valid_transition)("London", "Paris"))
+            self.assertFalse(async_to_sync(check_valid_transition)("Paris", "Paris"))
+            # links are resolved against redirects to target
+            self.assertTrue(
+                async_to_sync(check_valid_transition)("Paris", "French Republic")
+            )
+            page_ids = resolve_page_ids("London", "Paris")
+            path = async_to_sync(find_shortest_path)("London", "Paris")
+        self.assertEqual(page_ids, {"London": 17867, "Paris": 22989})
+        self.assertEqual(path, ["London", "Paris"])
+        self.assertEqual(standin.stats["misses"], 0)
+
+    def test_error_injection(self):
+        with replay_api(error_rate=1) as standin:
+            self.assertEqual(
+                resolve_page_ids("London", "Paris"), {"London": None, "Paris": None}
+            )
+        self.assertEqual(standin.stats["errors"], 1)
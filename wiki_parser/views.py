@@ -1,3 +1,4 @@
+import functools
 import logging
 
 from asgiref.sync import async_to_sync
@@ -6,26 +7,69 @@ from django.shortcuts import render
 from django.views.decorators.cache import cache_page
 
 from wiki_parser.page_formatter import wiki_format_html
+from wiki_race import metrics
+from wiki_race.settings import DEFAULT_WIKI, WIKIS
 from wiki_race.wiki_api.parse import load_wiki_page
+from wiki_race.wikis import wiki_origin
 
 
+def count_cache_outcome(view):
+    """
+    Counts page cache hits and misses of cached view. Cache is checked before view is called,
+     so view reports misses by calling `mark_cache_miss`.
+    """
+
+    @functools.wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        request.page_cache_miss = False
+        response = view(request, *args, **kwargs)
+        outcome = "miss" if request.page_cache_miss else "hit"
+        language = kwargs.get("language", DEFAULT_WIKI)
+        # label is taken from url, so unknown wikis share one label instead of each adding a series
+        if language not in WIKIS:
+            language = "unknown"
+        metrics.inc("wikirace_page_cache_total", wiki=language, outcome=outcome)
+        return response
+
+    return wrapper
+
+
+def mark_cache_miss(request: HttpRequest) -> None:
+    request.page_cache_miss = True
+
+
+@count_cache_outcome
 @cache_page(60 * 60)
-def parse_wiki_page(request: HttpRequest, page_title: str) -> HttpResponse:
+def parse_wiki_page(
+    request: HttpRequest, page_title: str, language: str = DEFAULT_WIKI
+) -> HttpResponse:
     """
     View that gets wiki page html and formats it according to game rules (removes external links, etc.)
+    Pages are cached by url, so pages of each wiki are cached separately.
     """
+    mark_cache_miss(request)
+    # if wiki is not served, return not found
+    if language not in WIKIS:
+        return HttpResponseNotFound()
     # get wiki page data
-    page_info = async_to_sync(load_wiki_page)(page_title)
+    page_info = async_to_sync(load_wiki_page)(page_title, language)
     # if failed, return not found
     if page_info is None:
         return HttpResponseNotFound()
     # format html
-    formatted_html = wiki_format_html(page_info.text)
+    with metrics.timed("wikirace_format_seconds"):
+        formatted_html = wiki_format_html(page_info.text)
+    metrics.observe("wikirace_format_bytes", len(formatted_html.encode("utf-8")))
     # respond with page
     response = render(
         request,
         "parsed-response.html",
-        context={"mw_parser": formatted_html, "headers": {"X-Frame-Options": "allow"}},
+        context={
+            "mw_parser": formatted_html,
+            "wiki_origin": wiki_origin(language),
+            "language": language,
+            "headers": {"X-Frame-Options": "allow"},
+        },
     )
     logging.info(f"Parsed {page_title}!")
     return response
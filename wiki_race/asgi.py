@@ -12,15 +12,21 @@ import os
 from channels.routing import ProtocolTypeRouter
 from django.core.asgi import get_asgi_application
 
-from wiki_app.websockets.urls import websocket_router
-
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wiki_race.settings")
 
+# sets up django, so it has to precede imports of consumers
+http_application = get_asgi_application()
+
+from wiki_app.websockets.urls import websocket_router
+from wiki_race.startup import lifespan
+
 application = ProtocolTypeRouter(
     {
         # Django's ASGI application to handle traditional HTTP requests
-        "http": get_asgi_application(),
+        "http": http_application,
         # WebSocket chat handler
         "websocket": websocket_router,
+        # server startup, see `startup`
+        "lifespan": lifespan,
     }
 )
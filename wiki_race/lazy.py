@@ -0,0 +1,25 @@
+"""
+Deferred imports of heavy modules, which aren't needed until first request using them,
+ so that cold starting workers can serve sooner.
+"""
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Imports module on first attribute access instead of now
+    :param name: absolute module name, e.g. `aiohttp`
+    :return: module, which is executed on first attribute access
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,342 @@
+"""
+Prometheus-style metrics. Every worker process records counters, gauges and histograms in plain dicts
+ without locks, and a background thread periodically writes them to a file of its own in `METRICS_DIR`.
+`/metrics` endpoint sums files of all live workers, so counters restart whenever a worker does,
+ which Prometheus handles as a counter reset.
+"""
+
+import bisect
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from wiki_race.settings import METRICS_DIR, METRICS_FLUSH_SECONDS
+
+SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+BYTES_BUCKETS = [2**x for x in range(10, 25, 2)]
+COUNT_BUCKETS = [0, 1, 2, 3, 5, 8, 13, 21, 34]
+
+METRICS: Dict[str, Tuple[str, str, Optional[List[float]]]] = {
+    "wikirace_wiki_api_seconds": (
+        "histogram",
+        "Latency of wiki and sdow api requests by wiki, api, action and status",
+        SECONDS_BUCKETS,
+    ),
+    "wikirace_page_cache_total": (
+        "counter",
+        "Wiki page views by wiki and page cache outcome",
+        None,
+    ),
+    "wikirace_format_seconds": (
+        "histogram",
+        "Duration of wiki_format_html",
+        SECONDS_BUCKETS,
+    ),
+    "wikirace_format_bytes": (
+        "histogram",
+        "Size of formatted wiki pages",
+        BYTES_BUCKETS,
+    ),
+    "wikirace_ws_action_seconds": (
+        "histogram",
+        "Duration of websocket action handlers by action",
+        SECONDS_BUCKETS,
+    ),
+    "wikirace_ws_action_queries": (
+        "histogram",
+        "Database queries per websocket action",
+        COUNT_BUCKETS,
+    ),
+    "wikirace_ws_action_query_seconds_total": (
+        "counter",
+        "Time spent in database queries by websocket action",
+        None,
+    ),
+    "wikirace_group_send_seconds": (
+        "histogram",
+        "Latency of channel layer group sends by action",
+        SECONDS_BUCKETS,
+    ),
+    "wikirace_active_sockets": ("gauge", "Connected game websockets", None),
+    "wikirace_active_parties": (
+        "gauge",
+        "Parties with connected game websockets, counted once per worker",
+        None,
+    ),
+    "wikirace_pending_round_timers": (
+        "gauge",
+        "Round timers waiting to finish rounds",
+        None,
+    ),
+    "wikirace_solve_round_total": (
+        "counter",
+        "Round solutions by wiki and outcome",
+        None,
+    ),
+    "wikirace_solve_round_seconds": (
+        "histogram",
+        "Duration of round solving by wiki and outcome",
+        SECONDS_BUCKETS,
+    ),
+    "wikirace_flow_events_total": (
+        "counter",
+        "Flow control events by direction, action and outcome",
+        None,
+    ),
+    "wikirace_hint_rounds": ("gauge", "Rounds with hint distance arrays", None),
+    "wikirace_hint_targets": (
+        "gauge",
+        "Distinct targets of hint distance arrays",
+        None,
+    ),
+    "wikirace_hint_bytes": ("gauge", "Memory used by hint distance arrays", None),
+}
+"""
+Known metrics: type, help and histogram buckets
+"""
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_values: Dict[Tuple[str, Labels], float] = defaultdict(float)
+"""
+Counters and gauges of this process
+"""
+_histograms: Dict[Tuple[str, Labels], List[float]] = {}
+"""
+Histograms of this process: count of each bucket (and +Inf), then sum
+"""
+_collectors: List[Callable[[], None]] = []
+_flusher: Optional[threading.Thread] = None
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Labels]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    """
+    Increments counter, or adds to gauge
+    """
+    _values[_key(name, labels)] += value
+    _ensure_flushing()
+
+
+def set_value(name: str, value: float, **labels) -> None:
+    """
+    Sets gauge, or counter maintained elsewhere
+    """
+    _values[_key(name, labels)] = value
+    _ensure_flushing()
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """
+    Records value in histogram
+    """
+    key = _key(name, labels)
+    buckets = METRICS[name][2]
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms.setdefault(key, [0] * (len(buckets) + 2))
+    histogram[bisect.bisect_left(buckets, value)] += 1
+    histogram[-1] += value
+    _ensure_flushing()
+
+
+@contextlib.contextmanager
+def timed(name: str, **labels) -> Iterator[dict]:
+    """
+    Records duration of block in histogram
+    :return: labels, which may be updated in block, e.g. with response status
+    """
+    started = time.perf_counter()
+    try:
+        yield labels
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def add_collector(collector: Callable[[], None]) -> None:
+    """
+    Registers function setting metrics maintained elsewhere, called before metrics are written
+    """
+    _collectors.append(collector)
+
+
+class QueryStats:
+    """
+    Database queries made while handling an action, see `track_queries`
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+current_queries: contextvars.ContextVar[Optional[QueryStats]] = contextvars.ContextVar(
+    "current_queries", default=None
+)
+"""
+Query stats of action being handled, propagated to database threads by `sync_to_async`
+"""
+
+
+def track_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper, counting queries of current action, see `current_queries`
+    """
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+
+
+def snapshot() -> dict:
+    """
+    Gets metrics of this process
+    """
+    for collector in _collectors:
+        collector()
+    return {
+        "values": [
+            [name, labels, value] for (name, labels), value in list(_values.items())
+        ],
+        "histograms": [
+            [name, labels, list(histogram)]
+            for (name, labels), histogram in list(_histograms.items())
+        ],
+    }
+
+
+def _path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def flush() -> None:
+    """
+    Writes metrics of this process to its file
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    temporary = _path(os.getpid()) + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(temporary, _path(os.getpid()))
+
+
+def _flush_periodically() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_SECONDS)
+        with contextlib.suppress(OSError):
+            flush()
+
+
+def _ensure_flushing() -> None:
+    global _flusher
+    if _flusher is None:
+        _flusher = threading.Thread(target=_flush_periodically, daemon=True)
+        _flusher.start()
+
+
+def _forget_flusher() -> None:
+    global _flusher
+    _flusher = None
+
+
+# workers are forked, and thread of parent process doesn't run in them
+os.register_at_fork(after_in_child=_forget_flusher)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def aggregate() -> dict:
+    """
+    Sums metrics of all live worker processes
+    :return: dict of values and histograms by metric name and labels
+    """
+    with contextlib.suppress(OSError):
+        flush()
+    values: Dict[Tuple[str, Labels], float] = defaultdict(float)
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    for filename in os.listdir(METRICS_DIR) if os.path.isdir(METRICS_DIR) else []:
+        pid, extension = os.path.splitext(filename)
+        if extension != ".json" or not pid.isdigit():
+            continue
+        if not _is_alive(int(pid)):
+            # metrics of stopped workers are dropped
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(METRICS_DIR, filename))
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, labels, value in data["values"]:
+            values[name, tuple(map(tuple, labels))] += value
+        for name, labels, histogram in data["histograms"]:
+            total = histograms.setdefault(
+                (name, tuple(map(tuple, labels))), [0] * len(histogram)
+            )
+            for i, x in enumerate(histogram):
+                total[i] += x
+    return {"values": values, "histograms": histograms}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format_labels(labels: Labels, **extra) -> str:
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value))
+
+
+def render() -> str:
+    """
+    Renders metrics of all workers in Prometheus text exposition format
+    """
+    metrics = aggregate()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        if kind != "histogram":
+            for (metric, labels), value in sorted(metrics["values"].items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_number(value)}")
+            continue
+        for (metric, labels), histogram in sorted(metrics["histograms"].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*buckets, "+Inf"], histogram[:-1]):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, le=bound)} {_number(cumulative)}"
+                )
+            lines.append(f"{name}_sum{_format_labels(labels)} {_number(histogram[-1])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_number(cumulative)}")
+    return "\n".join(lines) + "\n"
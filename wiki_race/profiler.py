@@ -0,0 +1,99 @@
+"""
+Sampling profiler of a worker process. A background thread records stacks of all other threads at a fixed interval,
+ which costs little enough to be run on a live worker, unlike deterministic profilers.
+Stacks are reported in collapsed format (`outer;inner count` per line),
+ read by flamegraph.pl, speedscope and similar flame graph tools.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Optional
+
+_lock = threading.Lock()
+"""
+Held while profiling, so that only one profile of a worker is recorded at a time
+"""
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _sample(seconds: float, interval: float) -> Counter:
+    stacks = Counter()
+    own = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stacks[f"{names.get(ident, ident)};{_collapse(frame)}"] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def sample(seconds: float, interval: float = 0.005) -> Counter:
+    """
+    Samples stacks of all threads but the calling one for given time
+    :param interval: time between samples
+    :return: amount of samples by collapsed stack, prefixed with thread name
+    :raises: RuntimeError if worker is already being profiled
+    """
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("already profiling")
+    try:
+        return _sample(seconds, interval)
+    finally:
+        _lock.release()
+
+
+last_profile: Optional[Counter] = None
+"""
+Stacks of the last profile recorded in background, see `start`
+"""
+
+
+def start(seconds: float, interval: float = 0.005) -> None:
+    """
+    Starts sampling stacks in a background thread, so that caller doesn't wait for it.
+    Once finished, sampled stacks are available as `last_profile`.
+    :raises: RuntimeError if worker is already being profiled
+    """
+    if not _lock.acquire(blocking=False):
+        raise RuntimeError("already profiling")
+
+    def run():
+        global last_profile
+        try:
+            last_profile = _sample(seconds, interval)
+        finally:
+            _lock.release()
+
+    threading.Thread(target=run, name="profiler", daemon=True).start()
+
+
+def is_profiling() -> bool:
+    return _lock.locked()
+
+
+def collapsed(stacks: Counter) -> str:
+    """
+    Formats sampled stacks in collapsed format
+    """
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
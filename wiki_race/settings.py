@@ -10,9 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+import tempfile
 from pathlib import Path
 
 import django_heroku
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -28,6 +30,9 @@ DEBUG = os.environ.get("LOCAL") is not None or os.environ.get("DEBUG") is not No
 
 ALLOWED_HOSTS = []
 
+# Cold start mode for production servers, see `wiki_race.startup`
+FAST_START = os.environ.get("FAST_START") is not None
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -38,10 +43,13 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "channels",
 ]
+# channels app only adds websockets to `runserver`, but imports twisted on startup
+if not FAST_START:
+    INSTALLED_APPS.append("channels")
 
 MIDDLEWARE = [
+    "wiki_app.monitoring.middleware.tracing_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -107,11 +115,18 @@ CHANNEL_LAYERS = {
 }
 # channel layer for heroku deployments
 REDIS_URL = os.environ.get("REDIS_URL")
+# "pubsub" layer publishes group message once and every worker delivers it to its own websockets,
+#  "core" layer pushes a copy of group message into a list for every group member
+REDIS_CHANNEL_LAYER = os.environ.get("REDIS_CHANNEL_LAYER", "pubsub")
+REDIS_CHANNEL_LAYER_BACKENDS = {
+    "core": "channels_redis.core.RedisChannelLayer",
+    "pubsub": "channels_redis.pubsub.RedisPubSubChannelLayer",
+}
 
 if REDIS_URL:
     CHANNEL_LAYERS = {
         "default": {
-            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "BACKEND": REDIS_CHANNEL_LAYER_BACKENDS[REDIS_CHANNEL_LAYER],
             "CONFIG": {
                 "hosts": [REDIS_URL],
             },
@@ -163,12 +178,92 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 # Application constants
 WIKI_API = os.environ.get("WIKI_API", "https://en.wikipedia.org/w/api.php")
 SDOW_API = os.environ.get("SDOW_API", "https://api.sixdegreesofwikipedia.com")
+# six degrees of wikipedia only knows english wiki, other wikis are solved with their local link graphs
+SDOW_WIKI = "en"
+# directory of local link graph, see `wiki_graph`, used for round analytics
+LINK_GRAPH_PATH = os.environ.get("LINK_GRAPH_PATH")
+# directory of title prefix index, see `wiki_graph.titles`, used for title autocomplete
+TITLE_INDEX_PATH = os.environ.get("TITLE_INDEX_PATH", LINK_GRAPH_PATH)
+# directory of title dictionary, see `wiki_graph.dictionary`, used for resolving titles without wiki api
+TITLE_DICTIONARY_PATH = os.environ.get("TITLE_DICTIONARY_PATH", LINK_GRAPH_PATH)
+# directory of local article archive, see `wiki_api.archive`, used instead of wiki api for loading pages
+ARTICLE_ARCHIVE_PATH = os.environ.get("ARTICLE_ARCHIVE_PATH")
+# wikis served by deployment by language, see `wiki_race.wikis`. Default wiki is configured by settings above,
+#  other wikis are listed in WIKI_LANGUAGES, e.g. "ru,de", and configured by the same variables suffixed by language,
+#  e.g. WIKI_API_RU, LINK_GRAPH_PATH_RU. Set DEFAULT_WIKI when WIKI_API points to a non-english wiki
+DEFAULT_WIKI = os.environ.get("DEFAULT_WIKI") or "en"
+WIKIS = {
+    DEFAULT_WIKI: {
+        "api": WIKI_API,
+        "link_graph": LINK_GRAPH_PATH,
+        "title_index": TITLE_INDEX_PATH,
+        "title_dictionary": TITLE_DICTIONARY_PATH,
+        "article_archive": ARTICLE_ARCHIVE_PATH,
+    }
+}
+for _language in filter(None, os.environ.get("WIKI_LANGUAGES", "").split(",")):
+    _suffix = _language.upper()
+    _link_graph = os.environ.get(f"LINK_GRAPH_PATH_{_suffix}")
+    WIKIS.setdefault(
+        _language,
+        {
+            "api": os.environ.get(
+                f"WIKI_API_{_suffix}", f"https://{_language}.wikipedia.org/w/api.php"
+            ),
+            "link_graph": _link_graph,
+            "title_index": os.environ.get(f"TITLE_INDEX_PATH_{_suffix}", _link_graph),
+            "title_dictionary": os.environ.get(
+                f"TITLE_DICTIONARY_PATH_{_suffix}", _link_graph
+            ),
+            "article_archive": os.environ.get(f"ARTICLE_ARCHIVE_PATH_{_suffix}"),
+        },
+    )
+if DEFAULT_WIKI not in WIKIS:
+    raise ImproperlyConfigured(f"default wiki {DEFAULT_WIKI} is not served")
+# decompressed archive clusters kept in memory by each worker
+ARTICLE_CLUSTER_CACHE_SIZE = 64
+# directory where worker processes write their metrics, see `metrics`
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "wikirace-metrics")
+)
+METRICS_FLUSH_SECONDS = 5
+# bearer token required by `/metrics` endpoint, if set
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+# operations taking longer are logged with their spans, zero disables tracing, see `wiki_race.tracing`
+SLOW_OPERATION_SECONDS = float(os.environ.get("SLOW_OPERATION_SECONDS", 1))
+PROFILE_MAX_SECONDS = 60
 POINTS_FOR_SOLVING = 100
 MIN_TIME_LIMIT_SECONDS = 60
 MAX_TIME_LIMIT_SECONDS = 3600
+SPECTATOR_TICK_SECONDS = 0.5
+# position updates queued for a spectator, before pending ones are dropped in favor of full state
+SPECTATOR_OUTBOX_SIZE = 8
+REPLAY_BATCH_SIZE = 64
+REPLAY_FLUSH_SECONDS = 10
+REPLAY_CHUNK_SIZE = 256
+# round analytics wait for workers to write buffered round events, at most this long
+ROUND_ANALYTICS_TIMEOUT_SECONDS = 10
+ROUND_ANALYTICS_POLL_SECONDS = 0.1
+# round pairs suggested to hosts, see `round_pairs`
+ROUND_PAIR_POOL_SIZE = 20
+SOLUTION_CACHE_SECONDS = 3600
+
+# Websocket flow control, see `wiki_app.websockets.flow`
+ACTION_RATE_PER_SOCKET = 5
+ACTION_BURST_PER_SOCKET = 10
+ACTION_RATE_PER_PARTY = 20
+ACTION_BURST_PER_PARTY = 40
+ACTION_QUEUE_SIZE = 8
+OUTBOX_SIZE = 64
 
 USER_COOKIE_NAME = "user_id"
 
+# History retention, see `prune_history` command
+ROUND_RETENTION_HOURS = 24
+PARTY_RETENTION_HOURS = 7 * 24
+USER_RETENTION_HOURS = 24
+RETENTION_BATCH_SIZE = 500
+
 # Django heroku helper
 django_heroku.settings(locals())
 
@@ -0,0 +1,113 @@
+"""
+Cold start of server workers. Heavy modules are imported on first use (see `lazy`), so that workers serve sooner,
+ and with `FAST_START` they are pre-warmed in the background right after startup, along with http pool,
+ local title data of every wiki and database cache, so that first visitors don't wait for them either.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from wiki_race.settings import FAST_START, WIKIS
+from wiki_race.wikis import wiki_api
+
+PREWARM_TIMEOUT_SECONDS = 5
+"""
+Timeout of request opening connection to wiki api
+"""
+
+
+def _import_modules() -> None:
+    from django.urls import get_resolver
+
+    import aiohttp
+    import bs4
+    import requests
+
+    # accessing attributes executes lazily imported modules
+    for module in [aiohttp, bs4, requests]:
+        getattr(module, "__version__", None)
+    # import views with their dependencies
+    get_resolver().url_patterns
+
+
+def _load_title_data() -> None:
+    from wiki_race.wiki_api.sources import get_article_source
+    from wiki_race.wiki_graph.dictionary import get_title_dictionary
+    from wiki_race.wiki_graph.titles import get_title_index
+
+    for language in WIKIS:
+        get_title_dictionary(language)
+        get_title_index(language)
+        get_article_source(language)
+
+
+def _open_http_pool() -> None:
+    from wiki_race.wiki_api.api_metrics import http_session
+
+    for language in WIKIS:
+        http_session(language).get(
+            wiki_api(language),
+            params={"action": "query", "meta": "siteinfo", "format": "json"},
+            timeout=PREWARM_TIMEOUT_SECONDS,
+        )
+
+
+def _open_database() -> None:
+    from django.core.cache import cache
+
+    cache.get("prewarm")
+
+
+PREWARM_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("imports", _import_modules),
+    ("title data", _load_title_data),
+    ("http pool", _open_http_pool),
+    ("database", _open_database),
+]
+"""
+Pre-warming steps in order, each run in a thread
+"""
+THREAD_SENSITIVE_STEPS = {"http pool", "database"}
+"""
+Steps warming up per-thread connections, which are run in the thread serving sync code
+"""
+
+
+async def prewarm() -> None:
+    """
+    Runs pre-warming steps, logging their durations. Failed steps are logged and skipped.
+    """
+    for name, step in PREWARM_STEPS:
+        started = time.perf_counter()
+        try:
+            await sync_to_async(step, thread_sensitive=name in THREAD_SENSITIVE_STEPS)()
+        except Exception as e:
+            logging.warning(f"Unable to prewarm {name}", exc_info=e)
+            continue
+        logging.info(f"Prewarmed {name} in {time.perf_counter() - started:.2f}s")
+
+
+_prewarming: Optional[asyncio.Future] = None
+
+
+async def lifespan(scope, receive, send) -> None:
+    """
+    ASGI lifespan application, which starts pre-warming in the background with `FAST_START`,
+     so that worker binds its socket and serves requests meanwhile
+    """
+    global _prewarming
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if FAST_START:
+                _prewarming = asyncio.ensure_future(prewarm())
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _prewarming is not None:
+                _prewarming.cancel()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
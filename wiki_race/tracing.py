@@ -0,0 +1,124 @@
+"""
+Tracing spans of slow operations. Each http request and websocket action is a trace,
+ and spans of operations made while handling it (loading and formatting pages, handlers, calls to database threads)
+ are nested into it via context variables, which `asyncio` tasks and `sync_to_async` threads inherit.
+Traces taking longer than `SLOW_OPERATION_SECONDS` are logged to `wikirace.slow` logger with their spans.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import logging
+import time
+from typing import Callable, Iterator, List, Optional
+
+from asgiref.sync import sync_to_async as asgiref_sync_to_async
+
+from wiki_race.settings import SLOW_OPERATION_SECONDS
+
+MAX_LOGGED_SPANS = 50
+"""
+Max amount of nested spans logged with a slow trace
+"""
+
+logger = logging.getLogger("wikirace.slow")
+
+
+class Span:
+    """
+    Timed operation with nested operations
+    """
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.children: List[Span] = []
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def lines(self, depth: int = 0) -> Iterator[str]:
+        """
+        Describes span and its children, indented by nesting depth
+        """
+        duration = "unfinished" if self.duration is None else f"{self.duration:.3f}s"
+        yield f"{'  ' * depth}{self.name} {duration}"
+        for child in self.children:
+            yield from child.lines(depth + 1)
+
+
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+
+
+def _log_slow(root: Span) -> None:
+    lines = list(root.lines())
+    if len(lines) > MAX_LOGGED_SPANS:
+        lines = lines[:MAX_LOGGED_SPANS] + [
+            f"... {len(lines) - MAX_LOGGED_SPANS} more spans"
+        ]
+    logger.warning("Slow operation:\n%s", "\n".join(lines))
+
+
+@contextlib.contextmanager
+def span(name: str) -> Iterator[Optional[Span]]:
+    """
+    Times block as a span of current trace, or as a new trace if there is none
+    :return: span, or None if tracing is disabled
+    """
+    if not SLOW_OPERATION_SECONDS:
+        yield None
+        return
+    parent = current_span.get()
+    current = Span(name, parent)
+    if parent is not None:
+        parent.children.append(current)
+    token = current_span.set(current)
+    try:
+        yield current
+    finally:
+        current_span.reset(token)
+        current.duration = time.perf_counter() - current.started
+        if parent is None and current.duration >= SLOW_OPERATION_SECONDS:
+            _log_slow(current)
+
+
+def traced(name: str) -> Callable:
+    """
+    Decorator timing each call of function (or coroutine function) as a span
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def sync_to_async(func: Callable, **kwargs) -> Callable:
+    """
+    `asgiref.sync.sync_to_async`, timing each call as a span, including the wait for a free thread
+    """
+    name = f"sync:{getattr(func, '__qualname__', repr(func))}"
+    asynchronous = asgiref_sync_to_async(func, **kwargs)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        with span(name):
+            return await asynchronous(*args, **kwargs)
+
+    return wrapper
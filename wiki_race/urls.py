@@ -20,12 +20,21 @@ from django.views.generic import RedirectView
 from wiki_app.views import index_view, new_party_page, join_page, game_page
 from wiki_parser.views import parse_wiki_page
 from wiki_app.party.views import api_create_party, api_enter_party
+from wiki_app.monitoring.views import metrics_view, profile_view, profile_result_view
+from wiki_app.rounds.views import api_round_pair
+from wiki_app.titles.views import api_titles
 
 urlpatterns = [
     path("wiki/<str:page_title>", parse_wiki_page),
+    path("wiki/<str:language>/<str:page_title>", parse_wiki_page),
     path("admin/", admin.site.urls),
     path("api/create", api_create_party),
     path("api/enter", api_enter_party),
+    path("api/round_pair", api_round_pair),
+    path("api/titles", api_titles),
+    path("metrics", metrics_view),
+    path("debug/profile", profile_view),
+    path("debug/profile/result", profile_result_view),
     path("", index_view),
     path("new", new_party_page),
     path("join/<str:game_id>", join_page),
@@ -0,0 +1,97 @@
+import functools
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+from wiki_race import metrics
+from wiki_race.lazy import lazy_import
+from wiki_race.settings import DEFAULT_WIKI
+
+# http clients are imported on first request
+aiohttp = lazy_import("aiohttp")
+requests = lazy_import("requests")
+
+
+def _labels(url) -> dict:
+    """
+    Gets api and action of request url: wiki api action, or sdow api endpoint
+    """
+    url = urlparse(str(url))
+    action = parse_qs(url.query).get("action")
+    if action:
+        return {"api": "wiki", "action": action[0]}
+    return {"api": "sdow", "action": url.path.rsplit("/", 1)[-1]}
+
+
+async def _on_request_start(language: str, session, context, params) -> None:
+    context.started = time.perf_counter()
+
+
+async def _on_request_end(language: str, session, context, params) -> None:
+    metrics.observe(
+        "wikirace_wiki_api_seconds",
+        time.perf_counter() - context.started,
+        wiki=language,
+        status=params.response.status,
+        **_labels(params.url),
+    )
+
+
+async def _on_request_exception(language: str, session, context, params) -> None:
+    metrics.observe(
+        "wikirace_wiki_api_seconds",
+        time.perf_counter() - context.started,
+        wiki=language,
+        status="error",
+        **_labels(params.url),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _trace_config(language: str) -> "aiohttp.TraceConfig":
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(functools.partial(_on_request_start, language))
+    trace.on_request_end.append(functools.partial(_on_request_end, language))
+    trace.on_request_exception.append(
+        functools.partial(_on_request_exception, language)
+    )
+    return trace
+
+
+def client_session(language: str = DEFAULT_WIKI) -> "aiohttp.ClientSession":
+    """
+    Makes aiohttp session for requests made on behalf of wiki of given language,
+     recording latency of api requests, see `wikirace_wiki_api_seconds`
+    """
+    return aiohttp.ClientSession(trace_configs=[_trace_config(language)])
+
+
+def _on_response(language: str, response: "requests.Response", *args, **kwargs) -> None:
+    metrics.observe(
+        "wikirace_wiki_api_seconds",
+        response.elapsed.total_seconds(),
+        wiki=language,
+        status=response.status_code,
+        **_labels(response.url),
+    )
+
+
+_sessions = threading.local()
+"""
+Requests sessions of current thread by wiki language, as sessions aren't thread-safe
+"""
+
+
+def http_session(language: str = DEFAULT_WIKI) -> "requests.Session":
+    """
+    Gets requests session of current thread for wiki of given language, keeping connections to its api alive
+     between requests. Session records latency of api requests, see `wikirace_wiki_api_seconds`.
+    """
+    sessions = getattr(_sessions, "by_language", None)
+    if sessions is None:
+        sessions = _sessions.by_language = {}
+    if language not in sessions:
+        session = requests.Session()
+        session.hooks["response"].append(functools.partial(_on_response, language))
+        sessions[language] = session
+    return sessions[language]
@@ -0,0 +1,144 @@
+import functools
+import json
+import mmap
+import os
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wiki_race.wiki_graph.dictionary import title_hash
+
+CLUSTER_SIZE = 2**18
+"""
+Uncompressed size of archive cluster in bytes, bigger clusters compress better, but take longer to decompress
+"""
+
+
+class ArchiveWriter:
+    """
+    Writes article archive, see `ArticleArchive`. Articles are grouped into clusters compressed together.
+    """
+
+    def __init__(self, path: str, cluster_size: int = CLUSTER_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.cluster_size = cluster_size
+        self.file = open(os.path.join(path, "articles.bin"), "wb")
+        self.cluster_offsets = [0]
+        self.cluster: List[bytes] = []
+        self.cluster_length = 0
+        self.hashes: List[int] = []
+        self.entries: List[tuple] = []
+        self.entry_of: Dict[int, tuple] = {}
+        """
+        Entries of added articles by title hash, for adding redirects later
+        """
+
+    def add(
+        self, title: str, text: str, links: Sequence[str], redirects: Sequence[str] = ()
+    ) -> None:
+        """
+        Adds article to archive
+        :param links: titles of main namespace pages linked by article
+        :param redirects: titles redirecting to article
+        """
+        record = json.dumps(
+            {"title": title, "text": text, "links": list(links)}, ensure_ascii=False
+        ).encode("utf-8")
+        entry = (len(self.cluster_offsets) - 1, self.cluster_length, len(record))
+        self.entry_of[title_hash(title)] = entry
+        for name in [title, *redirects]:
+            self.hashes.append(title_hash(name))
+            self.entries.append(entry)
+        self.cluster.append(record)
+        self.cluster_length += len(record)
+        if self.cluster_length >= self.cluster_size:
+            self._flush_cluster()
+
+    def add_redirect(self, title: str, target: str) -> None:
+        """
+        Adds title redirecting to already added article
+        """
+        if title_hash(title) == title_hash(target):
+            return
+        self.hashes.append(title_hash(title))
+        self.entries.append(self.entry_of[title_hash(target)])
+
+    def __contains__(self, title: str) -> bool:
+        return title_hash(title) in self.entry_of
+
+    def _flush_cluster(self) -> None:
+        if not self.cluster:
+            return
+        compressed = zlib.compress(b"".join(self.cluster), 6)
+        self.file.write(compressed)
+        self.cluster_offsets.append(self.cluster_offsets[-1] + len(compressed))
+        self.cluster = []
+        self.cluster_length = 0
+
+    def close(self) -> None:
+        """
+        Writes last cluster and index
+        """
+        self._flush_cluster()
+        self.file.close()
+        hashes = np.array(self.hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        np.save(os.path.join(self.path, "index_hashes.npy"), hashes[order])
+        np.save(
+            os.path.join(self.path, "index_entries.npy"),
+            np.array(self.entries, dtype=np.uint32).reshape(-1, 3)[order],
+        )
+        np.save(
+            os.path.join(self.path, "cluster_offsets.npy"),
+            np.array(self.cluster_offsets, dtype=np.int64),
+        )
+
+    def __enter__(self) -> "ArchiveWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ArticleArchive:
+    """
+    Local archive of rendered articles with their links, like a ZIM file.
+    Articles are stored as JSON records in zlib compressed clusters of `articles.bin`.
+    Index of sorted title hashes (see `title_hash`) with cluster, offset and length of each article
+     is memory mapped, as is the archive itself, so that workers share them.
+    Redirects are index entries pointing to their target's record.
+    Decompressed clusters are kept in an LRU cache, as articles of a cluster are often requested together.
+    """
+
+    def __init__(self, path: str, cache_size: int = 64):
+        self.hashes = np.load(os.path.join(path, "index_hashes.npy"), mmap_mode="r")
+        self.entries = np.load(os.path.join(path, "index_entries.npy"), mmap_mode="r")
+        self.cluster_offsets = np.load(os.path.join(path, "cluster_offsets.npy"))
+        with open(os.path.join(path, "articles.bin"), "rb") as f:
+            self.blob = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if self.cluster_offsets[-1]
+                else b""
+            )
+        self.read_cluster = functools.lru_cache(maxsize=cache_size)(self._read_cluster)
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _read_cluster(self, cluster: int) -> bytes:
+        start, end = self.cluster_offsets[cluster], self.cluster_offsets[cluster + 1]
+        return zlib.decompress(self.blob[start:end])
+
+    def get(self, title: str) -> Optional[dict]:
+        """
+        Gets article by title, following redirects
+        :return: dict with canonical `title`, HTML `text` and `links` titles, or None if there is no such article
+        """
+        key = np.uint64(title_hash(title))
+        position = int(np.searchsorted(self.hashes, key))
+        if position >= len(self.hashes) or self.hashes[position] != key:
+            return
+        cluster, offset, length = (int(x) for x in self.entries[position])
+        return json.loads(self.read_cluster(cluster)[offset : offset + length])
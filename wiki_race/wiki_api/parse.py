@@ -1,47 +1,26 @@
 import logging
 import random
 import urllib.parse
-from collections import namedtuple
-from typing import Optional, Tuple, List
+from typing import Optional, Tuple, List, Dict, Set
 
-import aiohttp
-import requests
+from wiki_race import metrics
+from wiki_race.settings import DEFAULT_WIKI, SDOW_API, SDOW_WIKI
+from wiki_race.tracing import sync_to_async, traced
+from wiki_race.wiki_api.api_metrics import client_session, http_session
+from wiki_race.wiki_api.sources import Article, get_article_source
+from wiki_race.wiki_graph.dictionary import get_title_dictionary, normalize_title
+from wiki_race.wikis import wiki_api, wiki_path
 
-from wiki_race.settings import WIKI_API, SDOW_API
 
-Article = namedtuple("Article", ["title", "text", "properties"])
-
-
-async def load_wiki_page(title: str) -> Optional[Article]:
+@traced("load_wiki_page")
+async def load_wiki_page(title: str, language: str = DEFAULT_WIKI) -> Optional[Article]:
     """
     Loads HTML of the wiki page by its title
     :param title: page title
+    :param language: language of wiki
     :return: loaded page as named tuple of (title, text and properties)
     """
-    # send request
-    async with aiohttp.ClientSession() as session:
-        async with session.get(
-            WIKI_API,
-            params={
-                "action": "parse",
-                "page": title,
-                "format": "json",
-                "redirects": "true",
-            },
-        ) as resp:
-            data = await resp.json()
-            # TODO: mobile enhancements
-            # if loading failed return
-            if "error" in data:
-                logging.error(data["error"])
-                return None
-            # get result
-            parser_result = data["parse"]
-            return Article(
-                parser_result["title"],
-                parser_result["text"]["*"],
-                parser_result["links"],
-            )
+    return await get_article_source(language).load(title)
 
 
 def standardize_wiki_title(title: str) -> str:
@@ -49,18 +28,25 @@ def standardize_wiki_title(title: str) -> str:
         "_", " "
     ).lower()
 
-def compare_titles(a: str, b: str) -> bool:
+def compare_titles(a: str, b: str, language: str = DEFAULT_WIKI) -> bool:
     """
     Compares two titles of wiki pages
+    :param language: language of wiki
     :return: true if titles lead to the same page, false otherwise
     """
     # make trivial check
-    trivial_equal = standardize_wiki_title(a) == standardize_wiki_title(b)
+    trivial_equal = normalize_title(a) == normalize_title(b)
     if trivial_equal:
         return True
+    # make local check, if both titles are known
+    dictionary = get_title_dictionary(language)
+    if dictionary is not None:
+        same_page = dictionary.same_page(a, b)
+        if same_page is not None:
+            return same_page
     # make wiki api check
-    parser_result = requests.get(
-        WIKI_API,
+    response = http_session(language).get(
+        wiki_api(language),
         params={
             "action": "query",
             "prop": "info",
@@ -68,7 +54,8 @@ def compare_titles(a: str, b: str) -> bool:
             "format": "json",
             "redirects": "",
         },
-    ).json()
+    )
+    parser_result = response.json()
     try:
         pages = parser_result["query"]["pages"]
         return len(pages) == 1 and "-1" not in pages
@@ -76,14 +63,16 @@ def compare_titles(a: str, b: str) -> bool:
         return False
 
 
-async def _get_next_page(cur_page: str, walk_backwards: bool) -> Optional[str]:
+async def _get_next_page(
+    cur_page: str, walk_backwards: bool, language: str = DEFAULT_WIKI
+) -> Optional[str]:
     """
     Gets random adjacent wiki page.
     """
     prop = "linkshere" if walk_backwards else "links"
-    async with aiohttp.ClientSession() as session:
+    async with client_session(language) as session:
         async with session.get(
-            WIKI_API,
+            wiki_api(language),
             params={
                 "action": "query",
                 "titles": cur_page,
@@ -107,12 +96,13 @@ async def _get_next_page(cur_page: str, walk_backwards: bool) -> Optional[str]:
 
 
 async def _walk_titles_randomly(
-    start: str, steps: int, walk_backwards: bool = False
+    start: str, steps: int, walk_backwards: bool = False, language: str = DEFAULT_WIKI
 ) -> Tuple[str, List[str]]:
     """
     Internal function for selecting a new wiki page title by walking from given page
     :param start: Title of starting wiki page
     :param steps: Amount of steps (link clicks to be made)
+    :param language: Language of wiki
     :return: Tuple of end page title and list of all page titles between them (ends inclusive).
     """
     # current page
@@ -126,7 +116,7 @@ async def _walk_titles_randomly(
     while len(stack) != steps and iters < 2 * steps:
         iters += 1
         # send request
-        next_page: str = await _get_next_page(cur_page, walk_backwards)
+        next_page: str = await _get_next_page(cur_page, walk_backwards, language)
         # check result
         if not next_page:
             # remove last page and try again
@@ -146,84 +136,249 @@ async def _walk_titles_randomly(
     return cur_page, [start] + stack
 
 
-async def check_valid_transition(from_page: str, to_page: str) -> bool:
+async def check_valid_transition(
+    from_page: str, to_page: str, language: str = DEFAULT_WIKI
+) -> bool:
     """
     Checks whether `to_page` wiki page can be reached by clicking an internal link from `from_page` wiki page.
     Used for verifying user's wikirace solution.
+    :param language: language of wiki
     :return: true if reachable, false otherwise
     """
-    # send request
-    async with aiohttp.ClientSession() as session:
+    links = await get_article_source(language).load_links(from_page)
+    if not links:
+        return False
+    # make trivial check
+    target = normalize_title(to_page)
+    if any(normalize_title(link) == target for link in links):
+        return True
+    # make local check, if target is known
+    dictionary = get_title_dictionary(language)
+    if dictionary is not None:
+        target_id = dictionary.get(to_page)
+        if target_id != -1:
+            return any(dictionary.get(link) == target_id for link in links)
+    # resolve all links against target with a single wiki api check
+    titles = await _titles_leading_to(to_page, language)
+    return any(normalize_title(link) in titles for link in links)
+
+
+async def _titles_leading_to(title: str, language: str = DEFAULT_WIKI) -> Set[str]:
+    """
+    Gets all titles leading to the same page as given one: its normalized title, page title and redirects to page
+    :return: set of normalized titles, empty if there is no such page
+    """
+    params = {
+        "action": "query",
+        "prop": "redirects",
+        "titles": title,
+        "redirects": "",
+        "rdprop": "title",
+        "rdnamespace": 0,
+        "rdlimit": "max",
+        "format": "json",
+    }
+    titles = {normalize_title(title)}
+    async with client_session(language) as session:
+        while True:
+            async with session.get(wiki_api(language), params=params) as resp:
+                data = await resp.json()
+            query = data.get("query", {})
+            for page in query.get("pages", {}).values():
+                if "missing" in page or "invalid" in page:
+                    return set()
+                titles.add(page["title"])
+                titles.update(x["title"] for x in page.get("redirects", []))
+            for key in ("normalized", "redirects"):
+                titles.update(e["to"] for e in query.get(key, []))
+            # continue, if page has more redirects than fit in one response
+            if "continue" not in data:
+                return titles
+            params.update(data["continue"])
+
+
+async def solve_round(
+    origin_page: str, target_page: str, language: str = DEFAULT_WIKI
+) -> Optional[List[str]]:
+    """
+    Solves round, i.e. traverses from origin to target: with local link graph of wiki, if it's configured,
+     otherwise with six degrees of wikipedia api, if it knows the wiki
+    :param language: language of wiki
+    :return: list of wiki page titles from origin to target page, or `None` if solution not found
+    """
+    with metrics.timed(
+        "wikirace_solve_round_seconds", wiki=language, outcome="failed"
+    ) as labels:
+        try:
+            if wiki_path(language, "link_graph"):
+                # search graph in a thread, as it takes a while for far apart pages
+                full_solution = await sync_to_async(
+                    _solve_locally, thread_sensitive=False
+                )(origin_page, target_page, language)
+            elif language == SDOW_WIKI:
+                origin_page, prequel = await _walk_titles_randomly(
+                    origin_page, 2, walk_backwards=False, language=language
+                )
+                target_page, sequel = await _walk_titles_randomly(
+                    target_page, 2, walk_backwards=True, language=language
+                )
+                solution = await find_shortest_path(origin_page, target_page)
+                full_solution = prequel[:-1] + solution + sequel[:-1][::-1]
+            else:
+                raise ValueError(f"no solver for wiki: {language}")
+            logging.info(f"Solved: {origin_page} -> {target_page}")
+            labels["outcome"] = "solved"
+            return full_solution
+        except Exception as e:
+            logging.warning(
+                f"Unable to solve: {origin_page} -> {target_page}", exc_info=e
+            )
+            return
+        finally:
+            metrics.inc(
+                "wikirace_solve_round_total", wiki=language, outcome=labels["outcome"]
+            )
+
+
+def can_solve(language: str = DEFAULT_WIKI) -> bool:
+    """
+    Checks whether rounds in wiki of given language can be solved, see `solve_round`
+    """
+    return bool(wiki_path(language, "link_graph")) or language == SDOW_WIKI
+
+
+def _solve_locally(origin_page: str, target_page: str, language: str) -> List[str]:
+    """
+    Finds shortest path between wiki pages in local link graph of wiki
+    :return: list of wiki page titles from origin to target page (ends inclusive)
+    :raises: ValueError if path couldn't be found
+    """
+    # graph module depends on this one
+    from wiki_race.wiki_graph.graph import get_link_graph
+
+    graph = get_link_graph(language)
+    origin, target = graph.get_id(origin_page), graph.get_id(target_page)
+    if origin == -1 or target == -1:
+        raise ValueError(f"not in graph: {origin_page} -> {target_page}")
+    path = graph.shortest_path(origin, graph.distances_to(target))
+    if not path:
+        raise ValueError(f"unreachable: {origin_page} -> {target_page}")
+    return [graph.titles[x] for x in path]
+
+
+async def find_shortest_path(origin_page: str, target_page: str) -> List[str]:
+    """
+    Finds shortest path between wiki pages with six degrees of wikipedia api
+    :return: list of wiki page titles from origin to target page (ends inclusive)
+    :raises: ValueError if path couldn't be found
+    """
+    async with client_session() as session:
+        async with session.post(
+            f"{SDOW_API}/paths",  # TODO: devise a better solution
+            json={"source": origin_page, "target": target_page},
+        ) as resp:
+            if not resp.ok:
+                raise ValueError(resp.reason)
+            data = await resp.json()
+            pages = data["pages"]
+            paths = data["paths"]
+            if not paths:
+                raise ValueError(f"paths empty: {origin_page} -> {target_page}")
+            path = paths[0]
+            solution: List[str] = []
+            for num in path:
+                if str(num) not in pages:
+                    raise ValueError(
+                        f"{num} not in pages of {origin_page} -> {target_page}"
+                    )
+                solution.append(pages[str(num)]["title"])
+            return solution
+
+
+async def random_round_path(steps: int, language: str = DEFAULT_WIKI) -> List[str]:
+    """
+    Makes a random round: walks given amount of links from a random wiki page, then finds shortest path back to it
+    :param language: language of wiki
+    :return: shortest path from random page to the reached page (ends inclusive), which may be shorter than `steps`
+    :raises: ValueError if round couldn't be made, e.g. wiki is unknown to six degrees of wikipedia
+    """
+    if language != SDOW_WIKI:
+        raise ValueError(f"no solver for wiki: {language}")
+    async with client_session(language) as session:
         async with session.get(
-            WIKI_API,
+            wiki_api(language),
             params={
-                "action": "parse",
-                "page": from_page,
+                "action": "query",
+                "list": "random",
+                "rnnamespace": 0,
+                "rnlimit": 1,
                 "format": "json",
-                "redirects": "true",
-                "prop": "links",
             },
         ) as resp:
-            parser_result = (await resp.json())["parse"]
-            # get all internal links
-            for e in parser_result["links"]:
-                # get only namespace 0 links, compare titles
-                if e["ns"] == 0 and compare_titles(e["*"], to_page):
-                    return True
-
-            # if nothing found, return false
-            return False
+            start = (await resp.json())["query"]["random"][0]["title"]
+    end, _ = await _walk_titles_randomly(start, steps, language=language)
+    return await find_shortest_path(start, end)
 
 
-async def solve_round(origin_page: str, target_page: str) -> Optional[List[str]]:
+def resolve_page_ids(
+    *titles: str, language: str = DEFAULT_WIKI
+) -> Dict[str, Optional[int]]:
     """
-    Solves round, i.e. traverses from origin to target
-    :return: list of wiki page titles from origin to target page, or `None` if solution not found
+    Resolves wiki page titles to page ids with a single wiki api request. Follows title normalization and redirects,
+     so titles leading to the same page get the same id.
+    If all titles are in local title dictionary, no request is made, and its page ids are returned.
+    :param language: language of wiki
+    :return: dict of requested title to page id, or `None` if no such page exists
     """
-    try:
-        origin_page, prequel = await _walk_titles_randomly(
-            origin_page, 2, walk_backwards=False
-        )
-        target_page, sequel = await _walk_titles_randomly(
-            target_page, 2, walk_backwards=True
-        )
-
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{SDOW_API}/paths",  # TODO: devise a better solution
-                json={"source": origin_page, "target": target_page},
-            ) as resp:
-                if not resp.ok:
-                    raise ValueError(resp.reason)
-                data = await resp.json()
-                pages = data["pages"]
-                paths = data["paths"]
-                if not paths:
-                    raise ValueError(f"paths empty: {origin_page} -> {target_page}")
-                path = paths[0]
-                solution: List[str] = []
-                for num in path:
-                    if str(num) not in pages:
-                        raise ValueError(
-                            f"{num} not in pages of {origin_page} -> {target_page}"
-                        )
-                    solution.append(pages[str(num)]["title"])
-                full_solution = prequel[:-1] + solution + sequel[:-1][::-1]
-                logging.info(f"Solved: {origin_page} -> {target_page}")
-                return full_solution
-    except Exception as e:
-        logging.warning(f"Unable to solve: {origin_page} -> {target_page}", exc_info=e)
-        return
+    dictionary = get_title_dictionary(language)
+    if dictionary is not None:
+        local_ids = {title: dictionary.get(title) for title in titles}
+        if -1 not in local_ids.values():
+            return local_ids
+    response = http_session(language).get(
+        wiki_api(language),
+        params={
+            "action": "query",
+            "prop": "info",
+            "titles": "|".join(titles),
+            "format": "json",
+            "redirects": "",
+        },
+    )
+    parser_result = response.json()
+    query = parser_result.get("query", {})
+    # get where each title leads to
+    leads_to = {}
+    for key in ("normalized", "redirects"):
+        for e in query.get(key, []):
+            leads_to[e["from"]] = e["to"]
+    # get ids of existing pages
+    page_ids = {
+        page["title"]: page["pageid"]
+        for page in query.get("pages", {}).values()
+        if "pageid" in page
+    }
+    res = {}
+    for title in titles:
+        # follow normalization and redirects, not ending up in a cycle
+        resolved = title
+        seen = {resolved}
+        while resolved in leads_to and leads_to[resolved] not in seen:
+            resolved = leads_to[resolved]
+            seen.add(resolved)
+        res[title] = page_ids.get(resolved)
+    return res
 
 
-def check_page_exists(page: str) -> bool:
+def check_page_exists(page: str, language: str = DEFAULT_WIKI) -> bool:
     """
     Checks whether wiki page with given title exists
     """
-    parser_result = requests.get(
-        WIKI_API,
+    response = http_session(language).get(
+        wiki_api(language),
         params={"action": "query", "prop": "info", "titles": page, "format": "json"},
-    ).json()
+    )
+    parser_result = response.json()
     try:
         return "-1" not in parser_result["query"]["pages"]
     except KeyError:
@@ -0,0 +1,125 @@
+import logging
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+from wiki_race.settings import DEFAULT_WIKI, ARTICLE_CLUSTER_CACHE_SIZE
+from wiki_race.wiki_api.api_metrics import client_session
+from wiki_race.wiki_api.archive import ArticleArchive
+from wiki_race.wikis import wiki_api, wiki_path
+
+Article = namedtuple("Article", ["title", "text", "properties"])
+
+
+class ArticleSource:
+    """
+    Source of wiki articles, e.g. live wiki api or a local archive
+    """
+
+    async def load(self, title: str) -> Optional[Article]:
+        """
+        Loads HTML of the wiki page by its title, following redirects
+        :return: loaded page as named tuple of (title, text and links), or None if there is no such page
+        """
+        raise NotImplementedError
+
+    async def load_links(self, title: str) -> Optional[List[str]]:
+        """
+        Loads links of the wiki page by its title, following redirects
+        :return: titles of linked main namespace pages, or None if there is no such page
+        """
+        raise NotImplementedError
+
+
+class WikiApiSource(ArticleSource):
+    """
+    Loads articles with `action=parse` of wiki api
+    """
+
+    def __init__(self, language: str = DEFAULT_WIKI):
+        self.language = language
+
+    async def _parse(self, title: str, **params) -> Optional[dict]:
+        # send request
+        async with client_session(self.language) as session:
+            async with session.get(
+                wiki_api(self.language),
+                params={
+                    "action": "parse",
+                    "page": title,
+                    "format": "json",
+                    "redirects": "true",
+                    **params,
+                },
+            ) as resp:
+                data = await resp.json()
+                # TODO: mobile enhancements
+                # if loading failed return
+                if "error" in data:
+                    logging.error(data["error"])
+                    return None
+                return data["parse"]
+
+    async def load(self, title: str) -> Optional[Article]:
+        parser_result = await self._parse(title)
+        if parser_result is None:
+            return None
+        return Article(
+            parser_result["title"],
+            parser_result["text"]["*"],
+            parser_result["links"],
+        )
+
+    async def load_links(self, title: str) -> Optional[List[str]]:
+        parser_result = await self._parse(title, prop="links")
+        if parser_result is None:
+            return None
+        # get only namespace 0 links
+        return [e["*"] for e in parser_result["links"] if e["ns"] == 0]
+
+
+class ArchiveSource(ArticleSource):
+    """
+    Loads articles from local archive, see `ArticleArchive`.
+    Articles missing from archive are loaded from fallback source, if any.
+    """
+
+    def __init__(
+        self, archive: ArticleArchive, fallback: Optional[ArticleSource] = None
+    ):
+        self.archive = archive
+        self.fallback = fallback
+
+    async def load(self, title: str) -> Optional[Article]:
+        article = self.archive.get(title)
+        if article is None:
+            return await self.fallback.load(title) if self.fallback else None
+        # links in wiki api format
+        links = [{"ns": 0, "exists": "", "*": x} for x in article["links"]]
+        return Article(article["title"], article["text"], links)
+
+    async def load_links(self, title: str) -> Optional[List[str]]:
+        article = self.archive.get(title)
+        if article is None:
+            return await self.fallback.load_links(title) if self.fallback else None
+        return article["links"]
+
+
+_sources: Dict[str, ArticleSource] = {}
+"""
+Article sources by wiki language
+"""
+
+
+def get_article_source(language: str = DEFAULT_WIKI) -> ArticleSource:
+    """
+    Gets article source of wiki: archive from its `article_archive` directory falling back to wiki api,
+     or just wiki api if no archive is configured
+    """
+    if language not in _sources:
+        source = WikiApiSource(language)
+        path = wiki_path(language, "article_archive")
+        if path:
+            archive = ArticleArchive(path, ARTICLE_CLUSTER_CACHE_SIZE)
+            source = ArchiveSource(archive, fallback=source)
+        _sources[language] = source
+    return _sources[language]
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import gzip
+import json
+import logging
+import random
+import threading
+from collections import Counter
+from typing import Dict, Iterator, Mapping, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+from aiohttp import web
+
+UPSTREAM_WIKI_API = "https://en.wikipedia.org/w/api.php"
+UPSTREAM_SDOW_API = "https://api.sixdegreesofwikipedia.com"
+
+
+def request_key(method: str, path: str, query: Mapping[str, str], body: bytes) -> str:
+    """
+    Makes cassette key of request, independent of parameter order and JSON formatting
+    """
+    key = f"{method} {path}?{urlencode(sorted(query.items()))}"
+    if body:
+        key += " " + json.dumps(json.loads(body), sort_keys=True, ensure_ascii=False)
+    return key
+
+
+class Cassette:
+    """
+    Recorded api responses by request key, stored as JSON lines, gzip compressed if path ends with `.gz`
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.responses: Dict[str, Tuple[int, str]] = {}
+        with contextlib.suppress(FileNotFoundError), self._open("rt") as f:
+            for line in f:
+                record = json.loads(line)
+                self.responses[record["key"]] = (record["status"], record["body"])
+
+    def _open(self, mode: str):
+        opener = gzip.open if self.path.endswith(".gz") else open
+        return opener(self.path, mode, encoding="utf-8")
+
+    def save(self) -> None:
+        with self._open("wt") as f:
+            for key, (status, body) in sorted(self.responses.items()):
+                record = {"key": key, "status": status, "body": body}
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class StandIn:
+    """
+    Local stand-in for wiki api (`/w/api.php`) and six degrees of wikipedia api (`/paths`).
+    Replays responses from cassette, or in record mode forwards missing requests upstream and records them.
+    Latency and errors can be injected, so that benchmarks of the whole stack are repeatable offline.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        record: bool = False,
+        wiki_api: str = UPSTREAM_WIKI_API,
+        sdow_api: str = UPSTREAM_SDOW_API,
+        latency: float = 0,
+        jitter: float = 0,
+        error_rate: float = 0,
+        seed: Optional[int] = None,
+    ):
+        """
+        :param latency: mean response delay in seconds
+        :param jitter: max deviation of response delay from mean in seconds
+        :param error_rate: probability of responding with 503 error
+        """
+        self.cassette = cassette
+        self.record = record
+        self.wiki_api = wiki_api
+        self.sdow_api = sdow_api
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.stats = Counter()
+        """
+        Amount of `hits`, `misses`, `recorded` and `errors`
+        """
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.read()
+        key = request_key(request.method, request.path, request.query, body)
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return self._respond(
+                503, {"error": {"code": "standin", "info": "injected error"}}
+            )
+        if key not in self.cassette.responses:
+            if not self.record:
+                self.stats["misses"] += 1
+                logging.warning(f"Not in cassette: {key}")
+                return self._respond(
+                    404, {"error": {"code": "standin", "info": "not in cassette"}}
+                )
+            self.cassette.responses[key] = await self._forward(request, body)
+            self.stats["recorded"] += 1
+        else:
+            self.stats["hits"] += 1
+        status, text = self.cassette.responses[key]
+        return web.Response(status=status, text=text, content_type="application/json")
+
+    async def _forward(self, request: web.Request, body: bytes) -> Tuple[int, str]:
+        """
+        Makes request to upstream api
+        """
+        if request.path == "/w/api.php":
+            url = self.wiki_api
+        else:
+            url = self.sdow_api.rstrip("/") + request.path
+        async with aiohttp.ClientSession() as session:
+            async with session.request(
+                request.method,
+                url,
+                params=request.query,
+                data=body or None,
+                headers={"Content-Type": "application/json"} if body else None,
+            ) as resp:
+                return resp.status, await resp.text()
+
+    @staticmethod
+    def _respond(status: int, data: dict) -> web.Response:
+        return web.json_response(data, status=status)
+
+
+@contextlib.contextmanager
+def serve_in_thread(standin: StandIn, port: int = 0) -> Iterator[str]:
+    """
+    Runs stand-in server in a background thread
+    :return: base url of server, e.g. `http://127.0.0.1:12345`
+    """
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(standin.make_app())
+
+    async def start() -> str:
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        return f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield asyncio.run_coroutine_threadsafe(start(), loop).result()
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
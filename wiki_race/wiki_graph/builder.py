@@ -0,0 +1,476 @@
+import bz2
+import gzip
+import itertools
+import os
+import re
+import tempfile
+import time
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, TextIO, Tuple
+
+import numpy as np
+
+from wiki_race.wiki_graph.dictionary import TitleDictionary, title_hash
+
+TABLES = ["page", "redirect", "linktarget", "pagelinks"]
+"""
+Dump tables used for building link graph. `linktarget` is needed only for dumps,
+ where `pagelinks` reference link targets by id instead of title (MediaWiki 1.43+)
+"""
+COMPRESSIONS = {"": open, ".gz": gzip.open, ".bz2": bz2.open}
+
+_STRING = r"'((?:[^'\\]|\\.)*)'"
+_TAIL = r"(?:,(?:'(?:[^'\\]|\\.)*'|[^,'()]*))*\)"
+"""
+Remaining fields of a tuple, strings or literals, so that parsing stays aligned to tuples
+"""
+ROW_PATTERNS = {
+    # page_id, page_namespace, page_title, page_is_redirect, ...
+    "page": re.compile(r"\((\d+),(-?\d+)," + _STRING + r",(\d+)" + _TAIL),
+    # rd_from, rd_namespace, rd_title, ...
+    "redirect": re.compile(r"\((\d+),(-?\d+)," + _STRING + _TAIL),
+    # lt_id, lt_namespace, lt_title
+    "linktarget": re.compile(r"\((\d+),(-?\d+)," + _STRING + _TAIL),
+    # pl_from, pl_namespace, pl_title, pl_from_namespace
+    "pagelinks": re.compile(r"\((\d+),(-?\d+)," + _STRING + r",(-?\d+)" + _TAIL),
+}
+PAGELINKS_BY_TARGET_ID = re.compile(r"\((\d+),(-?\d+),(\d+)\)")
+"""
+pl_from, pl_from_namespace, pl_target_id
+"""
+_ESCAPE = re.compile(r"\\(.)")
+_ESCAPES = {"0": "\0", "n": "\n", "r": "\r", "t": "\t", "Z": "\x1a"}
+
+
+def find_dump(dump_dir: str, wiki: str, table: str) -> Optional[str]:
+    """
+    Finds dump file of table, e.g. `enwiki-latest-page.sql.gz`
+    """
+    for extension in COMPRESSIONS:
+        path = os.path.join(dump_dir, f"{wiki}wiki-latest-{table}.sql{extension}")
+        if os.path.exists(path):
+            return path
+
+
+def open_dump(path: str) -> TextIO:
+    """
+    Opens dump file as text, decompressing it on the fly
+    """
+    extension = os.path.splitext(path)[1]
+    opener = COMPRESSIONS.get(extension, open)
+    return opener(path, "rt", encoding="utf-8", errors="surrogateescape")
+
+
+def unescape(value: str) -> str:
+    """
+    Unescapes MySQL string literal
+    """
+    if "\\" not in value:
+        return value
+    return _ESCAPE.sub(lambda m: _ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+class Progress:
+    """
+    Counts parsed rows, reporting rows per second periodically
+    """
+
+    def __init__(self, report: Callable[[str], None], every: float = 5):
+        self.report = report
+        self.every = every
+        self.stats: Dict[str, dict] = {}
+
+    def start(self, table: str) -> None:
+        self.table = table
+        self.rows = 0
+        self.started_at = self.reported_at = time.perf_counter()
+
+    def update(self, rows: int) -> None:
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.reported_at >= self.every:
+            self.reported_at = now
+            self.report(
+                f"{self.table}: {self.rows} rows, "
+                f"{self.rows / (now - self.started_at):.0f} rows/s"
+            )
+
+    def finish(self) -> None:
+        seconds = time.perf_counter() - self.started_at
+        self.stats[self.table] = {
+            "rows": self.rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(self.rows / max(seconds, 1e-9)),
+        }
+        self.report(f"{self.table}: done, {self.stats[self.table]}")
+
+
+def iter_rows(path: str, progress: Progress) -> Iterator[tuple]:
+    """
+    Streams tuples of dump's INSERT statements, line by line
+    :return: iterator of tuples of captured fields, see `ROW_PATTERNS`
+    """
+    table = progress.table
+    pattern = ROW_PATTERNS[table]
+    with open_dump(path) as f:
+        for line in f:
+            if not line.startswith("INSERT INTO"):
+                continue
+            rows = pattern.findall(line)
+            # newer pagelinks reference link targets by id
+            if not rows and table == "pagelinks":
+                pattern = PAGELINKS_BY_TARGET_ID
+                rows = pattern.findall(line)
+            progress.update(len(rows))
+            yield from rows
+
+
+class _TitleLookup:
+    """
+    Maps titles to page indices by 64-bit title hashes, so that no title is kept in memory
+    """
+
+    def __init__(self, hashes: np.ndarray):
+        self.order = np.argsort(hashes, kind="stable")
+        self.hashes = hashes[self.order]
+
+    def get(self, hashes: np.ndarray) -> np.ndarray:
+        """
+        :return: page indices, -1 for unknown titles
+        """
+        if not len(self.hashes):
+            return np.full(len(hashes), -1, dtype=np.int64)
+        positions = np.minimum(
+            np.searchsorted(self.hashes, hashes), len(self.hashes) - 1
+        )
+        return np.where(self.hashes[positions] == hashes, self.order[positions], -1)
+
+
+class _IdLookup:
+    """
+    Maps sorted integer keys (e.g. page ids) to values
+    """
+
+    def __init__(self, keys: np.ndarray, values: np.ndarray):
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.values = values[order]
+
+    def get(self, keys: np.ndarray) -> np.ndarray:
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[positions] == keys, self.values[positions], -1)
+
+
+def _columns(
+    rows: Iterator[tuple],
+    size: int,
+    parse: Callable[[tuple], Optional[Tuple[int, int]]],
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Parses rows straight into two int64 columns, `size` rows at a time, so that parsed rows aren't kept as tuples
+    :param parse: makes pair of numbers of row, or returns None to skip row
+    """
+    first, second = array("q"), array("q")
+    for row in rows:
+        pair = parse(row)
+        if pair is None:
+            continue
+        first.append(pair[0])
+        second.append(pair[1])
+        if len(first) >= size:
+            yield np.frombuffer(first, dtype=np.int64), np.frombuffer(
+                second, dtype=np.int64
+            )
+            first, second = array("q"), array("q")
+    if first:
+        yield np.frombuffer(first, dtype=np.int64), np.frombuffer(
+            second, dtype=np.int64
+        )
+
+
+def _title_row(row: tuple) -> Optional[Tuple[int, int]]:
+    """
+    Parses id and title hash of `redirect` or `linktarget` row of namespace 0
+    """
+    if row[1] == "0":
+        return int(row[0]), hash(unescape(row[2]))
+
+
+def _link_row(row: tuple) -> Optional[Tuple[int, int]]:
+    """
+    Parses `pagelinks` row of links between namespace 0 pages:
+     source page id and target title hash, or target id for dumps referencing link targets by id
+    """
+    if len(row) == 4:
+        # pl_from, pl_namespace, pl_title, pl_from_namespace
+        if row[1] == "0" and row[3] == "0":
+            return int(row[0]), hash(unescape(row[2]))
+    # pl_from, pl_from_namespace, pl_target_id
+    elif row[1] == "0":
+        return int(row[0]), int(row[2])
+
+
+class GraphBuilder:
+    """
+    Builds `LinkGraph` from wiki SQL dumps in streaming passes within a fixed memory budget:
+    1. `page`: ids, title hashes and redirect flags of namespace 0 pages are kept, titles are spilled to disk;
+    2. `redirect`: redirect chains are resolved, so that redirects are folded into their target pages;
+    3. `linktarget` (if present): link target ids are mapped to pages;
+    4. `pagelinks`: links are mapped to pages and spilled to disk in chunks, counting degrees;
+    5. CSR arrays are filled from chunks into memory mapped output files;
+    6. titles are written with title dictionary, see `TitleDictionary`.
+    Titles are matched by 64-bit hashes, collisions are negligible for wiki sized title sets.
+    """
+
+    def __init__(
+        self,
+        dump_dir: str,
+        wiki: str,
+        output: str,
+        memory_mb: int = 512,
+        report: Callable[[str], None] = print,
+    ):
+        self.dumps = {table: find_dump(dump_dir, wiki, table) for table in TABLES}
+        for table in ["page", "redirect", "pagelinks"]:
+            if self.dumps[table] is None:
+                raise FileNotFoundError(f"no {wiki}wiki {table} dump in {dump_dir}")
+        self.output = output
+        # rows are parsed into int64 pairs (16 bytes), processed with a few temporary arrays of the same length
+        self.chunk_size = max(memory_mb * 2**20 // 64, 1024)
+        self.progress = Progress(report)
+        self.report = report
+
+    def build(self) -> dict:
+        """
+        Builds graph into output directory
+        :return: stats: amount of `pages`, `redirects` and `links`, and throughput of every table
+        """
+        os.makedirs(self.output, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=self.output) as workdir:
+            self.workdir = workdir
+            self.read_pages()
+            self.read_redirects()
+            self.read_link_targets()
+            chunks = self.read_links()
+            links = 0
+            for name, source, target in [("forward", 0, 1), ("backward", 1, 0)]:
+                links = self.write_csr(name, chunks, source, target)
+            self.write_titles()
+        return {
+            "pages": self.size,
+            "redirects": int(np.count_nonzero(self.is_redirect)),
+            "links": links,
+            "tables": self.progress.stats,
+        }
+
+    def read_pages(self) -> None:
+        page_ids, hashes, redirects = array("q"), array("q"), array("b")
+        self.progress.start("page")
+        with open(os.path.join(self.workdir, "titles"), "w", encoding="utf-8") as f:
+            for page_id, namespace, title, is_redirect in iter_rows(
+                self.dumps["page"], self.progress
+            ):
+                if namespace != "0":
+                    continue
+                title = unescape(title)
+                page_ids.append(int(page_id))
+                hashes.append(hash(title))
+                redirects.append(is_redirect == "1")
+                f.write(title.replace("\n", " ") + "\n")
+        self.progress.finish()
+        self.page_ids = np.frombuffer(page_ids, dtype=np.int64)
+        self.titles = _TitleLookup(np.frombuffer(hashes, dtype=np.int64))
+        self.is_redirect = np.frombuffer(redirects, dtype=np.int8).astype(bool)
+        self.pages = _IdLookup(self.page_ids, np.arange(len(self.page_ids)))
+
+    def read_redirects(self) -> None:
+        count = len(self.page_ids)
+        redirect_to = np.full(count, -1, dtype=np.int64)
+        self.progress.start("redirect")
+        for page_ids, hashes in _columns(
+            iter_rows(self.dumps["redirect"], self.progress),
+            self.chunk_size,
+            _title_row,
+        ):
+            sources = self.pages.get(page_ids)
+            targets = self.titles.get(hashes)
+            valid = sources >= 0
+            redirect_to[sources[valid]] = targets[valid]
+        self.progress.finish()
+        # follow redirect chains: page leads to itself, redirect leads to its target
+        leads_to = np.where(self.is_redirect, redirect_to, np.arange(count))
+        for _ in range(8):
+            follow = (leads_to >= 0) & self.is_redirect[np.maximum(leads_to, 0)]
+            if not follow.any():
+                break
+            leads_to[follow] = leads_to[leads_to[follow]]
+        # redirects ending up at redirects are loops, broken redirects lead nowhere
+        leads_to[(leads_to >= 0) & self.is_redirect[np.maximum(leads_to, 0)]] = -1
+        # pages are numbered in dump order, skipping redirects
+        node_ids = np.cumsum(~self.is_redirect) - 1
+        self.node_of = np.where(leads_to >= 0, node_ids[np.maximum(leads_to, 0)], -1)
+        """
+        Graph node of every page, folding redirects
+        """
+        self.size = int(np.count_nonzero(~self.is_redirect))
+
+    def read_link_targets(self) -> None:
+        self.link_targets: Optional[_IdLookup] = None
+        if self.dumps["linktarget"] is None:
+            return
+        ids, nodes = [], []
+        self.progress.start("linktarget")
+        for target_ids, hashes in _columns(
+            iter_rows(self.dumps["linktarget"], self.progress),
+            self.chunk_size,
+            _title_row,
+        ):
+            pages = self.titles.get(hashes)
+            chunk_nodes = np.where(pages >= 0, self.node_of[np.maximum(pages, 0)], -1)
+            valid = chunk_nodes >= 0
+            ids.append(target_ids[valid])
+            nodes.append(chunk_nodes[valid].astype(np.int32))
+        self.progress.finish()
+        self.link_targets = _IdLookup(
+            np.concatenate(ids) if ids else np.zeros(0, dtype=np.int64),
+            np.concatenate(nodes) if nodes else np.zeros(0, dtype=np.int32),
+        )
+
+    def read_links(self) -> List[str]:
+        """
+        Maps links to graph nodes, spilling them to disk in chunks
+        :return: paths of chunk files with (source, target) pairs
+        """
+        self.degrees = [np.zeros(self.size, dtype=np.int64) for _ in range(2)]
+        chunks = []
+        self.progress.start("pagelinks")
+        rows = iter_rows(self.dumps["pagelinks"], self.progress)
+        # format of dump is known from its first row
+        first = next(rows, None)
+        by_target_id = first is not None and len(first) == 3
+        if by_target_id and self.link_targets is None:
+            raise FileNotFoundError("pagelinks dump requires linktarget dump")
+        rows = itertools.chain([first] if first else [], rows)
+        for page_ids, link_targets in _columns(rows, self.chunk_size, _link_row):
+            if by_target_id:
+                targets = self.link_targets.get(link_targets)
+            else:
+                targets = self.titles.get(link_targets)
+                targets = np.where(
+                    targets >= 0, self.node_of[np.maximum(targets, 0)], -1
+                )
+            pages = self.pages.get(page_ids)
+            # links of redirect pages aren't followed
+            sources = np.where(
+                (pages >= 0) & ~self.is_redirect[np.maximum(pages, 0)],
+                self.node_of[np.maximum(pages, 0)],
+                -1,
+            )
+            valid = (sources >= 0) & (targets >= 0) & (sources != targets)
+            links = np.stack([sources[valid], targets[valid]], axis=1).astype(np.int32)
+            for i in range(2):
+                self.degrees[i] += np.bincount(links[:, i], minlength=self.size)
+            path = os.path.join(self.workdir, f"links{len(chunks)}.npy")
+            np.save(path, links)
+            chunks.append(path)
+        self.progress.finish()
+        return chunks
+
+    def write_csr(self, name: str, chunks: List[str], source: int, target: int) -> int:
+        """
+        Writes CSR arrays of links, filling memory mapped targets array chunk by chunk
+        :return: amount of links
+        """
+        degrees = self.degrees[source]
+        offsets = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(degrees, out=offsets[1:])
+        np.save(os.path.join(self.output, f"{name}_offsets.npy"), offsets)
+        targets = np.lib.format.open_memmap(
+            os.path.join(self.output, f"{name}_targets.npy"),
+            mode="w+",
+            dtype=np.int32,
+            shape=(int(offsets[-1]),),
+        )
+        cursor = offsets[:-1].copy()
+        for path in chunks:
+            links = np.load(path)
+            if not len(links):
+                continue
+            order = np.argsort(links[:, source], kind="stable")
+            sources, chunk_targets = links[order, source], links[order, target]
+            # position of each link among links of the same page in this chunk
+            starts = np.r_[0, np.flatnonzero(np.diff(sources)) + 1]
+            lengths = np.diff(np.r_[starts, len(sources)])
+            ranks = np.arange(len(sources)) - np.repeat(starts, lengths)
+            targets[cursor[sources] + ranks] = chunk_targets
+            cursor += np.bincount(sources, minlength=self.size)
+        targets.flush()
+        return int(offsets[-1])
+
+    def write_titles(self) -> None:
+        """
+        Writes packed titles of graph nodes, see `PackedStrings`, titles of redirects with their nodes,
+         and title dictionary of both, see `TitleDictionary`
+        """
+        page_hashes, redirect_hashes = array("Q"), array("Q")
+        redirect_nodes, title_offsets = array("i"), array("q", [0])
+        with open(os.path.join(self.workdir, "titles"), encoding="utf-8") as f, open(
+            os.path.join(self.output, "titles.bin"), "wb"
+        ) as titles, open(
+            os.path.join(self.output, "redirect_titles.txt"), "w", encoding="utf-8"
+        ) as redirects:
+            for i, line in enumerate(f):
+                title = line[:-1].replace("_", " ")
+                if not self.is_redirect[i]:
+                    title_offsets.append(
+                        title_offsets[-1] + titles.write(title.encode("utf-8"))
+                    )
+                    page_hashes.append(title_hash(title))
+                elif self.node_of[i] >= 0:
+                    redirects.write(title + "\n")
+                    redirect_hashes.append(title_hash(title))
+                    redirect_nodes.append(self.node_of[i])
+        np.save(
+            os.path.join(self.output, "titles_offsets.npy"),
+            np.frombuffer(title_offsets, dtype=np.int64),
+        )
+        redirect_nodes = np.frombuffer(redirect_nodes, dtype=np.int32)
+        np.save(os.path.join(self.output, "redirect_targets.npy"), redirect_nodes)
+        # pages go first, so that they win title hash collisions with redirects
+        TitleDictionary.from_hashes(
+            np.concatenate(
+                [
+                    np.frombuffer(page_hashes, dtype=np.uint64),
+                    np.frombuffer(redirect_hashes, dtype=np.uint64),
+                ]
+            ),
+            np.r_[np.arange(self.size, dtype=np.int32), redirect_nodes],
+        ).save(self.output)
+
+
+def read_redirect_titles(path: str) -> List[str]:
+    """
+    Reads titles of redirects, written along with link graph into given directory
+    :return: titles, empty if graph has no redirect titles
+    """
+    try:
+        with open(os.path.join(path, "redirect_titles.txt"), encoding="utf-8") as f:
+            return f.read().split("\n")[:-1]
+    except FileNotFoundError:
+        return []
+
+
+def build_link_graph(
+    dump_dir: str,
+    wiki: str,
+    output: str,
+    memory_mb: int = 512,
+    report: Callable[[str], None] = print,
+) -> dict:
+    """
+    Builds link graph of given wiki (e.g. `en` or `ru`) from its dumps, see `GraphBuilder`
+    :return: build stats
+    """
+    return GraphBuilder(dump_dir, wiki, output, memory_mb, report).build()
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import re
+import urllib.parse
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wiki_race.settings import DEFAULT_WIKI
+from wiki_race.wikis import wiki_path
+
+_WHITESPACE = re.compile(r"[\s_]+")
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalizes title of main namespace page the way MediaWiki does:
+     underscores and runs of whitespace become a single space, section is dropped,
+     and the first letter is uppercased, so it's the only case-insensitive one
+    """
+    title = urllib.parse.unquote(title).split("#", 1)[0]
+    title = _WHITESPACE.sub(" ", title).strip()
+    first = title[:1].upper()
+    # letters like `ß` have no single letter uppercase, MediaWiki keeps them
+    if len(first) != 1:
+        first = title[:1]
+    return first + title[1:]
+
+
+def title_hash(title: str) -> int:
+    """
+    Stable 64-bit hash of normalized title
+    """
+    digest = hashlib.blake2b(normalize_title(title).encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "little")
+
+
+class TitleDictionary:
+    """
+    Maps titles to canonical pages (link graph page ids), with redirects resolved ahead of time.
+    Stores only sorted 64-bit hashes of normalized titles and page ids, 12 bytes per title,
+     memory mapped on load, so that workers share it.
+    """
+
+    def __init__(self, hashes: np.ndarray, pages: np.ndarray):
+        self.hashes = hashes
+        """
+        Hashes of normalized titles, sorted
+        """
+        self.pages = pages
+        """
+        Page ids in order of hashes
+        """
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, titles: List[str], pages: Sequence[int]) -> "TitleDictionary":
+        """
+        Makes dictionary of titles
+        :param pages: page id of each title, titles of the same page (e.g. redirects) have the same id
+        """
+        return cls.from_hashes(
+            np.array([title_hash(x) for x in titles], dtype=np.uint64), pages
+        )
+
+    @classmethod
+    def from_hashes(cls, hashes: np.ndarray, pages: Sequence[int]) -> "TitleDictionary":
+        """
+        Makes dictionary of title hashes, see `title_hash`.
+        Of titles with the same hash, the first one is kept, so pages should precede redirects.
+        """
+        order = np.argsort(hashes, kind="stable")
+        hashes = np.asarray(hashes, dtype=np.uint64)[order]
+        first = np.r_[True, hashes[1:] != hashes[:-1]]
+        return cls(hashes[first], np.asarray(pages, dtype=np.int32)[order][first])
+
+    @classmethod
+    def load(cls, path: str) -> "TitleDictionary":
+        """
+        Loads dictionary from directory, memory mapped
+        """
+        return cls(
+            np.load(os.path.join(path, "title_hashes.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "title_pages.npy"), mmap_mode="r"),
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Saves dictionary to directory
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "title_hashes.npy"), self.hashes)
+        np.save(os.path.join(path, "title_pages.npy"), self.pages)
+
+    def get(self, title: str) -> int:
+        """
+        Gets canonical page id by title, following redirects
+        :return: page id, or -1 if title is unknown
+        """
+        key = np.uint64(title_hash(title))
+        position = int(np.searchsorted(self.hashes, key))
+        if position < len(self.hashes) and self.hashes[position] == key:
+            return int(self.pages[position])
+        return -1
+
+    def same_page(self, a: str, b: str) -> Optional[bool]:
+        """
+        Checks whether two titles lead to the same page
+        :return: true or false, or None if any of titles is unknown
+        """
+        page_a, page_b = self.get(a), self.get(b)
+        if page_a == -1 or page_b == -1:
+            return
+        return page_a == page_b
+
+
+_dictionaries: Dict[str, TitleDictionary] = {}
+"""
+Loaded title dictionaries by wiki language
+"""
+
+
+def get_title_dictionary(language: str = DEFAULT_WIKI) -> Optional[TitleDictionary]:
+    """
+    Gets title dictionary of wiki from its `title_dictionary` directory, loading it on first call
+    :return: title dictionary, or None if no title dictionary is configured
+    """
+    path = wiki_path(language, "title_dictionary")
+    if language not in _dictionaries and path:
+        _dictionaries[language] = TitleDictionary.load(path)
+    return _dictionaries.get(language)
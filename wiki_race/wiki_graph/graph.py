@@ -0,0 +1,192 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wiki_race.settings import DEFAULT_WIKI
+from wiki_race.wiki_graph.dictionary import TitleDictionary
+from wiki_race.wiki_graph.titles import PackedStrings
+from wiki_race.wikis import wiki_path
+
+UNREACHABLE = 255
+"""
+Distance of pages, from which target can't be reached (or is too far)
+"""
+
+
+class GraphTitles(Sequence):
+    """
+    Page titles by page id, decoded from packed strings on access
+    """
+
+    def __init__(self, strings: PackedStrings):
+        self.strings = strings
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+    def __getitem__(self, i: int) -> str:
+        return self.strings[i].decode("utf-8")
+
+
+class LinkGraph:
+    """
+    Local graph of links between wiki pages in CSR format. Pages are numbered from 0 to `size - 1`.
+    Links of page `i` are `forward_targets[forward_offsets[i]:forward_offsets[i + 1]]`,
+     pages linking to page `i` are `backward_targets[backward_offsets[i]:backward_offsets[i + 1]]`.
+
+    Stored as a directory of `.npy` arrays, packed titles and title dictionary, all memory mapped on load,
+     so that workers share them.
+    """
+
+    ARRAYS = [
+        "forward_offsets",
+        "forward_targets",
+        "backward_offsets",
+        "backward_targets",
+    ]
+
+    def __init__(
+        self,
+        titles: Sequence[str],
+        forward_offsets: np.ndarray,
+        forward_targets: np.ndarray,
+        backward_offsets: np.ndarray,
+        backward_targets: np.ndarray,
+        dictionary: Optional[TitleDictionary] = None,
+    ):
+        self.titles = titles
+        self.forward_offsets = forward_offsets
+        self.forward_targets = forward_targets
+        self.backward_offsets = backward_offsets
+        self.backward_targets = backward_targets
+        if dictionary is None:
+            dictionary = TitleDictionary.build(titles, range(len(titles)))
+        self.dictionary = dictionary
+        """
+        Page ids by title, redirects included, see `TitleDictionary`
+        """
+
+    @property
+    def size(self) -> int:
+        return len(self.titles)
+
+    @classmethod
+    def from_links(cls, titles: List[str], links: np.ndarray) -> "LinkGraph":
+        """
+        Makes graph from array of links
+        :param links: array of shape (n, 2) with linking and linked page ids
+        """
+        links = np.asarray(links, dtype=np.int64).reshape(-1, 2)
+        arrays = []
+        for source, target in [(0, 1), (1, 0)]:
+            order = np.argsort(links[:, source], kind="stable")
+            counts = np.bincount(links[:, source], minlength=len(titles))
+            offsets = np.zeros(len(titles) + 1, dtype=np.int64)
+            np.cumsum(counts, out=offsets[1:])
+            arrays += [offsets, links[order, target].astype(np.int32)]
+        return cls(titles, *arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "LinkGraph":
+        """
+        Loads graph from directory, memory mapped
+        """
+        if os.path.exists(os.path.join(path, "titles_offsets.npy")):
+            titles = GraphTitles(PackedStrings.load(path, "titles"))
+        else:
+            # graphs built before titles were packed have a title per line
+            with open(os.path.join(path, "titles.txt"), encoding="utf-8") as f:
+                titles = f.read().split("\n")
+        arrays = [
+            np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in cls.ARRAYS
+        ]
+        dictionary = None
+        if os.path.exists(os.path.join(path, "title_hashes.npy")):
+            dictionary = TitleDictionary.load(path)
+        return cls(titles, *arrays, dictionary=dictionary)
+
+    def save(self, path: str) -> None:
+        """
+        Saves graph to directory
+        """
+        os.makedirs(path, exist_ok=True)
+        PackedStrings.pack([x.encode("utf-8") for x in self.titles]).save(
+            path, "titles"
+        )
+        self.dictionary.save(path)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    def get_id(self, title: str) -> int:
+        """
+        Gets page id by title, following redirects
+        :return: page id, or -1 if no such page
+        """
+        return self.dictionary.get(title)
+
+    def distances_to(self, target: int) -> np.ndarray:
+        """
+        Finds distance from every page to target page with a reverse breadth-first search.
+        Each BFS level is expanded with vectorized operations over the backward CSR arrays.
+        :return: uint8 array of distances by page id, `UNREACHABLE` if target can't be reached in under 255 clicks
+        """
+        distances = np.full(self.size, UNREACHABLE, dtype=np.uint8)
+        distances[target] = 0
+        frontier = np.array([target], dtype=np.int64)
+        distance = 0
+        while frontier.size and distance < UNREACHABLE - 1:
+            distance += 1
+            # gather pages linking to frontier pages
+            starts = self.backward_offsets[frontier].astype(np.int64)
+            lengths = self.backward_offsets[frontier + 1].astype(np.int64) - starts
+            total = int(lengths.sum())
+            if total == 0:
+                break
+            # index of each link: its list start plus its position in the list
+            positions = np.arange(total) - np.repeat(
+                np.cumsum(lengths) - lengths, lengths
+            )
+            sources = self.backward_targets[np.repeat(starts, lengths) + positions]
+            # keep only unvisited pages
+            frontier = np.unique(sources[distances[sources] == UNREACHABLE]).astype(
+                np.int64
+            )
+            distances[frontier] = distance
+        return distances
+
+    def shortest_path(self, start: int, distances: np.ndarray) -> List[int]:
+        """
+        Follows links getting one click closer to target from start page
+        :param distances: distances to target, see `distances_to`
+        :return: list of page ids from start to target (ends inclusive), empty if target can't be reached
+        """
+        if distances[start] == UNREACHABLE:
+            return []
+        path = [start]
+        while distances[path[-1]] != 0:
+            page = path[-1]
+            links = self.forward_targets[
+                self.forward_offsets[page] : self.forward_offsets[page + 1]
+            ]
+            closer = links[distances[links] == distances[page] - 1]
+            path.append(int(closer[0]))
+        return path
+
+
+_graphs: Dict[str, LinkGraph] = {}
+"""
+Loaded link graphs by wiki language
+"""
+
+
+def get_link_graph(language: str = DEFAULT_WIKI) -> Optional[LinkGraph]:
+    """
+    Gets link graph of wiki from its `link_graph` directory, loading it on first call
+    :return: link graph, or None if no local link graph is configured
+    """
+    path = wiki_path(language, "link_graph")
+    if language not in _graphs and path:
+        _graphs[language] = LinkGraph.load(path)
+    return _graphs.get(language)
@@ -0,0 +1,202 @@
+import functools
+import mmap
+import os
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from wiki_race.settings import DEFAULT_WIKI
+from wiki_race.wiki_api.parse import standardize_wiki_title
+from wiki_race.wikis import wiki_path
+
+CACHED_PREFIX_LENGTH = 2
+"""
+Suggestions for prefixes up to this length are cached, as they match too many titles to rank on every request
+"""
+
+
+class PackedStrings:
+    """
+    Array of utf-8 strings packed into a single blob with offsets
+    """
+
+    def __init__(self, blob: Sequence, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+    @staticmethod
+    def pack(strings: List[bytes]) -> "PackedStrings":
+        offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(x) for x in strings], out=offsets[1:])
+        return PackedStrings(b"".join(strings), offsets)
+
+    @staticmethod
+    def load(path: str, name: str) -> "PackedStrings":
+        offsets = np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode="r")
+        with open(os.path.join(path, f"{name}.bin"), "rb") as f:
+            blob = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if offsets[-1]
+                else b""
+            )
+        return PackedStrings(blob, offsets)
+
+    def save(self, path: str, name: str) -> None:
+        np.save(os.path.join(path, f"{name}_offsets.npy"), self.offsets)
+        with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+            f.write(bytes(self.blob))
+
+
+class TitleIndex:
+    """
+    Prefix index of wiki page titles: standardized titles sorted bytewise, searched with binary search.
+    Titles of redirects are kept apart, so that they are found by existence checks, but not suggested.
+    Stored as packed string blobs with offset arrays, memory mapped on load, so that workers share it.
+    """
+
+    def __init__(
+        self,
+        keys: PackedStrings,
+        titles: PackedStrings,
+        popularity: np.ndarray,
+        redirect_keys: Optional[PackedStrings] = None,
+    ):
+        self.keys = keys
+        """
+        Standardized titles, sorted
+        """
+        self.titles = titles
+        """
+        Titles as displayed, in order of keys
+        """
+        self.popularity = popularity
+        """
+        Popularity of titles (e.g. amount of links to page), in order of keys
+        """
+        self.redirect_keys = redirect_keys or PackedStrings.pack([])
+        """
+        Standardized titles of redirects, sorted
+        """
+        self._cached_suggest = functools.lru_cache(maxsize=4096)(self._suggest)
+
+    @classmethod
+    def build(
+        cls,
+        titles: Sequence[str],
+        popularity: np.ndarray,
+        redirects: Sequence[str] = (),
+    ) -> "TitleIndex":
+        """
+        Makes index of titles
+        :param popularity: popularity of each title, used for ranking suggestions
+        :param redirects: titles of redirects to indexed pages
+        """
+        keys = [standardize_wiki_title(x).encode("utf-8") for x in titles]
+        order = sorted(range(len(titles)), key=keys.__getitem__)
+        return cls(
+            PackedStrings.pack([keys[i] for i in order]),
+            PackedStrings.pack([titles[i].encode("utf-8") for i in order]),
+            np.asarray(popularity, dtype=np.int32)[order],
+            PackedStrings.pack(
+                sorted(standardize_wiki_title(x).encode("utf-8") for x in redirects)
+            ),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "TitleIndex":
+        """
+        Loads index from directory, memory mapped
+        """
+        redirect_keys = None
+        # indexes built before redirects were indexed have none
+        if os.path.exists(os.path.join(path, "redirect_keys_offsets.npy")):
+            redirect_keys = PackedStrings.load(path, "redirect_keys")
+        return cls(
+            PackedStrings.load(path, "title_keys"),
+            PackedStrings.load(path, "title_display"),
+            np.load(os.path.join(path, "title_popularity.npy"), mmap_mode="r"),
+            redirect_keys,
+        )
+
+    def save(self, path: str) -> None:
+        """
+        Saves index to directory
+        """
+        os.makedirs(path, exist_ok=True)
+        self.keys.save(path, "title_keys")
+        self.titles.save(path, "title_display")
+        np.save(os.path.join(path, "title_popularity.npy"), self.popularity)
+        self.redirect_keys.save(path, "redirect_keys")
+
+    def _lower_bound(self, key: bytes, keys: Optional[PackedStrings] = None) -> int:
+        """
+        Finds position of first key not less than given one
+        :param keys: sorted keys to search, page titles by default
+        """
+        keys = self.keys if keys is None else keys
+        low, high = 0, len(keys)
+        while low < high:
+            middle = (low + high) // 2
+            if keys[middle] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def exists(self, title: str) -> bool:
+        """
+        Checks whether page or redirect with given title is in index
+        """
+        key = standardize_wiki_title(title).encode("utf-8")
+        for keys in [self.keys, self.redirect_keys]:
+            position = self._lower_bound(key, keys)
+            if position < len(keys) and keys[position] == key:
+                return True
+        return False
+
+    def search(self, prefix: str, limit: int = 5) -> List[str]:
+        """
+        Suggests most popular titles starting with given prefix (case-insensitive)
+        """
+        key = standardize_wiki_title(prefix)
+        if len(key) > CACHED_PREFIX_LENGTH:
+            return self._suggest(key, limit)
+        return list(self._cached_suggest(key, limit))
+
+    def _suggest(self, key: str, limit: int) -> List[str]:
+        key = key.encode("utf-8")
+        # 0xff byte is never found in utf-8, so it's greater than any continuation of prefix
+        low, high = self._lower_bound(key), self._lower_bound(key + b"\xff")
+        if low >= high:
+            return []
+        popularity = np.asarray(self.popularity[low:high])
+        if high - low > limit:
+            best = np.argpartition(-popularity, limit)[:limit]
+        else:
+            best = np.arange(high - low)
+        # most popular first, ties in alphabetical order
+        best = best[np.lexsort((best, -popularity[best]))]
+        return [self.titles[low + int(i)].decode("utf-8") for i in best]
+
+
+_indexes: Dict[str, TitleIndex] = {}
+"""
+Loaded title indexes by wiki language
+"""
+
+
+def get_title_index(language: str = DEFAULT_WIKI) -> Optional[TitleIndex]:
+    """
+    Gets title index of wiki from its `title_index` directory, loading it on first call
+    :return: title index, or None if no title index is configured
+    """
+    path = wiki_path(language, "title_index")
+    if language not in _indexes and path:
+        _indexes[language] = TitleIndex.load(path)
+    return _indexes.get(language)
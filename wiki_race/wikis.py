@@ -0,0 +1,44 @@
+"""
+Wikis served by deployment, see `WIKIS` setting. Each party plays on the wiki of its language,
+ and each wiki has its own http pool, page cache, title data and link graph, loaded on first use.
+"""
+
+from typing import Optional
+from urllib.parse import urlparse
+
+from wiki_race.settings import WIKIS, DEFAULT_WIKI
+
+
+def check_language(language: str) -> str:
+    """
+    Checks that wiki of given language is served
+    :return: language
+    :raises: ValueError if no such wiki is served
+    """
+    if language not in WIKIS:
+        raise ValueError(f"unknown wiki: {language}")
+    return language
+
+
+def wiki_api(language: str = DEFAULT_WIKI) -> str:
+    """
+    Gets api endpoint of wiki
+    """
+    return WIKIS[language]["api"]
+
+
+def wiki_origin(language: str = DEFAULT_WIKI) -> str:
+    """
+    Gets origin of wiki, e.g. `https://en.wikipedia.org`
+    """
+    url = urlparse(wiki_api(language))
+    return f"{url.scheme}://{url.netloc}"
+
+
+def wiki_path(language: str, name: str) -> Optional[str]:
+    """
+    Gets directory of wiki's local data
+    :param name: `link_graph`, `title_index`, `title_dictionary` or `article_archive`
+    :return: directory, or None if it isn't configured
+    """
+    return WIKIS[language][name]